@@ -0,0 +1,223 @@
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import time
+from collections.abc import Awaitable, Callable, Coroutine
+from dataclasses import dataclass
+from logging import Logger
+from typing import Any, TypeVar, cast, get_type_hints
+
+from pydantic import TypeAdapter
+
+from azure_python.common.single_flight import SingleFlight
+from azure_python.protocols.i_azure_managed_redis_service import (
+    IAzureManagedRedisService,
+)
+
+KEY_PREFIX = "cached:v1:"
+
+F = TypeVar("F", bound=Callable[..., Coroutine[Any, Any, Any]])
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: int
+    """Seconds during which a value is served without calling the method."""
+    stale_ttl: int = 0
+    """Seconds after `ttl` during which the stale value is served while it is
+    refreshed in the background."""
+    negative_ttl: int | None = None
+    """Seconds during which a None result is served, without a stale period;
+    None results are not cached if None."""
+
+    def fresh_for(self, value: Any) -> int | None:
+        return self.negative_ttl if value is None else self.ttl
+
+    def stale_for(self, value: Any) -> int:
+        return 0 if value is None else self.stale_ttl
+
+
+class CacheAside:
+    """
+    Redis backed cache of the methods decorated with `cached`.
+
+    Entries are stored with the json codec as {"v": value, "t": created at}
+    and expire in Redis once they are neither fresh nor stale. Concurrent
+    misses of a key in this process share one call of the method, and a stale
+    entry is refreshed by at most one background call at a time. Redis errors
+    are logged and treated as misses, the cache never fails a call.
+    """
+
+    def __init__(
+        self,
+        redis: IAzureManagedRedisService,
+        logger: Logger,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.redis = redis
+        self.logger = logger
+        self.clock = clock
+        self.flights: SingleFlight[str, Any] = SingleFlight()
+        self.refreshes: set[asyncio.Future] = set()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    async def get_or_load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        policy: CachePolicy,
+        adapter: TypeAdapter,
+    ) -> Any:
+        key = KEY_PREFIX + key
+        entry = await self.read(key)
+        if entry is not None:
+            value = entry["v"]
+            fresh_for = policy.fresh_for(value)
+            age = self.clock() - entry["t"]
+            if fresh_for is not None and age < fresh_for + policy.stale_for(value):
+                if age < fresh_for:
+                    self.hits += 1
+                else:
+                    self.stale_hits += 1
+                    self.refresh(key, load, policy, adapter)
+                return adapter.validate_python(value)
+
+        self.misses += 1
+        return await self.flights.do(key, lambda: self.load(key, load, policy, adapter))
+
+    async def load(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        policy: CachePolicy,
+        adapter: TypeAdapter,
+    ) -> Any:
+        value = await load()
+        fresh_for = policy.fresh_for(value)
+        if fresh_for is None:
+            return value
+
+        entry = {"v": adapter.dump_python(value, mode="json"), "t": self.clock()}
+        try:
+            await self.redis.set(
+                key, entry, ttl=fresh_for + policy.stale_for(value), codec="json"
+            )
+        except Exception as e:
+            self.logger.warning(f"Error writing cache entry {key}: {e}")
+        return value
+
+    def refresh(
+        self,
+        key: str,
+        load: Callable[[], Awaitable[Any]],
+        policy: CachePolicy,
+        adapter: TypeAdapter,
+    ) -> None:
+        if key in self.flights:
+            return
+        task = asyncio.ensure_future(
+            self.flights.do(key, lambda: self.load(key, load, policy, adapter))
+        )
+        self.refreshes.add(task)
+        task.add_done_callback(self.refreshed)
+
+    def refreshed(self, task: asyncio.Future) -> None:
+        self.refreshes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.logger.warning(f"Error refreshing cache entry: {task.exception()}")
+
+    async def read(self, key: str) -> dict[str, Any] | None:
+        try:
+            return await self.redis.get(key, codec="json")
+        except Exception as e:
+            self.logger.warning(f"Error reading cache entry {key}: {e}")
+            return None
+
+    async def invalidate(self, method: Callable, *args: Any, **kwargs: Any) -> None:
+        """
+        Drop the entry of a `cached` method, bound to its instance, called with
+        `args` and `kwargs`.
+        """
+        instance_key = getattr(method, "instance_key")
+        instance = getattr(method, "__self__")
+        key = KEY_PREFIX + await instance_key(instance, *args, **kwargs)
+        try:
+            await self.redis.delete_many([key])
+        except Exception as e:
+            self.logger.warning(f"Error invalidating cache entry {key}: {e}")
+
+
+def cached(
+    ttl: int,
+    key: Callable[..., str] | None = None,
+    stale_ttl: int = 0,
+    negative_ttl: int | None = None,
+    cache_attr: str = "cache",
+    scope: Callable[[Any], Awaitable[str]] | None = None,
+) -> Callable[[F], F]:
+    """
+    Cache the results of an async method in the `CacheAside` of its instance.
+
+    The method is called as is while the `cache_attr` attribute of the instance
+    is None. Results are stored as JSON through a pydantic TypeAdapter of the
+    return annotation, so pydantic models and their containers round-trip.
+
+    :param ttl: Seconds during which a result is served from the cache.
+    :param key: Builds the key from the arguments of the method (without self),
+        by default a hash of all the bound arguments.
+    :param stale_ttl: Seconds after `ttl` during which the stale result is
+        served while it is refreshed in the background.
+    :param negative_ttl: Seconds during which a None result is cached, None
+        results are not cached if None.
+    :param cache_attr: The instance attribute that holds the `CacheAside`.
+    :param scope: Returns the partition of the keys of an instance, for results
+        that depend on more than the arguments, e.g. on the calling identity.
+    """
+    policy = CachePolicy(ttl=ttl, stale_ttl=stale_ttl, negative_ttl=negative_ttl)
+
+    def decorator(fn: F) -> F:
+        signature = inspect.signature(fn)
+        adapters: list[TypeAdapter] = []
+
+        def cache_key(*args: Any, **kwargs: Any) -> str:
+            if key is not None:
+                part = key(*args, **kwargs)
+            else:
+                bound = signature.bind(None, *args, **kwargs)
+                bound.apply_defaults()
+                arguments = list(bound.arguments.items())[1:]
+                payload = json.dumps(arguments, sort_keys=True, default=str)
+                part = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+            return f"{fn.__qualname__}:{part}"
+
+        async def instance_key(instance: Any, *args: Any, **kwargs: Any) -> str:
+            if scope is None:
+                return cache_key(*args, **kwargs)
+            return f"{await scope(instance)}:{cache_key(*args, **kwargs)}"
+
+        def adapter() -> TypeAdapter:
+            # resolved on first use, when the forward references are defined
+            if not adapters:
+                adapters.append(TypeAdapter(get_type_hints(fn).get("return", Any)))
+            return adapters[0]
+
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            cache: CacheAside | None = getattr(args[0], cache_attr, None)
+            if cache is None:
+                return await fn(*args, **kwargs)
+            return await cache.get_or_load(
+                await instance_key(*args, **kwargs),
+                lambda: fn(*args, **kwargs),
+                policy,
+                adapter(),
+            )
+
+        setattr(wrapper, "instance_key", instance_key)
+        return cast(F, wrapper)
+
+    return decorator
@@ -0,0 +1,112 @@
+import time
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Literal
+
+from openai import AsyncAzureOpenAI
+
+from azure_python.common.rate_limiter import TokenBucketRateLimiter
+from azure_python.common.redis_limits import RedisQuotaLimiter
+from azure_python.models.openai_deployment import OpenAIDeployment
+
+RoutingStrategy = Literal["least_outstanding", "remaining_quota"]
+
+
+@dataclass
+class CircuitBreaker:
+    """
+    Ejects a backend after `failure_threshold` consecutive failures.
+
+    Once `reset_timeout` seconds have passed the breaker is half-open and lets
+    a single trial request through; its outcome closes or re-opens the breaker.
+    """
+
+    failure_threshold: int = 5
+    reset_timeout: float = 30.0
+    clock: Callable[[], float] = time.monotonic
+    failures: int = 0
+    opened_at: float | None = None
+    trial_in_flight: bool = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        if self.opened_at is None:
+            return True
+        if self.trial_in_flight:
+            return False
+        return self.clock() - self.opened_at >= self.reset_timeout
+
+    def on_request(self) -> None:
+        if self.opened_at is not None:
+            self.trial_in_flight = True
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.trial_in_flight or self.failures >= self.failure_threshold:
+            self.opened_at = self.clock()
+        self.trial_in_flight = False
+
+    def release_trial(self) -> None:
+        """End a request without an outcome (e.g. cancelled), so that another
+        trial can go through."""
+        self.trial_in_flight = False
+
+
+@dataclass
+class Backend:
+    deployment: OpenAIDeployment
+    client: AsyncAzureOpenAI
+    rate_limiter: TokenBucketRateLimiter
+    breaker: CircuitBreaker = field(default_factory=CircuitBreaker)
+    outstanding: int = 0
+    shared_quota: RedisQuotaLimiter | None = None
+    """Quota of the deployment shared with the other processes."""
+    shared_quota_breaker: CircuitBreaker = field(
+        default_factory=lambda: CircuitBreaker(failure_threshold=1)
+    )
+    """Skips the shared quota for a while after it failed."""
+
+
+@dataclass
+class DeploymentRouter:
+    """Picks the backend (endpoint and deployment) for the next request."""
+
+    backends: list[Backend]
+    strategy: RoutingStrategy = "least_outstanding"
+
+    def score(self, backend: Backend) -> tuple[float, float]:
+        """Lower is better."""
+        weight = backend.deployment.weight
+        load = (backend.outstanding + 1) / weight
+        if self.strategy == "remaining_quota":
+            return -backend.rate_limiter.remaining() * weight, load
+        return load, -backend.rate_limiter.remaining()
+
+    def select(self, exclude: set[int] | None = None) -> tuple[int, Backend]:
+        """
+        Select a backend, skipping the ones in `exclude` and the ejected ones.
+
+        When every remaining backend is ejected, the least bad one is returned
+        rather than failing the request outright.
+
+        :param exclude: Indexes of the backends already tried for this request.
+        :return: The index and the backend.
+        """
+        exclude = exclude or set()
+        candidates = [
+            (i, b) for i, b in enumerate(self.backends) if i not in exclude
+        ] or list(enumerate(self.backends))
+
+        healthy = [(i, b) for i, b in candidates if b.breaker.allow()]
+        if healthy:
+            return min(healthy, key=lambda item: self.score(item[1]))
+
+        return min(candidates, key=lambda item: item[1].breaker.opened_at or 0.0)
@@ -0,0 +1,176 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Protocol
+
+import numpy as np
+
+from azure_python.protocols.i_azure_managed_redis_service import (
+    IAzureManagedRedisService,
+)
+
+REDIS_KEY_PREFIX = "embedding:v2:"
+
+
+def embedding_key(model: str, text: str) -> str:
+    """Content address of the embedding of `text` by `model`."""
+    payload = json.dumps([model, text])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore(Protocol):
+    async def get_many(self, keys: list[str]) -> dict[int, np.ndarray]:
+        """Vectors stored under `keys` by position in `keys`, without the misses."""
+        ...
+
+    async def put_many(self, keys: list[str], vectors: np.ndarray) -> None:
+        """Store the rows of `vectors` under `keys`."""
+        ...
+
+
+class LocalEmbeddingStore:
+    """
+    Append-only, memory-mapped vector file with a key index.
+
+    `vectors.f32` holds the float32 rows back to back and `index.txt` the key
+    of each row, one per line. Rows are appended before their keys, so a write
+    interrupted half-way is detected and cut off when the store is reopened.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.vectors_path = self.directory / "vectors.f32"
+        self.index_path = self.directory / "index.txt"
+        self.meta_path = self.directory / "meta.json"
+
+        self.dim: int | None = None
+        self.rows: dict[str, int] = {}
+        self.count = 0
+        """Number of rows in the vector file."""
+        self.mmap: np.ndarray | None = None
+        self.load()
+
+    def load(self) -> None:
+        if not self.meta_path.exists():
+            return
+
+        self.dim = int(json.loads(self.meta_path.read_text())["dim"])
+        keys = self.index_path.read_text().split() if self.index_path.exists() else []
+        row_bytes = self.dim * 4
+        vector_bytes = (
+            self.vectors_path.stat().st_size if self.vectors_path.exists() else 0
+        )
+        size = min(len(keys), vector_bytes // row_bytes)
+
+        # drop the tail of an interrupted write
+        if vector_bytes != size * row_bytes:
+            os.truncate(self.vectors_path, size * row_bytes)
+        if len(keys) != size:
+            self.index_path.write_text("".join(f"{k}\n" for k in keys[:size]))
+
+        for row, key in enumerate(keys[:size]):
+            self.rows.setdefault(key, row)
+        self.count = size
+
+    def vectors(self) -> np.ndarray:
+        """Memory map of the stored rows, remapped when rows were appended."""
+        if self.mmap is None or self.mmap.shape[0] != self.count:
+            self.mmap = np.memmap(
+                self.vectors_path,
+                dtype=np.float32,
+                mode="r",
+                shape=(self.count, self.dim),  # type: ignore
+            )
+        return self.mmap
+
+    async def get_many(self, keys: list[str]) -> dict[int, np.ndarray]:
+        found = [(i, self.rows[k]) for i, k in enumerate(keys) if k in self.rows]
+        if not found:
+            return {}
+
+        # fancy indexing copies the rows out of the memory map
+        rows = self.vectors()[[row for _, row in found]]
+        return {i: rows[j] for j, (i, _) in enumerate(found)}
+
+    async def put_many(self, keys: list[str], vectors: np.ndarray) -> None:
+        if self.dim is None:
+            self.dim = int(vectors.shape[1])
+            self.meta_path.write_text(json.dumps({"dim": self.dim}))
+        if vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"expected vectors of {self.dim} dimensions, got {vectors.shape[1]}"
+            )
+
+        new: dict[str, int] = {}
+        for i, key in enumerate(keys):
+            if key not in self.rows and key not in new:
+                new[key] = i
+        if not new:
+            return
+
+        rows = np.ascontiguousarray(vectors[list(new.values())], dtype=np.float32)
+        with open(self.vectors_path, "ab") as f:
+            f.write(rows.tobytes())
+        with open(self.index_path, "a") as f:
+            f.write("".join(f"{k}\n" for k in new))
+
+        for row, key in enumerate(new, self.count):
+            self.rows[key] = row
+        self.count += len(new)
+
+
+class RedisEmbeddingStore:
+    """Vectors stored in Redis as raw float32 bytes."""
+
+    def __init__(self, redis: IAzureManagedRedisService, ttl: int | None = None):
+        self.redis = redis
+        self.ttl = ttl
+
+    async def get_many(self, keys: list[str]) -> dict[int, np.ndarray]:
+        values = await self.redis.mget(
+            [REDIS_KEY_PREFIX + k for k in keys], codec="bytes"
+        )
+        return {
+            i: np.frombuffer(v, dtype=np.float32)
+            for i, v in enumerate(values)
+            if v is not None
+        }
+
+    async def put_many(self, keys: list[str], vectors: np.ndarray) -> None:
+        rows = np.asarray(vectors, dtype=np.float32)
+        await self.redis.mset(
+            {REDIS_KEY_PREFIX + k: row.tobytes() for k, row in zip(keys, rows)},
+            ttl=self.ttl,
+            codec="bytes",
+        )
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache in front of the embedding service.
+
+    Keeps count of the hits, misses and the prompt tokens the hits saved.
+    """
+
+    def __init__(self, store: EmbeddingStore) -> None:
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.tokens_saved = 0
+
+    async def get_many(self, keys: list[str]) -> dict[int, np.ndarray]:
+        found = await self.store.get_many(keys)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        return found
+
+    async def put_many(self, keys: list[str], vectors: np.ndarray) -> None:
+        if keys:
+            await self.store.put_many(keys, vectors)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
@@ -0,0 +1,98 @@
+import math
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+
+class LatencyHistogram:
+    """
+    Histogram of durations in log-spaced buckets.
+
+    Bucket bounds grow by a factor of 2^(1 / `buckets_per_doubling`) from
+    `lowest` seconds, so percentiles are reported within that factor (~19%
+    with the default 4 buckets per doubling) whatever their magnitude, with
+    O(1) recording and a fixed size. Durations below `lowest` fall in the
+    first bucket and above `highest` in the last.
+    """
+
+    def __init__(
+        self,
+        lowest: float = 50e-6,
+        highest: float = 60.0,
+        buckets_per_doubling: int = 4,
+    ) -> None:
+        self.lowest = lowest
+        self.buckets_per_doubling = buckets_per_doubling
+        size = math.ceil(math.log2(highest / lowest) * buckets_per_doubling) + 1
+        self.counts = [0] * size
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def bucket(self, seconds: float) -> int:
+        if seconds <= self.lowest:
+            return 0
+        index = math.ceil(math.log2(seconds / self.lowest) * self.buckets_per_doubling)
+        return min(index, len(self.counts) - 1)
+
+    def upper_bound(self, bucket: int) -> float:
+        return self.lowest * 2 ** (bucket / self.buckets_per_doubling)
+
+    def record(self, seconds: float) -> None:
+        self.counts[self.bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def percentile(self, p: float) -> float:
+        """Upper bound of the bucket of the `p`th (0 to 100) percentile."""
+        if not self.count:
+            return 0.0
+        rank = max(math.ceil(self.count * p / 100), 1)
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                if bucket == len(self.counts) - 1:
+                    return self.max  # above `highest`, the bucket has no bound
+                return min(self.upper_bound(bucket), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else 0.0,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+        }
+
+
+class LatencyRecorder:
+    """Latency histograms by name (e.g. by command)."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.clock = clock
+        self.histograms: dict[str, LatencyHistogram] = {}
+
+    @contextmanager
+    def time(self, name: str) -> Iterator[None]:
+        """Record the duration of the block, whether it succeeds or fails."""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.record(name, self.clock() - start)
+
+    def record(self, name: str, seconds: float) -> None:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = LatencyHistogram()
+        histogram.record(seconds)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        return {name: h.summary() for name, h in sorted(self.histograms.items())}
+
+    def reset(self) -> None:
+        self.histograms.clear()
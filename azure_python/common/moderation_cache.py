@@ -0,0 +1,78 @@
+import hashlib
+import json
+import re
+import unicodedata
+from collections.abc import Sequence
+from logging import Logger
+
+from azure_python.common.ttl_cache import TTLCache
+from azure_python.protocols.i_azure_managed_redis_service import (
+    IAzureManagedRedisService,
+)
+
+KEY_PREFIX = "content_safety:v1:"
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """NFC-normalize `text`, collapse whitespace runs and strip both ends."""
+    return WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def moderation_key(text: str, categories: Sequence[str]) -> str:
+    """Cache key of `text` analyzed for `categories`."""
+    payload = json.dumps([list(categories), normalize_text(text)])
+    return KEY_PREFIX + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ModerationCache:
+    """
+    Content-hash cache of content safety results.
+
+    Entries are keyed by a hash of the normalized text and the analyzed
+    categories, so retries and texts that only differ in whitespace are hits.
+    Results are kept in an in-process LRU cache and, when a Redis service is
+    given, in Redis so they are shared between processes. Redis errors are
+    logged and treated as misses, the cache never fails an analysis.
+    """
+
+    def __init__(
+        self,
+        logger: Logger,
+        max_entries: int = 1024,
+        ttl: int | None = 3600,
+        redis: IAzureManagedRedisService | None = None,
+    ) -> None:
+        self.logger = logger
+        self.ttl = ttl
+        self.local: TTLCache[str, list[dict]] = TTLCache(max_entries, ttl)
+        self.redis = redis
+
+    async def get(self, key: str) -> list[dict] | None:
+        results = self.local.get(key)
+        if results is not None:
+            # callers own the returned dicts, the cached ones stay untouched
+            return [dict(item) for item in results]
+        if self.redis is None:
+            return None
+
+        try:
+            results = await self.redis.get(key, codec="json")
+        except Exception as e:
+            self.logger.warning(f"Error reading moderation cache: {e}")
+            return None
+
+        if results is None:
+            return None
+        self.local.set(key, results)
+        return [dict(item) for item in results]
+
+    async def set(self, key: str, results: list[dict]) -> None:
+        self.local.set(key, [dict(item) for item in results])
+        if self.redis is None:
+            return
+
+        try:
+            await self.redis.set(key, results, ttl=self.ttl, codec="json")
+        except Exception as e:
+            self.logger.warning(f"Error writing moderation cache: {e}")
@@ -0,0 +1,77 @@
+import time
+from collections.abc import Awaitable, Callable, Iterable
+from typing import Generic, TypeVar
+
+from azure_python.common.single_flight import SingleFlight
+from azure_python.common.ttl_cache import TTLCache
+
+V = TypeVar("V")
+
+
+class NearCache(Generic[V]):
+    """
+    In-process LRU cache in front of a remote cache.
+
+    Values are loaded from the remote cache on a miss, with concurrent misses
+    of a key coalesced into one load, and kept for at most `ttl` seconds.
+    Entries are dropped with `invalidate` when the remote value changes; a
+    load that was in flight when its key was invalidated returns its value
+    but does not cache it, since it may predate the change. Missing values
+    (None) are not cached.
+
+    The cache only serves entries while `active`: its owner deactivates it
+    when it may miss invalidations (e.g. while not subscribed to them), then
+    lookups go to the remote cache, still coalesced.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float | None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.local: TTLCache[str, V] = TTLCache(max_entries, ttl, clock)
+        self.flights: SingleFlight[str, V | None] = SingleFlight()
+        self.stale: set[str] = set()
+        self.active = False
+        self.invalidations = 0
+
+    async def get(self, key: str, load: Callable[[], Awaitable[V | None]]) -> V | None:
+        if self.active:
+            value = self.local.get(key)
+            if value is not None:
+                return value
+        return await self.flights.do(key, lambda: self.load(key, load))
+
+    async def load(self, key: str, load: Callable[[], Awaitable[V | None]]) -> V | None:
+        self.stale.discard(key)
+        try:
+            value = await load()
+            if value is not None and self.active and key not in self.stale:
+                self.local.set(key, value)
+            return value
+        finally:
+            self.stale.discard(key)
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            if self.local.delete(key):
+                self.invalidations += 1
+            if key in self.flights:
+                self.stale.add(key)
+
+    def deactivate(self) -> None:
+        """Stop serving entries and drop them, they may have missed invalidations."""
+        self.active = False
+        self.local.clear()
+        self.stale.update(self.flights.calls)
+
+    def stats(self) -> dict[str, float]:
+        return {
+            "hits": self.local.hits,
+            "misses": self.local.misses,
+            "coalesced": self.flights.coalesced,
+            "invalidations": self.invalidations,
+            "entries": len(self.local),
+            "hit_rate": self.local.hit_rate,
+        }
@@ -0,0 +1,185 @@
+from dataclasses import dataclass
+from typing import Literal
+
+import numpy as np
+
+from azure_python.common.vector_index import merge_top_k
+
+QuantizationMode = Literal["int8", "binary"]
+
+BLOCK_ROWS = 4096
+"""Rows scored at once, int8 codes are widened to float32 one block at a time."""
+
+
+@dataclass
+class ScalarQuantizer:
+    """
+    Per-dimension affine int8 quantization: x ~= (code + 128) * scale + offset.
+
+    `offset` and `scale` map the range of each dimension seen by `fit` to the
+    256 int8 values; values outside of that range are clipped.
+    """
+
+    offset: np.ndarray
+    scale: np.ndarray
+
+    @classmethod
+    def fit(cls, vectors: np.ndarray) -> "ScalarQuantizer":
+        low = vectors.min(axis=0).astype(np.float32)
+        high = vectors.max(axis=0).astype(np.float32)
+        scale = (high - low) / 255
+        scale[scale == 0] = 1.0
+        return cls(offset=low, scale=scale)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        codes = np.rint((vectors - self.offset) / self.scale) - 128
+        return np.clip(codes, -128, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return (codes.astype(np.float32) + 128) * self.scale + self.offset
+
+    def scores(self, codes: np.ndarray, queries: np.ndarray) -> np.ndarray:
+        """
+        Dot products of float `queries` with the vectors encoded as `codes`.
+
+        q.x = (q * scale).code + 128 * sum(q * scale) + q.offset, so the codes
+        are never decoded.
+
+        :return: The (len(queries), len(codes)) scores.
+        """
+        weights = queries * self.scale
+        bias = 128 * weights.sum(axis=1) + queries @ self.offset
+        return weights @ codes.astype(np.float32).T + bias[:, None]
+
+
+def binarize(vectors: np.ndarray) -> np.ndarray:
+    """Sign bits of `vectors`, packed 64 dimensions per uint64 word."""
+    packed = np.packbits(vectors > 0, axis=1)
+    padding = -packed.shape[1] % 8
+    if padding:
+        packed = np.pad(packed, ((0, 0), (0, padding)))
+    return np.ascontiguousarray(packed).view(np.uint64)
+
+
+def hamming_scores(bits: np.ndarray, query_bits: np.ndarray) -> np.ndarray:
+    """
+    Hamming similarity of each query with each vector.
+
+    :param bits: The (n, dim / 64) packed bits of the vectors.
+    :param query_bits: The (q, dim / 64) packed bits of the queries.
+    :return: The (q, n) number of bits that differ, negated so higher is closer.
+    """
+    words = np.ascontiguousarray(bits.T)
+    differ = np.zeros((len(query_bits), len(bits)), dtype=np.int32)
+    # one word at a time keeps the temporaries at (q, n)
+    for w in range(len(words)):
+        differ += np.bitwise_count(words[w][None, :] ^ query_bits[:, w][:, None])
+    return -differ
+
+
+class QuantizedVectors:
+    """
+    Quantized storage of a float matrix with a two-stage top-k search.
+
+    int8 keeps one byte per dimension (4x smaller than float32) and scores
+    queries on the codes directly. binary keeps one bit per dimension (32x)
+    and ranks by matching sign bits; pass the memory-mapped float vectors as
+    `rerank` to rescore its candidates. With `keep_int8`, binary also keeps
+    the int8 codes and reranks on the dequantized vectors, a separate mode
+    that takes more memory than int8 alone. Scores are dot products:
+    normalize the vectors (and queries) for cosine.
+    """
+
+    def __init__(
+        self,
+        vectors: np.ndarray,
+        mode: QuantizationMode = "int8",
+        keep_int8: bool = False,
+    ) -> None:
+        if mode not in ("int8", "binary"):
+            raise ValueError(f"unknown quantization mode: {mode}")
+        vectors = np.asarray(vectors, dtype=np.float32)
+        self.mode = mode
+        self.dim = vectors.shape[1]
+        self.quantizer = ScalarQuantizer.fit(vectors)
+        self.codes = (
+            self.quantizer.encode(vectors) if mode == "int8" or keep_int8 else None
+        )
+        self.bits = binarize(vectors) if mode == "binary" else None
+
+    def __len__(self) -> int:
+        return len(self.codes if self.bits is None else self.bits)  # type: ignore
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.codes, self.bits) if a is not None)
+
+    def dequantize(self, rows: np.ndarray) -> np.ndarray:
+        if self.codes is None:
+            raise ValueError("the int8 codes were not kept, there is nothing to decode")
+        return self.quantizer.decode(self.codes[rows])
+
+    def search(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        oversample: int = 4,
+        rerank: np.ndarray | None = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the `k` vectors with the highest dot product with each query.
+
+        The quantized scores select `k * oversample` candidates, which are then
+        rescored on the rows of `rerank` (e.g. the original, memory-mapped
+        float vectors) or else on the dequantized int8 vectors.
+
+        :param queries: The (q, dim) float queries.
+        :param k: The number of results per query.
+        :param oversample: Candidates kept per result for the rerank, 1 to skip it.
+        :param rerank: The full precision vectors, in the same row order.
+        :return: The (q, k) scores and rows, best first.
+        """
+        queries = np.array(queries, dtype=np.float32, ndmin=2)
+        k = min(k, len(self))
+        if k < 1:
+            empty = np.zeros((len(queries), 0))
+            return empty.astype(np.float32), empty.astype(np.int64)
+        scores, candidates = self.first_pass(queries, k * max(oversample, 1))
+        if rerank is not None or (self.bits is not None and self.codes is not None):
+            scores = np.stack(
+                [
+                    (
+                        rerank[rows] if rerank is not None else self.dequantize(rows)
+                    ).astype(np.float32)
+                    @ query
+                    for query, rows in zip(queries, candidates)
+                ]
+            )
+
+        scores, candidates = merge_top_k(scores, candidates, k)
+        order = np.argsort(-scores, axis=1, kind="stable")
+        return (
+            np.take_along_axis(scores, order, axis=1),
+            np.take_along_axis(candidates, order, axis=1),
+        )
+
+    def first_pass(
+        self, queries: np.ndarray, n_candidates: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """The `n_candidates` best quantized scores of each query, and their rows."""
+        query_bits = binarize(queries) if self.bits is not None else None
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(self), BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, len(self))
+            if query_bits is not None:
+                scores = hamming_scores(self.bits[start:end], query_bits)  # type: ignore
+            else:
+                scores = self.quantizer.scores(self.codes[start:end], queries)  # type: ignore
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_scores, best_rows = merge_top_k(
+                np.concatenate([best_scores, scores.astype(np.float32)], axis=1),
+                np.concatenate([best_rows, rows], axis=1),
+                n_candidates,
+            )
+        return best_scores, best_rows
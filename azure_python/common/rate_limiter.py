@@ -0,0 +1,151 @@
+import asyncio
+import random
+import time
+from collections.abc import Awaitable, Callable, Mapping
+from dataclasses import dataclass
+
+
+@dataclass
+class TokenBucket:
+    capacity: float
+    refill_rate: float
+    """Tokens added per second."""
+    level: float
+    updated: float
+
+    @classmethod
+    def per_minute(cls, limit: int, now: float) -> "TokenBucket":
+        return cls(capacity=limit, refill_rate=limit / 60.0, level=limit, updated=now)
+
+    def refill(self, now: float) -> None:
+        elapsed = max(now - self.updated, 0.0)
+        self.level = min(self.capacity, self.level + elapsed * self.refill_rate)
+        self.updated = now
+
+    def delay(self, amount: float) -> float:
+        """Seconds to wait until `amount` tokens are available."""
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.refill_rate
+
+
+class TokenBucketRateLimiter:
+    """
+    Client-side limiter for requests-per-minute and tokens-per-minute quotas.
+
+    Callers are served in FIFO order: the head of the queue holds the lock
+    while it waits for capacity, so later callers cannot overtake it. Token
+    usage is acquired with an estimate and corrected with `reconcile` once the
+    actual usage is known. A limit of None disables that bucket.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+    ) -> None:
+        self.clock = clock
+        self.sleep = sleep
+        now = clock()
+        self.requests = (
+            TokenBucket.per_minute(requests_per_minute, now)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            TokenBucket.per_minute(tokens_per_minute, now)
+            if tokens_per_minute
+            else None
+        )
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+
+    def get_delay(self, tokens: int) -> float:
+        now = self.clock()
+        delay = max(self.paused_until - now, 0.0)
+        for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+            if bucket:
+                bucket.refill(now)
+                delay = max(delay, bucket.delay(amount))
+        return delay
+
+    async def acquire(self, tokens: int = 0) -> None:
+        """
+        Wait until one request and `tokens` tokens fit in the quota and take them.
+
+        :param tokens: The estimated number of tokens of the request.
+        """
+        async with self.lock:
+            while (delay := self.get_delay(tokens)) > 0:
+                await self.sleep(delay)
+
+            if self.requests:
+                self.requests.level -= 1
+            if self.tokens:
+                self.tokens.level -= min(tokens, self.tokens.capacity)
+
+    def remaining(self) -> float:
+        """Fraction (0 to 1) of the quota currently available, 1 if unlimited."""
+        now = self.clock()
+        if self.paused_until > now:
+            return 0.0
+
+        fraction = 1.0
+        for bucket in (self.requests, self.tokens):
+            if bucket:
+                bucket.refill(now)
+                fraction = min(fraction, max(bucket.level, 0.0) / bucket.capacity)
+        return fraction
+
+    def reconcile(self, estimated: int, actual: int) -> None:
+        """
+        Correct the token bucket once the actual usage of a request is known.
+
+        :param estimated: The number of tokens passed to `acquire`.
+        :param actual: The number of tokens actually used (0 if the request failed).
+        """
+        if self.tokens:
+            estimated = min(estimated, int(self.tokens.capacity))
+            self.tokens.level = min(
+                self.tokens.capacity, self.tokens.level + estimated - actual
+            )
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every caller for the given number of seconds."""
+        self.paused_until = max(self.paused_until, self.clock() + seconds)
+
+
+def retry_after_seconds(headers: Mapping[str, str] | None) -> float | None:
+    """Read the `retry-after-ms` or `retry-after` header, in seconds."""
+    if not headers:
+        return None
+
+    for name, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(name)
+        if value is None:
+            continue
+        try:
+            return max(float(value) * scale, 0.0)
+        except ValueError:
+            continue
+    return None
+
+
+def backoff_delay(
+    attempt: int,
+    retry_after: float | None = None,
+    base: float = 0.5,
+    cap: float = 30.0,
+) -> float:
+    """
+    Jittered delay before the next retry.
+
+    Honors `retry_after` (plus up to 10% jitter so that waiting callers do not
+    retry in lockstep), otherwise uses exponential backoff with full jitter.
+    """
+    if retry_after is not None:
+        return retry_after + random.uniform(0, retry_after * 0.1)
+    return random.uniform(0, min(cap, base * 2**attempt))
@@ -0,0 +1,117 @@
+import io
+import json
+import zlib
+from typing import Any, Protocol
+
+import msgpack
+import numpy as np
+
+RAW = b"\x00"
+"""Flag byte of values stored as encoded."""
+COMPRESSED = b"\x01"
+"""Flag byte of zlib-compressed values."""
+
+
+class Codec(Protocol):
+    def encode(self, value: Any) -> bytes: ...
+
+    def decode(self, data: bytes) -> Any: ...
+
+
+class StrCodec:
+    """UTF-8 text, other values are stored as their str()."""
+
+    def encode(self, value: Any) -> bytes:
+        return (value if isinstance(value, str) else str(value)).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return data.decode("utf-8")
+
+
+class JsonCodec:
+    def encode(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data: bytes) -> Any:
+        return json.loads(data)
+
+
+class MsgpackCodec:
+    """Compact binary encoding of JSON-like values, bytes included."""
+
+    def encode(self, value: Any) -> bytes:
+        return msgpack.packb(value, use_bin_type=True)  # type: ignore
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data, raw=False)
+
+
+class BytesCodec:
+    def encode(self, value: Any) -> bytes:
+        return bytes(value)
+
+    def decode(self, data: bytes) -> Any:
+        return data
+
+
+class NumpyCodec:
+    """NumPy arrays in the .npy format, which records their dtype and shape."""
+
+    def encode(self, value: Any) -> bytes:
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(value), allow_pickle=False)
+        return buffer.getvalue()
+
+    def decode(self, data: bytes) -> Any:
+        return np.load(io.BytesIO(data), allow_pickle=False)
+
+
+CODECS: dict[str, Codec] = {
+    "str": StrCodec(),
+    "json": JsonCodec(),
+    "msgpack": MsgpackCodec(),
+    "bytes": BytesCodec(),
+    "numpy": NumpyCodec(),
+}
+
+
+def get_codec(name: str) -> Codec:
+    try:
+        return CODECS[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown codec: {name}, expected one of {', '.join(CODECS)}"
+        ) from None
+
+
+def compress(data: bytes, threshold: int | None, level: int = 6) -> bytes:
+    """
+    zlib-compress `data` of at least `threshold` bytes, when it gets smaller.
+
+    With compression enabled every value is stored after a flag byte telling
+    whether it is compressed. Disabled (None), values are stored as encoded.
+    """
+    if threshold is None:
+        return data
+    if len(data) >= threshold:
+        compressed = zlib.compress(data, level)
+        if len(compressed) < len(data):
+            return COMPRESSED + compressed
+    return RAW + data
+
+
+def decompress(data: bytes, flagged: bool = True) -> bytes:
+    """
+    Inverse of `compress`, `flagged` if it was called with a threshold.
+
+    Values without a flag byte, written before compression was enabled or by
+    other clients, are returned as is.
+    """
+    if not flagged:
+        return data
+    flag, payload = data[:1], data[1:]
+    if flag == RAW:
+        return payload
+    if flag == COMPRESSED:
+        return zlib.decompress(payload)
+    return data
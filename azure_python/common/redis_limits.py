@@ -0,0 +1,363 @@
+import asyncio
+import random
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from typing import TypeVar
+
+from azure_python.protocols.i_azure_managed_redis_service import (
+    IAzureManagedRedisService,
+)
+
+KEY_PREFIX = "limits:v1:"
+
+T = TypeVar("T")
+
+# Both scripts queue their callers by ticket and forget the waiters that
+# stopped polling, so that a crashed process cannot block the others.
+ENQUEUE = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local id = ARGV[1]
+local waiter_timeout = tonumber(ARGV[2])
+local expiry = math.ceil(tonumber(ARGV[3]) * 1000)
+
+local dead = redis.call('ZRANGEBYSCORE', KEYS[3], '-inf', now - waiter_timeout)
+for _, waiter in ipairs(dead) do
+  redis.call('ZREM', KEYS[2], waiter)
+  redis.call('ZREM', KEYS[3], waiter)
+end
+if not redis.call('ZSCORE', KEYS[2], id) then
+  redis.call('ZADD', KEYS[2], redis.call('INCR', KEYS[4]), id)
+end
+redis.call('ZADD', KEYS[3], now, id)
+for i = 2, 4 do
+  redis.call('PEXPIRE', KEYS[i], expiry)
+end
+"""
+
+SLIDING_WINDOW_ACQUIRE = (
+    ENQUEUE
+    + """
+if redis.call('ZRANGE', KEYS[2], 0, 0)[1] ~= id then
+  return {0, '-1'}
+end
+
+local limit = tonumber(ARGV[4])
+local window = tonumber(ARGV[5])
+local amount = math.min(tonumber(ARGV[6]), limit)
+local index = math.floor(now / window)
+local state = redis.call('HMGET', KEYS[1], 'index', 'current', 'previous')
+local stored = tonumber(state[1])
+local current = tonumber(state[2]) or 0
+local previous = tonumber(state[3]) or 0
+if stored ~= index then
+  if stored == index - 1 then previous = current else previous = 0 end
+  current = 0
+end
+
+local weight = 1 - (now - index * window) / window
+local used = previous * weight + current
+if used + amount > limit then
+  local wait = (index + 1) * window - now
+  if previous > 0 and current + amount <= limit then
+    wait = (weight - (limit - current - amount) / previous) * window
+  end
+  return {0, tostring(wait)}
+end
+
+redis.call('HSET', KEYS[1], 'index', index, 'current', current + amount,
+  'previous', previous)
+redis.call('PEXPIRE', KEYS[1], math.ceil(window * 2000))
+redis.call('ZREM', KEYS[2], id)
+redis.call('ZREM', KEYS[3], id)
+return {1, tostring(limit - used - amount)}
+"""
+)
+
+SLIDING_WINDOW_ADJUST = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local window = tonumber(ARGV[1])
+local stored = tonumber(redis.call('HGET', KEYS[1], 'index'))
+if stored and stored >= math.floor(now / window) - 1 then
+  local current = tonumber(redis.call('HGET', KEYS[1], 'current')) or 0
+  redis.call('HSET', KEYS[1], 'current', math.max(current + tonumber(ARGV[2]), 0))
+end
+"""
+
+SEMAPHORE_ACQUIRE = (
+    ENQUEUE
+    + """
+local limit = tonumber(ARGV[4])
+local lease = tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZSCORE', KEYS[1], id) then
+  redis.call('ZREM', KEYS[2], id)
+  redis.call('ZREM', KEYS[3], id)
+  return 1
+end
+
+local free = limit - redis.call('ZCARD', KEYS[1])
+if free > 0 and redis.call('ZRANK', KEYS[2], id) < free then
+  redis.call('ZREM', KEYS[2], id)
+  redis.call('ZREM', KEYS[3], id)
+  redis.call('ZADD', KEYS[1], now + lease, id)
+  redis.call('PEXPIRE', KEYS[1], math.ceil(lease * 1000))
+  return 1
+end
+return 0
+"""
+)
+
+SEMAPHORE_EXTEND = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local lease = tonumber(ARGV[2])
+local expires_at = tonumber(redis.call('ZSCORE', KEYS[1], ARGV[1]))
+if not expires_at or expires_at <= now then
+  return 0
+end
+redis.call('ZADD', KEYS[1], now + lease, ARGV[1])
+if redis.call('PTTL', KEYS[1]) < lease * 1000 then
+  redis.call('PEXPIRE', KEYS[1], math.ceil(lease * 1000))
+end
+return 1
+"""
+
+LEAVE = """
+for _, key in ipairs(KEYS) do
+  redis.call('ZREM', key, ARGV[1])
+end
+"""
+
+
+class RedisWaitQueue:
+    """
+    Shared base of the Redis limits: a fair (FIFO) queue of waiters.
+
+    Keys share the `{name}` hash tag so that each script touches a single
+    slot in cluster mode. Times come from the Redis server clock, so the
+    processes do not need synchronized clocks. Waiters poll with jitter and
+    are dropped from the queue when they have not polled for
+    `waiter_timeout` seconds, or when their wait is cancelled. Each script
+    call fails with TimeoutError after `command_timeout` seconds, if given,
+    rather than waiting for the retries of the client on an unreachable Redis.
+    """
+
+    def __init__(
+        self,
+        redis: IAzureManagedRedisService,
+        name: str,
+        poll_interval: float = 0.05,
+        max_poll_interval: float = 1.0,
+        waiter_timeout: float = 10.0,
+        sleep: Callable[[float], Awaitable[None]] = asyncio.sleep,
+        command_timeout: float | None = None,
+    ) -> None:
+        if max_poll_interval >= waiter_timeout:
+            raise ValueError("max_poll_interval must be less than waiter_timeout")
+        self.redis = redis
+        self.name = name
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.waiter_timeout = waiter_timeout
+        self.sleep = sleep
+        self.command_timeout = command_timeout
+        self.leave_script = redis.register_script(LEAVE)
+
+    def key(self, suffix: str) -> str:
+        return f"{KEY_PREFIX}{{{self.name}}}:{suffix}"
+
+    def queue_keys(self) -> list[str]:
+        return [self.key("queue"), self.key("seen"), self.key("ticket")]
+
+    async def call(self, command: Awaitable[T]) -> T:
+        return await asyncio.wait_for(command, self.command_timeout)
+
+    async def wait(
+        self, id: str, attempt: Callable[[], Awaitable[float | None]]
+    ) -> None:
+        """
+        Call `attempt` until it succeeds (returns None).
+
+        :param attempt: Tries to acquire, returns the seconds to wait before
+            trying again (negative if unknown) when it fails.
+        """
+        try:
+            while (wait := await self.call(attempt())) is not None:
+                delay = wait if wait >= 0 else self.poll_interval
+                delay = min(max(delay, self.poll_interval), self.max_poll_interval)
+                await self.sleep(delay * random.uniform(0.8, 1.0))
+        except BaseException:
+            await self.leave(id)
+            raise
+
+    async def leave(self, id: str) -> None:
+        await self.call(self.leave_script(keys=self.queue_keys()[:2], args=[id]))
+
+
+class RedisRateLimiter(RedisWaitQueue):
+    """
+    Rate limit shared by every process, over a sliding window.
+
+    Allows `limit` units (requests, tokens) per `window` seconds. The window
+    is approximated with two fixed windows: the count of the previous one is
+    weighted by the fraction of it that is still in the sliding window, which
+    keeps the state at one small hash whatever the limit. Callers are served
+    in FIFO order across processes: only the head of the queue is granted,
+    so large requests are not starved by small ones.
+    """
+
+    def __init__(
+        self,
+        redis: IAzureManagedRedisService,
+        name: str,
+        limit: int,
+        window: float = 60.0,
+        **kwargs,
+    ) -> None:
+        super().__init__(redis, name, **kwargs)
+        if limit < 1:
+            raise ValueError("limit must be greater than or equal to 1")
+        self.limit = limit
+        self.window = window
+        self.acquire_script = redis.register_script(SLIDING_WINDOW_ACQUIRE)
+        self.adjust_script = redis.register_script(SLIDING_WINDOW_ADJUST)
+
+    async def attempt(self, id: str, amount: int) -> float | None:
+        granted, wait = await self.acquire_script(
+            keys=[self.key("window"), *self.queue_keys()],
+            args=[
+                id,
+                self.waiter_timeout,
+                max(self.window * 2, self.waiter_timeout),
+                self.limit,
+                self.window,
+                amount,
+            ],
+        )
+        return None if int(granted) else float(wait)
+
+    async def acquire(self, amount: int = 1) -> None:
+        """
+        Wait for the turn of this caller and until `amount` fits in the window.
+
+        :param amount: The units to take, at most `limit`.
+        """
+        id = uuid.uuid4().hex
+        await self.wait(id, lambda: self.attempt(id, amount))
+
+    async def adjust(self, delta: int) -> None:
+        """Add `delta` (negative to give back) units to the current window."""
+        if delta:
+            await self.call(
+                self.adjust_script(keys=[self.key("window")], args=[self.window, delta])
+            )
+
+
+class RedisSemaphore(RedisWaitQueue):
+    """
+    Counting semaphore shared by every process.
+
+    At most `limit` holders at a time. A holder keeps its slot for `lease`
+    seconds, so the slots of crashed processes come back; long holders call
+    `extend`. Waiters are granted in FIFO order across processes.
+    """
+
+    def __init__(
+        self,
+        redis: IAzureManagedRedisService,
+        name: str,
+        limit: int,
+        lease: float = 60.0,
+        **kwargs,
+    ) -> None:
+        super().__init__(redis, name, **kwargs)
+        if limit < 1:
+            raise ValueError("limit must be greater than or equal to 1")
+        self.limit = limit
+        self.lease = lease
+        self.acquire_script = redis.register_script(SEMAPHORE_ACQUIRE)
+        self.extend_script = redis.register_script(SEMAPHORE_EXTEND)
+
+    async def attempt(self, id: str) -> float | None:
+        granted = await self.acquire_script(
+            keys=[self.key("holders"), *self.queue_keys()],
+            args=[
+                id,
+                self.waiter_timeout,
+                max(self.lease, self.waiter_timeout) * 2,
+                self.limit,
+                self.lease,
+            ],
+        )
+        return None if int(granted) else -1
+
+    async def acquire(self) -> str:
+        """
+        Wait for a slot.
+
+        :return: The id of the holder, to `extend` and `release` the slot.
+        """
+        id = uuid.uuid4().hex
+        await self.wait(id, lambda: self.attempt(id))
+        return id
+
+    async def extend(self, id: str) -> bool:
+        """Renew the lease of a holder, False if it already expired."""
+        extended = await self.call(
+            self.extend_script(keys=[self.key("holders")], args=[id, self.lease])
+        )
+        return bool(int(extended))
+
+    async def release(self, id: str) -> None:
+        await self.call(self.leave_script(keys=[self.key("holders")], args=[id]))
+
+    @asynccontextmanager
+    async def hold(self) -> AsyncIterator[str]:
+        id = await self.acquire()
+        try:
+            yield id
+        finally:
+            await self.release(id)
+
+
+class RedisQuotaLimiter:
+    """
+    Requests-per-minute and tokens-per-minute quotas shared by every process.
+
+    Mirrors `acquire` and `reconcile` of TokenBucketRateLimiter, so that the
+    processes of a deployment jointly stay under its quota. A limit of None
+    disables that window.
+    """
+
+    def __init__(
+        self,
+        redis: IAzureManagedRedisService,
+        name: str,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+        **kwargs,
+    ) -> None:
+        self.requests = (
+            RedisRateLimiter(redis, f"{name}:requests", requests_per_minute, **kwargs)
+            if requests_per_minute
+            else None
+        )
+        self.tokens = (
+            RedisRateLimiter(redis, f"{name}:tokens", tokens_per_minute, **kwargs)
+            if tokens_per_minute
+            else None
+        )
+
+    async def acquire(self, tokens: int = 0) -> None:
+        if self.requests:
+            await self.requests.acquire()
+        if self.tokens:
+            await self.tokens.acquire(min(tokens, self.tokens.limit))
+
+    async def reconcile(self, estimated: int, actual: int) -> None:
+        if self.tokens:
+            estimated = min(estimated, self.tokens.limit)
+            await self.tokens.adjust(actual - estimated)
@@ -0,0 +1,38 @@
+import asyncio
+from collections.abc import Awaitable, Callable, Hashable
+from typing import Generic, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class SingleFlight(Generic[K, V]):
+    """
+    Coalesces concurrent calls with the same key into one call.
+
+    The first caller of a key starts the call; the callers that arrive while
+    it is in flight wait for its result (or exception) instead of starting
+    their own. The call runs in a task, so cancelling one of the callers does
+    not cancel it for the others.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[K, asyncio.Future[V]] = {}
+        self.coalesced = 0
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.calls
+
+    async def do(self, key: K, fn: Callable[[], Awaitable[V]]) -> V:
+        future = self.calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+        else:
+            future = asyncio.ensure_future(fn())
+            self.calls[key] = future
+            future.add_done_callback(lambda done: self.forget(key, done))
+        return await asyncio.shield(future)
+
+    def forget(self, key: K, future: asyncio.Future[V]) -> None:
+        if self.calls.get(key) is future:
+            del self.calls[key]
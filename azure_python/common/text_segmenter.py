@@ -0,0 +1,69 @@
+import re
+from bisect import bisect_left, bisect_right
+
+# end of a sentence: terminal punctuation, closing quotes or brackets, then
+# whitespace; or a blank line
+SENTENCE_END = re.compile(r"[.!?…。！？]+[\"'”’)\]]*\s+|\n\s*\n")
+
+
+def sentence_boundaries(text: str) -> list[int]:
+    """Offsets where a sentence starts, from 0 to len(text) included."""
+    bounds = [0]
+    bounds.extend(m.end() for m in SENTENCE_END.finditer(text))
+    if bounds[-1] != len(text):
+        bounds.append(len(text))
+    return bounds
+
+
+def segment_text(text: str, max_chars: int, overlap: int = 0) -> list[tuple[int, int]]:
+    """
+    Split `text` in segments of at most `max_chars` characters.
+
+    Segments end at sentence boundaries when possible, then at whitespace, and
+    only cut words when there is neither. Each segment repeats the whole
+    sentences of the previous one that fit in the last `overlap` characters,
+    or its whole words if it was cut within a sentence, so that content
+    spanning a cut is still seen in context.
+
+    :param text: The text to split.
+    :param max_chars: The maximum length of a segment.
+    :param overlap: The maximum number of characters shared by two segments.
+    :raises ValueError: If overlap is not between 0 and max_chars / 2.
+    :return: The (start, end) offsets of the segments.
+    """
+    if max_chars < 1:
+        raise ValueError("max_chars must be greater than or equal to 1")
+    if not 0 <= overlap <= max_chars // 2:
+        raise ValueError("overlap must be between 0 and max_chars / 2")
+    if len(text) <= max_chars:
+        return [(0, len(text))]
+
+    bounds = sentence_boundaries(text)
+    segments: list[tuple[int, int]] = []
+    start = 0
+    while start < len(text):
+        limit = start + max_chars
+        if limit >= len(text):
+            end = len(text)
+        else:
+            end = bounds[bisect_right(bounds, limit) - 1]
+            if end <= start:
+                space = text.rfind(" ", start + 1, limit)
+                end = space + 1 if space > start else limit
+        segments.append((start, end))
+        if end >= len(text):
+            break
+
+        next_start = end
+        if overlap:
+            candidate = bounds[bisect_left(bounds, end - overlap)]
+            if start < candidate < end:
+                next_start = candidate
+            elif candidate > end:
+                # cut within a sentence, repeat the words before the cut
+                space = text.find(" ", max(start, end - overlap), end)
+                if space >= 0 and space + 1 < end:
+                    next_start = space + 1
+        start = next_start
+
+    return segments
@@ -0,0 +1,218 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from dataclasses import dataclass
+
+import tiktoken
+from openai.types.chat import ChatCompletionMessageParam
+
+from azure_python.common.ttl_cache import TTLCache
+
+DEFAULT_ENCODING = "o200k_base"
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_NAME = 1
+TOKENS_PER_REPLY = 3
+TOKENS_PER_IMAGE = 85
+MAX_CACHED_COUNTS = 4096
+MAX_ENCODING_RETRY_SECONDS = 300.0
+
+logger = logging.getLogger(__name__)
+
+
+class PromptTooLongError(ValueError):
+    pass
+
+
+@dataclass
+class EncodingFailure:
+    attempts: int
+    retry_at: float
+
+
+encodings: dict[str, tiktoken.Encoding] = {}
+encoding_failures: dict[str, EncodingFailure] = {}
+# keyed by a digest of the text, so that long system prompts are memoized
+# without being kept in memory
+counts: TTLCache[tuple[str, bytes], int] = TTLCache(MAX_CACHED_COUNTS)
+
+
+def backing_off(encoding_name: str) -> bool:
+    failure = encoding_failures.get(encoding_name)
+    return failure is not None and time.monotonic() < failure.retry_at
+
+
+def get_encoding(encoding_name: str) -> tiktoken.Encoding | None:
+    """
+    Load a tiktoken encoding, None if it is not available.
+
+    A loaded encoding is kept. After a failure (e.g. the download failed) the
+    load is retried with an exponential backoff, counts are estimated meanwhile.
+    """
+    encoding = encodings.get(encoding_name)
+    if encoding is not None or backing_off(encoding_name):
+        return encoding
+
+    try:
+        encoding = tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        failure = encoding_failures.get(encoding_name)
+        attempts = failure.attempts + 1 if failure else 1
+        delay = min(MAX_ENCODING_RETRY_SECONDS, 2.0**attempts)
+        encoding_failures[encoding_name] = EncodingFailure(
+            attempts, time.monotonic() + delay
+        )
+        logger.warning(
+            f"tiktoken encoding {encoding_name} unavailable, estimating "
+            f"for {delay:.0f}s: {e}"
+        )
+        return None
+
+    encodings[encoding_name] = encoding
+    encoding_failures.pop(encoding_name, None)
+    return encoding
+
+
+async def load_encoding(encoding_name: str) -> tiktoken.Encoding | None:
+    """
+    Load an encoding without blocking the event loop, it may be downloaded.
+
+    Returns right away when the encoding is loaded or its load is backing off.
+    """
+    encoding = encodings.get(encoding_name)
+    if encoding is not None or backing_off(encoding_name):
+        return encoding
+    return await asyncio.to_thread(get_encoding, encoding_name)
+
+
+def count_text(encoding_name: str, text: str) -> int:
+    """Number of tokens of `text`, memoized: roles and system prompts repeat a
+    lot. Estimates made without the encoding are not memoized."""
+    key = (encoding_name, hashlib.blake2b(text.encode(), digest_size=16).digest())
+    count = counts.get(key)
+    if count is not None:
+        return count
+
+    encoding = get_encoding(encoding_name)
+    if encoding is None:
+        # roughly 4 characters per token
+        return (len(text) + 3) // 4
+    count = len(encoding.encode(text, disallowed_special=()))
+    counts.set(key, count)
+    return count
+
+
+def clear_caches() -> None:
+    """Forget the loaded encodings, their failures and the memoized counts."""
+    encodings.clear()
+    encoding_failures.clear()
+    counts.clear()
+
+
+def encoding_name_for_model(model: str, default: str = DEFAULT_ENCODING) -> str:
+    """Encoding name of a model; Azure deployment names often are not model names."""
+    try:
+        return tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        return default
+
+
+class TokenCounter:
+    """
+    Counts the prompt tokens of chat completion messages.
+
+    Follows the accounting of the chat completion API: every message costs a
+    few tokens on top of its content, and the reply is primed with 3 tokens.
+    """
+
+    def __init__(self, encoding_name: str = DEFAULT_ENCODING) -> None:
+        self.encoding_name = encoding_name
+
+    @classmethod
+    def for_model(cls, model: str) -> "TokenCounter":
+        return cls(encoding_name_for_model(model))
+
+    async def load(self) -> None:
+        """Load the encoding off the event loop, before counting in it."""
+        await load_encoding(self.encoding_name)
+
+    def count_text(self, text: str) -> int:
+        return count_text(self.encoding_name, text)
+
+    def count_message(self, message: ChatCompletionMessageParam) -> int:
+        tokens = TOKENS_PER_MESSAGE + self.count_text(str(message.get("role", "")))
+
+        content = message.get("content")
+        if isinstance(content, str):
+            tokens += self.count_text(content)
+        elif content:
+            for part in content:  # type: ignore
+                if part.get("type") == "text":
+                    tokens += self.count_text(str(part.get("text", "")))
+                else:
+                    tokens += TOKENS_PER_IMAGE
+
+        name = message.get("name")
+        if name:
+            tokens += TOKENS_PER_NAME + self.count_text(str(name))
+
+        tool_calls = message.get("tool_calls")
+        if tool_calls:
+            tokens += self.count_text(json.dumps(tool_calls, default=str))
+        return tokens
+
+    def count_messages(self, messages: list[ChatCompletionMessageParam]) -> int:
+        return sum(self.count_message(m) for m in messages) + TOKENS_PER_REPLY
+
+    def trim_messages(
+        self, messages: list[ChatCompletionMessageParam], budget: int
+    ) -> tuple[list[ChatCompletionMessageParam], int]:
+        """
+        Drop the oldest messages of the history until the prompt fits `budget`.
+
+        System and developer messages and the last message are always kept,
+        with the tool call that the last message answers if it is a tool result.
+
+        :param messages: The messages to trim.
+        :param budget: The maximum number of prompt tokens.
+        :raises PromptTooLongError: If the messages that are kept do not fit.
+        :return: The messages that fit in the budget, in their original order,
+            and their number of tokens.
+        """
+        counts = [self.count_message(m) for m in messages]
+        total = sum(counts) + TOKENS_PER_REPLY
+        if total <= budget:
+            return messages, total
+
+        # the API rejects tool results without the assistant message calling them
+        last = len(messages) - 1
+        while last > 0 and messages[last].get("role") == "tool":
+            last -= 1
+        pinned = {
+            i
+            for i, m in enumerate(messages)
+            if m.get("role") in ("system", "developer") or i >= last
+        }
+        dropped: set[int] = set()
+        for i in range(len(messages)):
+            if total <= budget:
+                break
+            if i in pinned:
+                continue
+            dropped.add(i)
+            total -= counts[i]
+
+        # an assistant tool call must not be separated from its tool results
+        for i, m in enumerate(messages):
+            if m.get("role") != "tool" or i in pinned or i in dropped:
+                continue
+            if i - 1 in dropped:
+                dropped.add(i)
+                total -= counts[i]
+
+        if total > budget:
+            raise PromptTooLongError(
+                f"prompt needs {total} tokens, the budget is {budget} tokens"
+            )
+        return [m for i, m in enumerate(messages) if i not in dropped], total
@@ -0,0 +1,75 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Generic, TypeVar
+
+K = TypeVar("K")
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    """
+    In-process LRU cache whose entries expire `ttl` seconds after being set.
+
+    Holds at most `max_entries` entries and evicts the least recently used one
+    when full. Expired entries are dropped lazily, when they are read or reach
+    the LRU end. A ttl of None never expires entries.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be greater than or equal to 1")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: K) -> bool:
+        entry = self.entries.get(key)
+        return entry is not None and entry[0] > self.clock()
+
+    def get(self, key: K, default: V | None = None) -> V | None:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            self.misses += 1
+            return default
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: K, value: V, ttl: float | None = None) -> None:
+        """Store `value`, `ttl` overrides the default time to live of the cache."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = float("inf") if ttl is None else self.clock() + ttl
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def delete(self, key: K) -> bool:
+        return self.entries.pop(key, None) is not None
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
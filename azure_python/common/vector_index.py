@@ -0,0 +1,357 @@
+import json
+from collections.abc import Callable, Mapping, Sequence
+from pathlib import Path
+from typing import Any, Literal
+
+import numpy as np
+
+from azure_python.common.vectors import l2_normalize
+from azure_python.models.vector_search_hit import VectorSearchHit
+
+Metric = Literal["cosine", "dot"]
+MetadataFilter = Mapping[str, Any] | Callable[[dict[str, Any]], bool]
+
+BLOCK_ROWS = 65536
+"""Rows scored per matrix multiplication, bounds the memory of a search."""
+MIN_CAPACITY = 1024
+TRAINING_SAMPLES_PER_LIST = 256
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the closest centroid (euclidean) of each vector."""
+    # argmin |x - c|^2 == argmax x.c - |c|^2 / 2
+    bias = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), BLOCK_ROWS):
+        block = vectors[start : start + BLOCK_ROWS]
+        assignments[start : start + len(block)] = np.argmax(
+            block @ centroids.T - bias, axis=1
+        )
+    return assignments
+
+
+def kmeans(
+    vectors: np.ndarray, n_clusters: int, iterations: int, seed: int, spherical: bool
+) -> np.ndarray:
+    """
+    Lloyd's k-means, initialized with random vectors.
+
+    :param spherical: Normalize the centroids after each step, for cosine.
+    :return: The (n_clusters, dim) centroids.
+    """
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = nearest_centroids(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, vectors)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        # an empty cluster keeps its centroid
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        if spherical:
+            l2_normalize(centroids)
+    return centroids
+
+
+def matches(metadata: dict[str, Any], where: MetadataFilter) -> bool:
+    if isinstance(where, Mapping):
+        return all(metadata.get(key) == value for key, value in where.items())
+    return where(metadata)
+
+
+def merge_top_k(
+    scores: np.ndarray, rows: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Keep the `k` best scores of each row of `scores`, unordered."""
+    if scores.shape[1] <= k:
+        return scores, rows
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return (
+        np.take_along_axis(scores, best, axis=1),
+        np.take_along_axis(rows, best, axis=1),
+    )
+
+
+class VectorIndex:
+    """
+    In-process vector index with top-k search by cosine similarity or dot product.
+
+    Search is exact by default: the queries are multiplied with blocks of the
+    stored matrix while a running top-k is kept, so memory stays bounded on
+    large indexes. After `train` the index is also an inverted file (IVF):
+    every vector is assigned to its closest k-means centroid, and searches with
+    `nprobe` only score the vectors of the `nprobe` lists closest to the query.
+    Removed vectors are tombstoned until `compact` or `save`.
+    """
+
+    def __init__(self, dim: int, metric: Metric = "cosine") -> None:
+        if metric not in ("cosine", "dot"):
+            raise ValueError(f"unknown metric: {metric}")
+        self.dim = dim
+        self.metric = metric
+        self.vectors = np.empty((0, dim), dtype=np.float32)
+        self.alive = np.zeros(0, dtype=bool)
+        self.lists = np.zeros(0, dtype=np.int32)
+        """IVF list of each row, once trained."""
+        self.centroids: np.ndarray | None = None
+        self.ids: list[str] = []
+        self.metadata: list[dict[str, Any]] = []
+        self.rows: dict[str, int] = {}
+        self.size = 0
+        """Number of rows in use, removed rows included."""
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self.rows
+
+    def reserve(self, capacity: int) -> None:
+        """Grow the storage to hold `capacity` rows; copies a read-only memory map."""
+        current = self.vectors.shape[0]
+        if capacity <= current and self.vectors.flags.writeable:
+            return
+
+        capacity = max(capacity, 2 * current, MIN_CAPACITY)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[: self.size] = self.vectors[: self.size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self.size] = self.alive[: self.size]
+        lists = np.zeros(capacity, dtype=np.int32)
+        lists[: self.size] = self.lists[: self.size]
+        self.vectors, self.alive, self.lists = vectors, alive, lists
+
+    def prepare(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.array(vectors, dtype=np.float32, ndmin=2)
+        if vectors.shape[1] != self.dim:
+            raise ValueError(
+                f"expected vectors of {self.dim} dimensions, got {vectors.shape[1]}"
+            )
+        return l2_normalize(vectors) if self.metric == "cosine" else vectors
+
+    def add(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        metadata: Sequence[dict[str, Any]] | None = None,
+    ) -> None:
+        """
+        Add vectors to the index, replacing the ones with the same ids.
+
+        :param ids: The ids of the vectors, unique.
+        :param vectors: The (len(ids), dim) vectors, e.g. from embed_matrix.
+        :param metadata: The metadata of each vector, used to filter searches.
+        :raises ValueError: If the ids are not unique or the shapes do not match.
+        """
+        vectors = self.prepare(vectors)
+        if len(set(ids)) != len(ids):
+            raise ValueError("ids must be unique")
+        if len(vectors) != len(ids) or (
+            metadata is not None and len(metadata) != len(ids)
+        ):
+            raise ValueError("ids, vectors and metadata must have the same length")
+
+        self.remove([id for id in ids if id in self.rows])
+        self.reserve(self.size + len(ids))
+
+        start, end = self.size, self.size + len(ids)
+        self.vectors[start:end] = vectors
+        self.alive[start:end] = True
+        if self.centroids is not None:
+            self.lists[start:end] = nearest_centroids(vectors, self.centroids)
+        self.ids.extend(ids)
+        self.metadata.extend(
+            dict(m) for m in (metadata if metadata is not None else [{}] * len(ids))
+        )
+        for row, id in enumerate(ids, start):
+            self.rows[id] = row
+        self.size = end
+
+    def remove(self, ids: Sequence[str]) -> int:
+        """Remove vectors by id, unknown ids are ignored; return the number removed."""
+        removed = 0
+        for id in ids:
+            row = self.rows.pop(id, None)
+            if row is not None:
+                self.alive[row] = False
+                self.metadata[row] = {}
+                removed += 1
+
+        if self.size - len(self.rows) > max(self.size // 2, MIN_CAPACITY):
+            self.compact()
+        return removed
+
+    def compact(self) -> None:
+        """Drop the removed rows from the storage."""
+        keep = np.flatnonzero(self.alive[: self.size])
+        self.vectors = self.vectors[keep]
+        self.lists = self.lists[keep]
+        self.alive = np.ones(len(keep), dtype=bool)
+        self.ids = [self.ids[row] for row in keep]
+        self.metadata = [self.metadata[row] for row in keep]
+        self.rows = {id: row for row, id in enumerate(self.ids)}
+        self.size = len(keep)
+
+    def train(self, n_lists: int, iterations: int = 10, seed: int = 0) -> None:
+        """
+        Cluster the vectors in `n_lists` IVF lists for approximate search.
+
+        Vectors added later are assigned to the closest list; train again once
+        the distribution of the data changed a lot.
+
+        :param n_lists: The number of lists, about sqrt(len(index)) is typical.
+        :param iterations: The number of k-means iterations.
+        :param seed: The seed of the centroid initialization and sampling.
+        :raises ValueError: If there are fewer vectors than lists.
+        """
+        live = np.flatnonzero(self.alive[: self.size])
+        if n_lists < 1 or n_lists > len(live):
+            raise ValueError(f"n_lists must be between 1 and {len(live)}")
+
+        rng = np.random.default_rng(seed)
+        samples = min(len(live), n_lists * TRAINING_SAMPLES_PER_LIST)
+        training = self.vectors[np.sort(rng.choice(live, samples, replace=False))]
+        self.centroids = kmeans(
+            training, n_lists, iterations, seed, spherical=self.metric == "cosine"
+        )
+        self.lists[: self.size] = nearest_centroids(
+            self.vectors[: self.size], self.centroids
+        )
+
+    def allowed_rows(self, where: MetadataFilter | None) -> np.ndarray:
+        allowed = self.alive[: self.size].copy()
+        if where is None:
+            return allowed
+
+        for row in np.flatnonzero(allowed):
+            allowed[row] = matches(self.metadata[row], where)
+        return allowed
+
+    def search_exact(
+        self, queries: np.ndarray, k: int, allowed: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for start in range(0, self.size, BLOCK_ROWS):
+            end = min(start + BLOCK_ROWS, self.size)
+            scores = queries @ self.vectors[start:end].T
+            scores[:, ~allowed[start:end]] = -np.inf
+            rows = np.broadcast_to(np.arange(start, end), scores.shape)
+            best_scores, best_rows = merge_top_k(
+                np.concatenate([best_scores, scores], axis=1),
+                np.concatenate([best_rows, rows], axis=1),
+                k,
+            )
+        return best_scores, best_rows
+
+    def search_ivf(
+        self, query: np.ndarray, k: int, allowed: np.ndarray, nprobe: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        probes = np.argsort(-(self.centroids @ query))[:nprobe]  # type: ignore
+        rows = np.flatnonzero(allowed & np.isin(self.lists[: self.size], probes))
+        scores = self.vectors[rows] @ query
+        best_scores, best_rows = merge_top_k(scores[None], rows[None], k)
+        return best_scores[0], best_rows[0]
+
+    def search_many(
+        self,
+        queries: np.ndarray,
+        k: int = 10,
+        where: MetadataFilter | None = None,
+        nprobe: int | None = None,
+    ) -> list[list[VectorSearchHit]]:
+        """
+        Find the `k` vectors closest to each query.
+
+        :param queries: The (n, dim) query vectors.
+        :param k: The number of hits per query.
+        :param where: Only match vectors whose metadata has these values, or
+            for which this predicate is true.
+        :param nprobe: Only score the vectors of the `nprobe` IVF lists closest
+            to the query; exact search when None or the index is not trained.
+        :return: The hits of each query, best first.
+        """
+        queries = self.prepare(queries)
+        if k < 1 or self.size == 0:
+            return [[] for _ in queries]
+
+        allowed = self.allowed_rows(where)
+        if nprobe is None or self.centroids is None:
+            all_scores, all_rows = self.search_exact(queries, k, allowed)
+            found = list(zip(all_scores, all_rows))
+        else:
+            found = [self.search_ivf(q, k, allowed, nprobe) for q in queries]
+
+        results = []
+        for scores, rows in found:
+            order = np.argsort(-scores, kind="stable")
+            results.append(
+                [
+                    VectorSearchHit(
+                        id=self.ids[rows[i]],
+                        score=float(scores[i]),
+                        metadata=self.metadata[rows[i]],
+                    )
+                    for i in order
+                    if scores[i] > -np.inf
+                ]
+            )
+        return results
+
+    def search(
+        self,
+        query: np.ndarray,
+        k: int = 10,
+        where: MetadataFilter | None = None,
+        nprobe: int | None = None,
+    ) -> list[VectorSearchHit]:
+        """Find the `k` vectors closest to `query`, see `search_many`."""
+        return self.search_many(np.asarray(query)[None], k, where, nprobe)[0]
+
+    def save(self, directory: str) -> None:
+        """
+        Save the index to `directory`, compacting it first.
+
+        The vectors are stored as a .npy file so that `load` can memory-map
+        them; the metadata must be JSON serializable.
+        """
+        self.compact()
+        path = Path(directory)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "vectors.npy", self.vectors[: self.size])
+        np.save(path / "lists.npy", self.lists[: self.size])
+        if self.centroids is not None:
+            np.save(path / "centroids.npy", self.centroids)
+        (path / "index.json").write_text(
+            json.dumps(
+                {
+                    "dim": self.dim,
+                    "metric": self.metric,
+                    "ids": self.ids,
+                    "metadata": self.metadata,
+                }
+            )
+        )
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "VectorIndex":
+        """
+        Load an index saved with `save`.
+
+        :param mmap: Memory-map the vectors read-only instead of reading them;
+            they are copied in memory on the first `add`.
+        """
+        path = Path(directory)
+        meta = json.loads((path / "index.json").read_text())
+        index = cls(dim=meta["dim"], metric=meta["metric"])
+        index.vectors = np.load(path / "vectors.npy", mmap_mode="r" if mmap else None)
+        index.lists = np.load(path / "lists.npy")
+        if (path / "centroids.npy").exists():
+            index.centroids = np.load(path / "centroids.npy")
+        index.ids = meta["ids"]
+        index.metadata = meta["metadata"]
+        index.rows = {id: row for row, id in enumerate(index.ids)}
+        index.size = len(index.ids)
+        index.alive = np.ones(index.size, dtype=bool)
+        return index
@@ -0,0 +1,15 @@
+import numpy as np
+
+
+def allocate_matrix(shape: tuple[int, int], path: str | None = None) -> np.ndarray:
+    """Allocate a float32 matrix, memory-mapped to a .npy file at `path` if given."""
+    if path is None:
+        return np.empty(shape, dtype=np.float32)
+    return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=shape)
+
+
+def l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    """Scale the rows of `matrix` to unit L2 norm in place, zero rows are kept."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    np.divide(matrix, norms, out=matrix, where=norms > 0)
+    return matrix
@@ -81,7 +81,16 @@ def azure_openai_service() -> IAzureOpenAIService:
         AzureOpenAIService,
     )
 
-    return container[AzureOpenAIService]
+    svc = container[AzureOpenAIService]
+    if os.getenv("AZURE_OPENAI_SEMANTIC_CACHE", "false").lower() == "true":
+        from azure_python.services.semantic_cache_service import (
+            SemanticCacheService,
+        )
+
+        svc.semantic_cache = container[SemanticCacheService]
+    if os.getenv("AZURE_OPENAI_SHARED_QUOTA", "false").lower() == "true":
+        svc.share_quotas(container[IAzureManagedRedisService])
+    return svc
 
 
 @dependency_definition(container, singleton=True)
@@ -129,14 +138,45 @@ def content_safety_service() -> IContentSafetyService:
         ContentSafetyService,
     )
 
-    return container[ContentSafetyService]
+    svc = container[ContentSafetyService]
+    if os.getenv("CONTENT_SAFETY_CACHE", "false").lower() == "true":
+        from azure_python.common.moderation_cache import ModerationCache
+
+        redis = None
+        if os.getenv("CONTENT_SAFETY_CACHE_REDIS", "false").lower() == "true":
+            redis = container[IAzureManagedRedisService]
+
+        svc.cache = ModerationCache(
+            logger=container[logging.Logger],
+            max_entries=svc.env.content_safety_cache_max_entries,
+            ttl=svc.env.content_safety_cache_ttl_seconds,
+            redis=redis,
+        )
+    return svc
 
 
 @dependency_definition(container, singleton=True)
 def embedding_service() -> IEmbeddingService:
     from azure_python.services.embedding_service import EmbeddingService
 
-    return container[EmbeddingService]
+    svc = container[EmbeddingService]
+    backend = os.getenv("EMBEDDING_CACHE", "none").lower()
+    if backend in ("local", "redis"):
+        from azure_python.common.embedding_cache import (
+            EmbeddingCache,
+            LocalEmbeddingStore,
+            RedisEmbeddingStore,
+        )
+
+        svc.cache = EmbeddingCache(
+            LocalEmbeddingStore(svc.env.embedding_cache_dir)
+            if backend == "local"
+            else RedisEmbeddingStore(
+                container[IAzureManagedRedisService],
+                ttl=svc.env.embedding_cache_ttl_seconds,
+            )
+        )
+    return svc
 
 
 @dependency_definition(container, singleton=True)
@@ -172,7 +212,14 @@ def azure_resources_query() -> IAzureResourcesQueryService:
         AzureResourcesQueryService,
     )
 
-    return container[AzureResourcesQueryService]
+    svc = container[AzureResourcesQueryService]
+    if os.getenv("RESOURCES_QUERY_CACHE", "false").lower() == "true":
+        from azure_python.common.cache_aside import CacheAside
+
+        svc.cache = CacheAside(
+            container[IAzureManagedRedisService], container[logging.Logger]
+        )
+    return svc
 
 
 @dependency_definition(container, singleton=True)
@@ -0,0 +1,63 @@
+from pydantic import BaseModel
+
+from azure_python.models.llm_response import LLMResponse
+
+
+class ChatCompletionItemResult(BaseModel):
+    index: int
+    responses: list[LLMResponse] | None = None
+    error: str | None = None
+    fingerprint: str | None = None
+    """Hash of the request and its parameters, to match checkpoints to requests."""
+
+
+class ChatCompletionBatchResult(BaseModel):
+    results: list[list[LLMResponse] | None]
+    """Responses in input order, None for the requests that failed."""
+    errors: dict[int, str]
+    """Error message by input index."""
+    usages: dict[str, int]
+
+    @staticmethod
+    def aggregate_usages(items: list[ChatCompletionItemResult]) -> dict[str, int]:
+        """
+        Sum the token usages of all the requests.
+
+        All generations of a request share the prompt and total token counts,
+        whereas completion tokens are reported per generation.
+        """
+        totals: dict[str, int] = {}
+        for item in items:
+            if not item.responses:
+                continue
+
+            for key, value in item.responses[0].usages.items():
+                if isinstance(value, int) and key != "completion_tokens":
+                    totals[key] = totals.get(key, 0) + value
+
+            completion_tokens = sum(
+                r.usages.get("completion_tokens", 0) for r in item.responses
+            )
+            totals["completion_tokens"] = (
+                totals.get("completion_tokens", 0) + completion_tokens
+            )
+        return totals
+
+    @classmethod
+    def from_items(
+        cls, size: int, items: list[ChatCompletionItemResult]
+    ) -> "ChatCompletionBatchResult":
+        results: list[list[LLMResponse] | None] = [None] * size
+        errors: dict[int, str] = {}
+        for item in items:
+            results[item.index] = item.responses
+            if item.error is not None:
+                errors[item.index] = item.error
+
+        return cls(results=results, errors=errors, usages=cls.aggregate_usages(items))
+
+
+class BatchJobItemResult(BaseModel):
+    custom_id: str
+    responses: list[LLMResponse] | None = None
+    error: str | None = None
@@ -0,0 +1,62 @@
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ContentFilterHit(BaseModel):
+    category: str
+    reason: Literal["filtered", "severity", "detected"]
+    severity: str | None = None
+
+
+class ChoiceVerdict(BaseModel):
+    index: int
+    hits: list[ContentFilterHit]
+
+    @property
+    def safe(self) -> bool:
+        return not self.hits
+
+
+class ContentSafetyVerdict(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    prompt_hits: list[ContentFilterHit]
+    """Hits of the prompt filter results, shared by every choice."""
+    choice_hits: dict[int, list[ContentFilterHit]]
+    """Hits by choice index, only the choices with hits are present."""
+    num_choices: int
+
+    @property
+    def choices(self) -> list[ChoiceVerdict]:
+        """The verdict of each choice, built on access."""
+        return [
+            ChoiceVerdict(index=i, hits=self.choice_hits.get(i, []))
+            for i in range(self.num_choices)
+        ]
+
+    @property
+    def safe(self) -> bool:
+        return not self.prompt_hits and not self.choice_hits
+
+    def safe_choice_indexes(self) -> list[int]:
+        """Indexes of the choices that can be kept, none if the prompt was flagged."""
+        if self.prompt_hits:
+            return []
+        return [i for i in range(self.num_choices) if i not in self.choice_hits]
+
+    def failure_message(self) -> str:
+        """Why the response is rejected: the first hit of the prompt, else of the
+        first flagged choice."""
+        if self.prompt_hits:
+            hit = self.prompt_hits[0]
+        elif self.choice_hits:
+            hit = self.choice_hits[min(self.choice_hits)][0]
+        else:
+            return ""
+        detail = (
+            f"Severity: {str(hit.severity).lower()}"
+            if hit.reason == "severity"
+            else f"Category: {hit.category}"
+        )
+        return f"Content safety check failed. {detail}."
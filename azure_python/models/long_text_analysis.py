@@ -0,0 +1,52 @@
+from pydantic import BaseModel
+
+
+class SegmentOffset(BaseModel):
+    offset: int
+    length: int
+
+
+class CategorySeverity(BaseModel):
+    category: str
+    severity: int
+    """Highest severity found in any segment."""
+    segments: list[SegmentOffset]
+    """Segments that reached the highest severity, empty when it is 0."""
+
+
+class LongTextAnalysis(BaseModel):
+    categories: list[CategorySeverity]
+    segment_count: int
+
+    @classmethod
+    def reduce(
+        cls, segments: list[tuple[int, int]], results: list[list[dict]]
+    ) -> "LongTextAnalysis":
+        """
+        Reduce the analysis results of each segment to the max severity per category.
+
+        :param segments: The (start, end) offsets of the segments.
+        :param results: The results of each segment, as returned by collect_results.
+        """
+        categories: dict[str, CategorySeverity] = {}
+        for (start, end), items in zip(segments, results, strict=True):
+            for item in items:
+                category = item["category"]
+                severity = item.get("severity") or 0
+                current = categories.get(category)
+                if current is None or severity > current.severity:
+                    current = categories[category] = CategorySeverity(
+                        category=category, severity=severity, segments=[]
+                    )
+                if severity > 0 and severity == current.severity:
+                    current.segments.append(
+                        SegmentOffset(offset=start, length=end - start)
+                    )
+
+        return cls(categories=list(categories.values()), segment_count=len(segments))
+
+    def as_results(self) -> list[dict]:
+        """The max severities in the shape of ContentSafetyService.collect_results."""
+        return [
+            {"category": c.category, "severity": c.severity} for c in self.categories
+        ]
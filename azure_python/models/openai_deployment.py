@@ -0,0 +1,20 @@
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+
+
+class OpenAIDeployment(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
+    endpoint: str
+    deployment: str
+    weight: float = Field(default=1.0, gt=0)
+    api_key: str | None = None
+    requests_per_minute: int | None = None
+    tokens_per_minute: int | None = None
+
+    @staticmethod
+    def parse_list(data: str) -> list["OpenAIDeployment"]:
+        """Parse a JSON array of deployments, e.g. from an environment variable."""
+        deployments = TypeAdapter(list[OpenAIDeployment]).validate_json(data)
+        if not deployments:
+            raise ValueError("at least one deployment is required")
+        return deployments
@@ -1,3 +1,7 @@
+from array import array
+from bisect import bisect_right
+from collections.abc import Iterable, Iterator
+
 from pydantic import BaseModel, field_validator
 
 
@@ -12,12 +16,36 @@ class Sentence(BaseModel):
             raise ValueError("start must be greater than or equal to 0")
         return v
 
-    @staticmethod
-    def includes(sentences: list["Sentence"], start: int) -> str:
-        for sentence in sentences:
-            if start >= sentence.start and start <= sentence.start + len(
-                sentence.content
-            ):
-                return sentence.content
 
-        raise RuntimeError(f"Sentence not found with start index: {start}")
+class SentenceIndex:
+    """
+    Sentences of a document, as the start and end offsets of their spans.
+
+    The offsets are kept in two int arrays rather than a Sentence per
+    sentence, and the text of a sentence is sliced from the document when
+    looked up. The sentence of an offset is found by binary search over the
+    starts, in O(log n): it is the last sentence that starts at or before the
+    offset, if the offset is not past its end.
+    """
+
+    def __init__(self, content: str, spans: Iterable[tuple[int, int]]) -> None:
+        self.content = content
+        self.starts = array("q")
+        self.ends = array("q")
+        for start, end in sorted(spans):
+            self.starts.append(start)
+            self.ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def __iter__(self) -> Iterator[Sentence]:
+        for start, end in zip(self.starts, self.ends):
+            yield Sentence(content=self.content[start:end], start=start)
+
+    def find(self, offset: int) -> str:
+        i = bisect_right(self.starts, offset) - 1
+        if i >= 0 and offset <= self.ends[i]:
+            return self.content[self.starts[i] : self.ends[i]]
+
+        raise RuntimeError(f"Sentence not found with start index: {offset}")
@@ -0,0 +1,10 @@
+from typing import Any
+
+from pydantic import BaseModel
+
+
+class VectorSearchHit(BaseModel):
+    id: str
+    score: float
+    """Cosine similarity or dot product with the query, higher is closer."""
+    metadata: dict[str, Any]
@@ -1,4 +1,9 @@
-from typing import Any, Protocol
+from typing import Any, AsyncContextManager, AsyncIterator, Mapping, Protocol
+
+from redis.asyncio.client import Pipeline
+from redis.commands.core import AsyncScript
+
+from azure_python.common.redis_codecs import Codec
 
 
 class IAzureManagedRedisService(Protocol):
@@ -9,18 +14,160 @@ class IAzureManagedRedisService(Protocol):
         """
         ...
 
-    async def set(self, key: str, value: Any) -> None:
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int | None = None,
+        codec: str | Codec | None = None,
+    ) -> None:
         """Set a value in the Redis cache.
 
         :param key: The key under which the value is stored.
         :param value: The value to store.
+        :param ttl: The number of seconds after which the key expires, never if None.
+        :param codec: The codec (or its name) that encodes the value, by default
+            the codec of the key prefix or the default codec.
         """
         ...
 
-    async def get(self, key: str) -> Any:
+    async def get(self, key: str, codec: str | Codec | None = None) -> Any:
         """Get a value from the Redis cache.
 
+        When the near cache is enabled, values are served from process memory
+        until they expire or are invalidated, and concurrent reads of a key
+        that is not cached share one round trip.
+
         :param key: The key whose value is to be retrieved.
-        :return: The value stored under the given key.
+        :param codec: The codec (or its name) that decodes the value.
+        :return: The value stored under the given key, None if it does not exist.
+        """
+        ...
+
+    async def mget(
+        self, keys: list[str], codec: str | Codec | None = None
+    ) -> list[Any]:
+        """Get the values of many keys, in batches of one round trip each.
+
+        :param keys: The keys whose values are to be retrieved.
+        :param codec: The codec (or its name) that decodes the values.
+        :return: The values in the order of the keys, None for missing keys.
+        """
+        ...
+
+    async def mset(
+        self,
+        values: Mapping[str, Any],
+        ttl: int | Mapping[str, int] | None = None,
+        codec: str | Codec | None = None,
+    ) -> None:
+        """Set many values, in pipelined batches.
+
+        :param values: The values by key.
+        :param ttl: The number of seconds after which the keys expire, the same
+            for all keys or by key; keys without a ttl never expire.
+        :param codec: The codec (or its name) that encodes the values.
+        """
+        ...
+
+    async def delete_many(self, keys: list[str]) -> int:
+        """Delete many keys, in batches; the memory is reclaimed asynchronously.
+
+        :param keys: The keys to delete.
+        :return: The number of keys that existed.
+        """
+        ...
+
+    async def expire_many(self, keys: list[str], ttl: int) -> int:
+        """Set the expiry of many keys, in pipelined batches.
+
+        :param keys: The keys to expire.
+        :param ttl: The number of seconds after which the keys expire.
+        :return: The number of keys that existed.
+        """
+        ...
+
+    def iter_keys(
+        self, pattern: str = "*", count: int | None = None
+    ) -> AsyncIterator[str]:
+        """Iterate over the keys matching a pattern, with SCAN.
+
+        Each call examines about `count` keys, so the server is never blocked
+        for long, and on every node in cluster mode. Keys that exist during the
+        whole iteration are returned at least once, but possibly more than
+        once; keys added or removed meanwhile may or may not be returned.
+
+        :param pattern: A glob-style pattern, e.g. "session:{tenant}:*".
+        :param count: The keys examined per call, by default REDIS_SCAN_COUNT.
+        :return: The matching keys.
+        """
+        ...
+
+    async def delete_matching(self, pattern: str) -> int:
+        """Delete the keys matching a pattern, in batches as they are scanned.
+
+        Batches are spaced by REDIS_SCAN_PAUSE_SECONDS, to leave room for the
+        other clients when deleting many keys.
+
+        :param pattern: A glob-style pattern, e.g. "session:{tenant}:*".
+        :return: The number of keys deleted.
+        """
+        ...
+
+    async def expire_matching(self, pattern: str, ttl: int) -> int:
+        """Set the expiry of the keys matching a pattern, in batches.
+
+        :param pattern: A glob-style pattern, e.g. "session:{tenant}:*".
+        :param ttl: The number of seconds after which the keys expire.
+        :return: The number of keys whose expiry was set.
+        """
+        ...
+
+    async def invalidate(self, keys: list[str]) -> None:
+        """Drop keys from the near cache of every process.
+
+        Writes through `set`, `mset`, `delete_many`, `delete_matching` and the
+        short expiries of `expire_many` and `expire_matching` invalidate their
+        keys; call this after writing keys through `pipeline` or another client.
+
+        :param keys: The keys whose value changed.
+        """
+        ...
+
+    def near_cache_stats(self) -> dict[str, float]:
+        """Counters of the near cache of `get`.
+
+        :return: The hits, misses, coalesced misses, invalidations, entries and
+            hit rate, empty if the near cache is disabled.
+        """
+        ...
+
+    def latency_stats(self) -> dict[str, dict[str, float]]:
+        """Latency of the round trips to Redis, by command.
+
+        Pipelines are reported as PIPELINE, whatever their commands.
+
+        :return: The count, mean, p50, p90, p99 and max latency in seconds.
+        """
+        ...
+
+    def register_script(self, script: str) -> AsyncScript:
+        """Register a Lua script, run atomically on the server.
+
+        :param script: The Lua source.
+        :return: Runs the script with `keys` and `args`; it is sent once, then
+            called by its SHA1 digest.
+        """
+        ...
+
+    def pipeline(self, transaction: bool = False) -> AsyncContextManager[Pipeline]:
+        """Batch commands in one round trip.
+
+        The commands queued in the block are executed when it exits, unless
+        the block already called `execute` to read their results. Values go
+        through the pipeline as is, they are not encoded by the codecs.
+
+        :param transaction: Run the commands atomically, in MULTI / EXEC.
+        :return: The pipeline to queue the commands on.
         """
         ...
@@ -1,8 +1,14 @@
-from typing import Any, Protocol
+from typing import Any, AsyncIterator, Protocol
 
 from openai import AsyncAzureOpenAI
+from openai.types import Batch
 from openai.types.chat import ChatCompletionMessageParam
 
+from azure_python.models.chat_completion_batch_result import (
+    BatchJobItemResult,
+    ChatCompletionBatchResult,
+    ChatCompletionItemResult,
+)
 from azure_python.models.llm_response import LLMResponse
 
 
@@ -28,6 +34,7 @@ class IAzureOpenAIService(Protocol):
         messages: list[ChatCompletionMessageParam],
         temperature: float = 1.0,
         num_generations: int = 1,
+        bypass_cache: bool = False,
     ) -> list[LLMResponse]:
         """
         Perform a chat completion using the Azure OpenAI client.
@@ -35,6 +42,7 @@ class IAzureOpenAIService(Protocol):
         :param messages: The messages to send in the chat completion.
         :param temperature: The temperature for the completion.
         :param num_generations: The number of generations to produce.
+        :param bypass_cache: Skip the semantic cache (if enabled) for this call.
         :return: The content of the response message.
         """
         ...
@@ -56,3 +64,107 @@ class IAzureOpenAIService(Protocol):
         :return: The parsed response.
         """
         ...
+
+    def chat_completion_as_completed(
+        self,
+        requests: list[list[ChatCompletionMessageParam]],
+        concurrency: int = 8,
+        temperature: float = 1.0,
+        num_generations: int = 1,
+        checkpoint_path: str | None = None,
+    ) -> AsyncIterator[ChatCompletionItemResult]:
+        """
+        Perform many chat completions concurrently, yielding them as they complete.
+
+        :param requests: The messages of each chat completion.
+        :param concurrency: The maximum number of requests in flight.
+        :param temperature: The temperature for the completions.
+        :param num_generations: The number of generations to produce per request.
+        :param checkpoint_path: JSONL file recording the completed requests; the
+            requests found in it are not sent again.
+        :return: The result of each request, tagged with its input index.
+        """
+        ...
+
+    async def chat_completion_many(
+        self,
+        requests: list[list[ChatCompletionMessageParam]],
+        concurrency: int = 8,
+        temperature: float = 1.0,
+        num_generations: int = 1,
+        checkpoint_path: str | None = None,
+    ) -> ChatCompletionBatchResult:
+        """
+        Perform many chat completions concurrently.
+
+        :param requests: The messages of each chat completion.
+        :param concurrency: The maximum number of requests in flight.
+        :param temperature: The temperature for the completions.
+        :param num_generations: The number of generations to produce per request.
+        :param checkpoint_path: JSONL file recording the completed requests; the
+            requests found in it are not sent again.
+        :return: The responses in input order, the errors and the total usages.
+        """
+        ...
+
+    async def submit_batch(
+        self,
+        requests: dict[str, list[ChatCompletionMessageParam]],
+        temperature: float = 1.0,
+        num_generations: int = 1,
+    ) -> str:
+        """
+        Upload the requests as a JSONL file and create a batch job (Batch API).
+
+        :param requests: The messages of each chat completion, by custom id.
+        :param temperature: The temperature for the completions.
+        :param num_generations: The number of generations to produce per request.
+        :return: The id of the batch job.
+        """
+        ...
+
+    async def wait_for_batch(
+        self,
+        batch_id: str,
+        poll_interval: float = 60.0,
+        timeout: float | None = None,
+    ) -> Batch:
+        """
+        Poll a batch job until it is completed, failed, expired or cancelled.
+
+        :param batch_id: The id of the batch job.
+        :param poll_interval: Seconds between two polls.
+        :param timeout: Maximum number of seconds to wait, None to wait forever.
+        :raises TimeoutError: If the batch job is still running after `timeout`.
+        :return: The batch job.
+        """
+        ...
+
+    def iter_batch_results(self, batch_id: str) -> AsyncIterator[BatchJobItemResult]:
+        """
+        Stream the results of a completed batch job.
+
+        :param batch_id: The id of the batch job.
+        :return: The responses, or the error, of each request by custom id.
+        """
+        ...
+
+    def run_batch(
+        self,
+        requests: dict[str, list[ChatCompletionMessageParam]],
+        temperature: float = 1.0,
+        num_generations: int = 1,
+        poll_interval: float = 60.0,
+        timeout: float | None = None,
+    ) -> AsyncIterator[BatchJobItemResult]:
+        """
+        Submit a batch job, wait for it to complete and stream its results.
+
+        :param requests: The messages of each chat completion, by custom id.
+        :param temperature: The temperature for the completions.
+        :param num_generations: The number of generations to produce per request.
+        :param poll_interval: Seconds between two polls.
+        :param timeout: Maximum number of seconds to wait, None to wait forever.
+        :return: The responses, or the error, of each request by custom id.
+        """
+        ...
@@ -4,6 +4,16 @@ from azure_python.models.recognized_entities import RecognizedEntities
 
 
 class IAzureTextAnalyticsService(Protocol):
-    async def recognize_entities(
-        self, content: list[str]
-    ) -> list[RecognizedEntities]: ...
+    async def recognize_entities(self, content: list[str]) -> list[RecognizedEntities]:
+        """Recognize the named entities of documents.
+
+        Documents longer than AZURE_COG_SERVICE_MAX_DOCUMENT_LENGTH are split
+        in segments, and the segments are sent AZURE_COG_SERVICE_MAX_DOCUMENTS
+        per request, AZURE_COG_SERVICE_CONCURRENCY requests at a time.
+
+        :param content: The documents.
+        :return: The entities of each document, with their offset in the
+            document and their sentence; the id is the index of the document.
+            Documents that the service rejects are left out.
+        """
+        ...
@@ -1,11 +1,49 @@
 from typing import Protocol
 
+from azure_python.models.long_text_analysis import LongTextAnalysis
+
 
 class IContentSafetyService(Protocol):
     async def analyze_text(self, text: str) -> list[dict]:
         """Analyze the given text for content safety.
 
+        Texts longer than the API limit are analyzed with `analyze_long_text`
+        and reduced to the max severity per category.
+
         :param text: The text to be analyzed.
         :return: A list of dictionaries containing the analysis results.
         """
         ...
+
+    async def analyze_texts(
+        self, texts: list[str], concurrency: int = 8
+    ) -> list[list[dict]]:
+        """Analyze many texts for content safety, sharing one client.
+
+        Texts longer than the API limit are split like in `analyze_long_text`
+        and reduced to the max severity per category.
+
+        :param texts: The texts to be analyzed.
+        :param concurrency: The maximum number of requests in flight.
+        :raises ValueError: If concurrency is lower than 1.
+        :return: The analysis results of each text, in input order.
+        """
+        ...
+
+    async def analyze_long_text(
+        self,
+        text: str,
+        max_chars: int | None = None,
+        overlap: int | None = None,
+        concurrency: int = 8,
+    ) -> LongTextAnalysis:
+        """Analyze a text of any length, split at sentence boundaries.
+
+        :param text: The text to be analyzed.
+        :param max_chars: The maximum length of a segment, defaults to the API limit.
+        :param overlap: The maximum number of characters repeated between segments.
+        :param concurrency: The maximum number of requests in flight.
+        :return: The max severity per category, with the offsets of the segments
+            that reached it.
+        """
+        ...
@@ -1,5 +1,6 @@
 from typing import Protocol
 
+import numpy as np
 from azure.ai.inference.models import EmbeddingsResult
 
 
@@ -12,3 +13,39 @@ class IEmbeddingService(Protocol):
         :return: The embeddings result
         """
         ...
+
+    async def embed_many(
+        self,
+        texts: list[str],
+        batch_size: int = 512,
+        max_tokens_per_batch: int = 100_000,
+        concurrency: int = 4,
+    ) -> EmbeddingsResult:
+        """
+        Get embeddings for many texts, split in batches sent concurrently.
+
+        :param texts: The texts to get embeddings for
+        :param batch_size: The maximum number of texts per request
+        :param max_tokens_per_batch: The maximum number of tokens per request
+        :param concurrency: The maximum number of requests in flight
+        :return: The embeddings result, in input order
+        """
+        ...
+
+    async def embed_matrix(
+        self,
+        texts: list[str],
+        normalize: bool = False,
+        out: np.ndarray | None = None,
+        path: str | None = None,
+    ) -> np.ndarray:
+        """
+        Get embeddings for the given texts as a float32 matrix, one row per text.
+
+        :param texts: The texts to get embeddings for
+        :param normalize: Scale the rows to unit L2 norm
+        :param out: The float32 matrix to write into, of len(texts) rows
+        :param path: Allocate the matrix as a memory-mapped .npy file at `path`
+        :return: The (len(texts), dim) matrix
+        """
+        ...
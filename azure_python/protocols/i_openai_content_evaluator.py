@@ -2,6 +2,8 @@ from typing import Literal, Protocol
 
 from openai.types.chat import ChatCompletion
 
+from azure_python.models.content_safety_verdict import ContentSafetyVerdict
+
 
 class ContentSafeException(Exception):
     pass
@@ -21,3 +23,19 @@ class IOpenAIContentEvaluator(Protocol):
         :raises ContentSafeException: If the content safety check fails.
         """
         ...
+
+    def evaluate(
+        self,
+        response: ChatCompletion,
+        threshold: Literal["low", "medium", "high"] = "high",
+    ) -> ContentSafetyVerdict:
+        """
+        Evaluate the prompt and every choice of the response in one pass.
+
+        :param response: The ChatCompletion response to evaluate.
+        :param threshold: The severity threshold for filtering content.
+        :return: The verdict of the prompt and of each choice, so that the
+            safe choices can be kept instead of failing the whole response.
+            Responses without hits share one frozen verdict.
+        """
+        ...
@@ -0,0 +1,34 @@
+from typing import Protocol
+
+from openai.types.chat import ChatCompletionMessageParam
+
+from azure_python.models.llm_response import LLMResponse
+
+
+class ISemanticCacheService(Protocol):
+    async def lookup(
+        self, messages: list[ChatCompletionMessageParam], scope: str = ""
+    ) -> list[LLMResponse] | None:
+        """
+        Look up a previously stored response for a semantically similar prompt.
+
+        :param messages: The messages of the chat completion request.
+        :param scope: Partition key, only entries stored with the same scope match.
+        :return: The cached responses, or None on a cache miss.
+        """
+        ...
+
+    async def store(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        responses: list[LLMResponse],
+        scope: str = "",
+    ) -> None:
+        """
+        Store the responses of a chat completion request.
+
+        :param messages: The messages of the chat completion request.
+        :param responses: The responses to cache.
+        :param scope: Partition key, only entries stored with the same scope match.
+        """
+        ...
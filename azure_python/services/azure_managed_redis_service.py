@@ -1,11 +1,31 @@
+import asyncio
+import json
+from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from logging import Logger
-from typing import Any
+from typing import Any, AsyncIterator, Mapping
 
 from lagom.environment import Env
-from redis.asyncio import Redis
-from redis_entraid.cred_provider import create_from_default_azure_credential
+from redis.asyncio import BlockingConnectionPool, Redis, SSLConnection
+from redis.asyncio.client import Pipeline
+from redis.asyncio.cluster import RedisCluster
+from redis.asyncio.retry import Retry
+from redis.auth.token_manager import RetryPolicy, TokenManagerConfig
+from redis.backoff import ExponentialWithJitterBackoff
+from redis.commands.core import AsyncScript
+from redis_entraid.cred_provider import (
+    EntraIdCredentialsProvider,
+    create_from_default_azure_credential,
+)
 
+from azure_python.common.latency_histogram import LatencyRecorder
+from azure_python.common.near_cache import NearCache
+from azure_python.common.redis_codecs import (
+    Codec,
+    compress,
+    decompress,
+    get_codec,
+)
 from azure_python.protocols.i_azure_managed_redis_service import (
     IAzureManagedRedisService,
 )
@@ -16,6 +36,40 @@ class AzureManagedRedisServiceEnv(Env):
     redis_port: int = 10000
     socket_timeout: int = 10
     socket_connect_timeout: int = 10
+    redis_batch_size: int = 1000
+    """Keys per round trip of the multi-key operations."""
+    redis_codec: str = "str"
+    redis_codec_prefixes: str | None = None
+    """JSON object of codec names by key prefix, e.g. {"embedding:": "numpy"}."""
+    redis_compression_threshold: int | None = None
+    """
+    zlib-compress encoded values of at least this many bytes. Every value is
+    then stored after a flag byte telling whether it is compressed.
+    """
+    redis_near_cache_max_entries: int | None = None
+    """Keep up to this many values read by `get` in process, disabled if None."""
+    redis_near_cache_ttl_seconds: float = 30
+    redis_near_cache_channel: str = "near-cache:invalidate"
+    """Pub/sub channel on which the written keys are announced."""
+    redis_cluster: bool = False
+    """Connect with the cluster client, for tiers with the OSS cluster policy."""
+    redis_max_connections: int = 50
+    """Size of the connection pool (of each node in cluster mode)."""
+    redis_pool_timeout_seconds: float = 5
+    """Wait this long for a free connection when all are in use."""
+    redis_health_check_interval: int = 30
+    """Ping connections idle for longer than this many seconds before use."""
+    redis_retries: int = 3
+    """Retries of a command on connection errors and timeouts."""
+    redis_retry_backoff_base_seconds: float = 0.05
+    redis_retry_backoff_cap_seconds: float = 1.0
+    redis_token_refresh_ratio: float = 0.7
+    """Refresh the Entra ID token after this fraction of its lifetime."""
+    redis_token_request_timeout_ms: int = 5000
+    redis_scan_count: int = 1000
+    """Keys examined per SCAN call, a hint that bounds the work of each call."""
+    redis_scan_pause_seconds: float = 0
+    """Pause between the batches of `delete_matching` and `expire_matching`."""
 
 
 @dataclass
@@ -24,34 +78,299 @@ class AzureManagedRedisService(IAzureManagedRedisService):
     logger: Logger
 
     def __post_init__(self) -> None:
+        if self.env.redis_cluster and self.env.redis_near_cache_max_entries:
+            raise ValueError(
+                "the near cache needs pub/sub, which the cluster client lacks"
+            )
+        self.latency = LatencyRecorder()
         self.client = self.get_client()
+        self.default_codec = get_codec(self.env.redis_codec)
+        prefixes = json.loads(self.env.redis_codec_prefixes or "{}")
+        # longest prefix first, so that the most specific one matches
+        self.prefix_codecs = [
+            (prefix, get_codec(prefixes[prefix]))
+            for prefix in sorted(prefixes, key=len, reverse=True)
+        ]
+        self.near_cache: NearCache[bytes] | None = (
+            NearCache(
+                self.env.redis_near_cache_max_entries,
+                self.env.redis_near_cache_ttl_seconds,
+            )
+            if self.env.redis_near_cache_max_entries
+            else None
+        )
+        self.listener: asyncio.Task | None = None
 
-    def get_client(self) -> Redis:
-        credential_provider = create_from_default_azure_credential(
+    def get_credential_provider(self) -> EntraIdCredentialsProvider:
+        # the default token request timeout (100ms) is shorter than a token
+        # request often takes, refreshes then fail until the token expires
+        return create_from_default_azure_credential(
             scopes=("https://redis.azure.com/.default",),
+            token_manager_config=TokenManagerConfig(
+                expiration_refresh_ratio=self.env.redis_token_refresh_ratio,
+                lower_refresh_bound_millis=0,
+                token_request_execution_timeout_in_ms=(
+                    self.env.redis_token_request_timeout_ms
+                ),
+                retry_policy=RetryPolicy(
+                    max_attempts=self.env.redis_retries + 1,
+                    delay_in_ms=self.env.redis_retry_backoff_base_seconds * 1000,
+                ),
+            ),
         )
 
-        return Redis(
+    def get_retry(self) -> Retry:
+        return Retry(
+            ExponentialWithJitterBackoff(
+                cap=self.env.redis_retry_backoff_cap_seconds,
+                base=self.env.redis_retry_backoff_base_seconds,
+            ),
+            retries=self.env.redis_retries,
+        )
+
+    def get_client(self) -> Redis:
+        options: dict[str, Any] = {
+            "credential_provider": self.get_credential_provider(),
+            "socket_timeout": self.env.socket_timeout,
+            "socket_connect_timeout": self.env.socket_connect_timeout,
+            "socket_keepalive": True,
+            "health_check_interval": self.env.redis_health_check_interval,
+            "retry": self.get_retry(),
+            "max_connections": self.env.redis_max_connections,
+        }
+        if self.env.redis_cluster:
+            return RedisCluster(  # type: ignore
+                host=self.env.redis_host,
+                port=self.env.redis_port,
+                ssl=True,
+                decode_responses=False,
+                **options,
+            )
+
+        # a blocking pool makes bursts wait for a connection instead of
+        # opening (and then closing) one per concurrent command
+        pool = BlockingConnectionPool(
+            connection_class=SSLConnection,
             host=self.env.redis_host,
             port=self.env.redis_port,
-            ssl=True,
-            decode_responses=True,
-            credential_provider=credential_provider,
-            socket_timeout=self.env.socket_timeout,
-            socket_connect_timeout=self.env.socket_connect_timeout,
+            timeout=self.env.redis_pool_timeout_seconds,
+            **options,
         )
+        return Redis.from_pool(pool)
 
     async def ping(self) -> bool:
         self.logger.debug("ping...")
-        return await self.client.ping()  # type: ignore
+        with self.latency.time("PING"):
+            return await self.client.ping()  # type: ignore
 
-    async def set(self, key: str, value: Any) -> None:
+    def latency_stats(self) -> dict[str, dict[str, float]]:
+        return self.latency.summary()
+
+    def get_codec(self, key: str, codec: str | Codec | None = None) -> Codec:
+        """The codec given, else the one of the longest matching key prefix."""
+        if isinstance(codec, str):
+            return get_codec(codec)
+        if codec is not None:
+            return codec
+        for prefix, prefix_codec in self.prefix_codecs:
+            if key.startswith(prefix):
+                return prefix_codec
+        return self.default_codec
+
+    def encode(self, key: str, value: Any, codec: str | Codec | None) -> bytes:
+        data = self.get_codec(key, codec).encode(value)
+        return compress(data, self.env.redis_compression_threshold)
+
+    def decode(self, key: str, data: bytes | None, codec: str | Codec | None) -> Any:
+        if data is None:
+            return None
+        flagged = self.env.redis_compression_threshold is not None
+        return self.get_codec(key, codec).decode(decompress(data, flagged))
+
+    async def set(
+        self,
+        key: str,
+        value: Any,
+        ttl: int | None = None,
+        codec: str | Codec | None = None,
+    ) -> None:
         self.logger.debug(f"[BEGIN] set key: {key}")
-        await self.client.set(name=key, value=value)
+        data = self.encode(key, value, codec)
+        with self.latency.time("SET"):
+            await self.client.set(name=key, value=data, ex=ttl)
+        await self.invalidate([key])
         self.logger.debug(f"[COMPLETED] set key: {key}")
 
-    async def get(self, key: str) -> Any:
+    async def get(self, key: str, codec: str | Codec | None = None) -> Any:
         self.logger.debug(f"[BEGIN] get key: {key}")
-        data = await self.client.get(name=key)
+        if self.near_cache is None:
+            data = await self.fetch(key)
+        else:
+            self.start_listener()
+            data = await self.near_cache.get(key, lambda: self.fetch(key))
         self.logger.debug(f"[COMPLETED] get key: {key}")
-        return data
+        return self.decode(key, data, codec)
+
+    async def fetch(self, key: str) -> bytes | None:
+        with self.latency.time("GET"):
+            return await self.client.get(name=key)  # type: ignore
+
+    def batches(self, keys: list[str]) -> list[list[str]]:
+        size = self.env.redis_batch_size
+        return [keys[i : i + size] for i in range(0, len(keys), size)]
+
+    async def mget(
+        self, keys: list[str], codec: str | Codec | None = None
+    ) -> list[Any]:
+        self.logger.debug(f"[BEGIN] mget: {len(keys)} keys")
+        values: list[Any] = []
+        # keys of different hash slots must be read one slot at a time
+        mget = (
+            self.client.mget_nonatomic  # type: ignore
+            if self.env.redis_cluster
+            else self.client.mget
+        )
+        for batch in self.batches(keys):
+            with self.latency.time("MGET"):
+                data: list[bytes | None] = await mget(batch)  # type: ignore
+            values.extend(self.decode(k, d, codec) for k, d in zip(batch, data))
+        self.logger.debug(f"[COMPLETED] mget: {len(keys)} keys")
+        return values
+
+    async def mset(
+        self,
+        values: Mapping[str, Any],
+        ttl: int | Mapping[str, int] | None = None,
+        codec: str | Codec | None = None,
+    ) -> None:
+        self.logger.debug(f"[BEGIN] mset: {len(values)} keys")
+        for batch in self.batches(list(values)):
+            async with self.pipeline() as pipe:
+                for key in batch:
+                    expiry = ttl.get(key) if isinstance(ttl, Mapping) else ttl
+                    pipe.set(
+                        name=key, value=self.encode(key, values[key], codec), ex=expiry
+                    )
+                if self.near_cache is not None:
+                    self.near_cache.invalidate(batch)
+                    pipe.publish(self.env.redis_near_cache_channel, json.dumps(batch))
+        self.logger.debug(f"[COMPLETED] mset: {len(values)} keys")
+
+    async def delete_many(self, keys: list[str]) -> int:
+        self.logger.debug(f"[BEGIN] delete_many: {len(keys)} keys")
+        deleted = 0
+        for batch in self.batches(keys):
+            with self.latency.time("UNLINK"):
+                deleted += await self.client.unlink(*batch)  # type: ignore
+            await self.invalidate(batch)
+        self.logger.debug(f"[COMPLETED] delete_many: {deleted} deleted")
+        return deleted
+
+    async def expire_many(self, keys: list[str], ttl: int) -> int:
+        self.logger.debug(f"[BEGIN] expire_many: {len(keys)} keys")
+        expired = 0
+        for batch in self.batches(keys):
+            async with self.client.pipeline(transaction=False) as pipe:
+                for key in batch:
+                    pipe.expire(key, ttl)
+                with self.latency.time("PIPELINE"):
+                    expired += sum(map(bool, await pipe.execute()))
+            # near cache entries outliving the keys would serve expired values
+            if ttl < self.env.redis_near_cache_ttl_seconds:
+                await self.invalidate(batch)
+        self.logger.debug(f"[COMPLETED] expire_many: {expired} expired")
+        return expired
+
+    async def iter_keys(
+        self, pattern: str = "*", count: int | None = None
+    ) -> AsyncIterator[str]:
+        # SCAN walks the keyspace a few keys per call, unlike KEYS which
+        # blocks the server until it has matched every key
+        async for key in self.client.scan_iter(
+            match=pattern, count=count or self.env.redis_scan_count
+        ):
+            yield key.decode("utf-8") if isinstance(key, bytes) else key
+
+    async def scan_batches(self, pattern: str) -> AsyncIterator[list[str]]:
+        """The keys matching `pattern`, in batches, pausing between batches."""
+        batch: list[str] = []
+        async for key in self.iter_keys(pattern):
+            batch.append(key)
+            if len(batch) == self.env.redis_batch_size:
+                yield batch
+                batch = []
+                if self.env.redis_scan_pause_seconds:
+                    await asyncio.sleep(self.env.redis_scan_pause_seconds)
+        if batch:
+            yield batch
+
+    async def delete_matching(self, pattern: str) -> int:
+        self.logger.debug(f"[BEGIN] delete_matching: {pattern}")
+        deleted = 0
+        async for batch in self.scan_batches(pattern):
+            deleted += await self.delete_many(batch)
+        self.logger.debug(f"[COMPLETED] delete_matching: {deleted} deleted")
+        return deleted
+
+    async def expire_matching(self, pattern: str, ttl: int) -> int:
+        self.logger.debug(f"[BEGIN] expire_matching: {pattern}")
+        expired = 0
+        async for batch in self.scan_batches(pattern):
+            expired += await self.expire_many(batch, ttl)
+        self.logger.debug(f"[COMPLETED] expire_matching: {expired} expired")
+        return expired
+
+    def register_script(self, script: str) -> AsyncScript:
+        return self.client.register_script(script)
+
+    @asynccontextmanager
+    async def pipeline(self, transaction: bool = False) -> AsyncIterator[Pipeline]:
+        async with self.client.pipeline(transaction=transaction) as pipe:
+            yield pipe
+            if len(pipe):
+                with self.latency.time("PIPELINE"):
+                    await pipe.execute()
+
+    async def invalidate(self, keys: list[str]) -> None:
+        if self.near_cache is None or not keys:
+            return
+        self.near_cache.invalidate(keys)
+        with self.latency.time("PUBLISH"):
+            await self.client.publish(
+                self.env.redis_near_cache_channel, json.dumps(keys)
+            )
+
+    def near_cache_stats(self) -> dict[str, float]:
+        return {} if self.near_cache is None else self.near_cache.stats()
+
+    def start_listener(self) -> None:
+        """Listen for invalidations, once per event loop."""
+        loop = asyncio.get_running_loop()
+        if (
+            self.listener is None
+            or self.listener.done()
+            or self.listener.get_loop() is not loop
+        ):
+            self.listener = loop.create_task(self.listen_invalidations())
+
+    async def listen_invalidations(self, retry_delay: float = 1.0) -> None:
+        """
+        Drop the near cache entries of the keys that are written, by any process.
+
+        The near cache only serves entries while subscribed: invalidations
+        published before the subscription or while reconnecting are missed.
+        """
+        near_cache: NearCache[bytes] = self.near_cache  # type: ignore
+        while True:
+            try:
+                async with self.client.pubsub() as pubsub:
+                    await pubsub.subscribe(self.env.redis_near_cache_channel)
+                    near_cache.active = True
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            near_cache.invalidate(json.loads(message["data"]))
+            except Exception as e:
+                self.logger.warning(f"Near cache invalidations interrupted: {e}")
+            finally:
+                near_cache.deactivate()
+            await asyncio.sleep(retry_delay)
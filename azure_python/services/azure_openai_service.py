@@ -1,20 +1,76 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
 from dataclasses import dataclass
 from logging import Logger
-from typing import Any, Callable
+from typing import Any, AsyncIterator, Awaitable, Callable, TypeVar
 
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from lagom.environment import Env
-from openai import AsyncAzureOpenAI
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    AsyncAzureOpenAI,
+    InternalServerError,
+    RateLimitError,
+)
+from openai.types import Batch
 from openai.types.chat import (
     ChatCompletion,
     ChatCompletionMessageParam,
 )
+from pydantic import ValidationError
 
+from azure_python.common.deployment_router import (
+    Backend,
+    CircuitBreaker,
+    DeploymentRouter,
+    RoutingStrategy,
+)
+from azure_python.common.rate_limiter import (
+    TokenBucketRateLimiter,
+    backoff_delay,
+    retry_after_seconds,
+)
+from azure_python.common.redis_limits import RedisQuotaLimiter
+from azure_python.common.token_counter import TokenCounter
+from azure_python.models.chat_completion_batch_result import (
+    BatchJobItemResult,
+    ChatCompletionBatchResult,
+    ChatCompletionItemResult,
+)
 from azure_python.models.llm_response import LLMResponse
+from azure_python.models.openai_deployment import OpenAIDeployment
+from azure_python.protocols.i_azure_managed_redis_service import (
+    IAzureManagedRedisService,
+)
 from azure_python.protocols.i_azure_openai_service import (
     IAzureOpenAIService,
 )
-from azure_python.protocols.i_openai_content_evaluator import IOpenAIContentEvaluator
+from azure_python.protocols.i_openai_content_evaluator import (
+    ContentSafeException,
+    IOpenAIContentEvaluator,
+)
+from azure_python.protocols.i_semantic_cache_service import ISemanticCacheService
+
+BATCH_ENDPOINT = "/chat/completions"
+BATCH_TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+RETRYABLE_ERRORS = (RateLimitError, InternalServerError, APIConnectionError)
+
+T = TypeVar("T")
+
+
+def request_fingerprint(
+    messages: list[ChatCompletionMessageParam],
+    temperature: float,
+    num_generations: int,
+) -> str:
+    payload = json.dumps(
+        [messages, temperature, num_generations], sort_keys=True, default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
 
 
 class AzureOpenAIServiceEnv(Env):
@@ -22,6 +78,24 @@ class AzureOpenAIServiceEnv(Env):
     azure_openai_api_key: str | None = None
     azure_openai_api_version: str
     azure_openai_deployed_model_name: str
+    azure_openai_requests_per_minute: int | None = None
+    azure_openai_tokens_per_minute: int | None = None
+    azure_openai_max_retries: int = 3
+    azure_openai_deployments: str | None = None
+    """JSON array of OpenAIDeployment, overrides the single endpoint above."""
+    azure_openai_routing_strategy: RoutingStrategy = "least_outstanding"
+    azure_openai_breaker_failures: int = 5
+    azure_openai_breaker_reset_seconds: float = 30.0
+    azure_openai_shared_quota_timeout_seconds: float = 0.5
+    """Bound of each Redis call of the shared quotas."""
+    azure_openai_shared_quota_reset_seconds: float = 30.0
+    """Use only the local limits for this long after a shared quota error."""
+    azure_openai_batch_deployment_name: str | None = None
+    """Global batch deployment, defaults to azure_openai_deployed_model_name."""
+    azure_openai_max_prompt_tokens: int | None = None
+    """Trim the oldest messages of longer prompts before sending them."""
+    azure_openai_token_encoding: str | None = None
+    """tiktoken encoding, derived from the deployed model name by default."""
 
 
 @dataclass
@@ -33,34 +107,248 @@ class AzureOpenAIService(IAzureOpenAIService):
     env: AzureOpenAIServiceEnv
     content_safety_eval: IOpenAIContentEvaluator
     logger: Logger
+    semantic_cache: ISemanticCacheService | None = None
 
     def __post_init__(self) -> None:
-        self.client = self.get_client()
+        self.token_provider: Callable[[], str] | None = None
+        self.token_counter = (
+            TokenCounter(self.env.azure_openai_token_encoding)
+            if self.env.azure_openai_token_encoding
+            else TokenCounter.for_model(self.env.azure_openai_deployed_model_name)
+        )
+        self.router = DeploymentRouter(
+            backends=[self.create_backend(d) for d in self.get_deployments()],
+            strategy=self.env.azure_openai_routing_strategy,
+        )
+        self.client = self.router.backends[0].client
 
-    def get_openai_auth_key(self) -> dict[str, str | Callable[[], str]]:
-        if self.env.azure_openai_api_key:
-            return {"api_key": self.env.azure_openai_api_key}
+    def get_deployments(self) -> list[OpenAIDeployment]:
+        if self.env.azure_openai_deployments:
+            return OpenAIDeployment.parse_list(self.env.azure_openai_deployments)
 
-        token_provider = get_bearer_token_provider(
-            DefaultAzureCredential(), "https://cognitiveservices.azure.com/.default"
-        )
+        return [
+            OpenAIDeployment(
+                endpoint=self.env.azure_openai_endpoint,
+                deployment=self.env.azure_openai_deployed_model_name,
+                api_key=self.env.azure_openai_api_key,
+                requests_per_minute=self.env.azure_openai_requests_per_minute,
+                tokens_per_minute=self.env.azure_openai_tokens_per_minute,
+            )
+        ]
 
-        return {"azure_ad_token_provider": token_provider}
+    def get_openai_auth_key(
+        self, api_key: str | None = None
+    ) -> dict[str, str | Callable[[], str]]:
+        if api_key:
+            return {"api_key": api_key}
 
-    def get_client(self) -> AsyncAzureOpenAI:
+        # one credential is shared by the clients of all deployments
+        if self.token_provider is None:
+            self.token_provider = get_bearer_token_provider(
+                DefaultAzureCredential(),
+                "https://cognitiveservices.azure.com/.default",
+            )
+
+        return {"azure_ad_token_provider": self.token_provider}
+
+    def create_client(self, deployment: OpenAIDeployment) -> AsyncAzureOpenAI:
         return AsyncAzureOpenAI(
-            azure_endpoint=self.env.azure_openai_endpoint,
+            azure_endpoint=deployment.endpoint,
             api_version=self.env.azure_openai_api_version,
-            **self.get_openai_auth_key(),  # type: ignore
+            max_retries=0,  # retries are handled by `send` with the rate limiter
+            **self.get_openai_auth_key(deployment.api_key),  # type: ignore
         )
 
+    def create_backend(self, deployment: OpenAIDeployment) -> Backend:
+        return Backend(
+            deployment=deployment,
+            client=self.create_client(deployment),
+            rate_limiter=TokenBucketRateLimiter(
+                requests_per_minute=deployment.requests_per_minute,
+                tokens_per_minute=deployment.tokens_per_minute,
+            ),
+            breaker=CircuitBreaker(
+                failure_threshold=self.env.azure_openai_breaker_failures,
+                reset_timeout=self.env.azure_openai_breaker_reset_seconds,
+            ),
+        )
+
+    def share_quotas(self, redis: IAzureManagedRedisService) -> None:
+        """Enforce the quotas of the deployments across all the processes."""
+        for backend in self.router.backends:
+            deployment = backend.deployment
+            if deployment.requests_per_minute or deployment.tokens_per_minute:
+                backend.shared_quota = RedisQuotaLimiter(
+                    redis,
+                    name=f"openai:{deployment.endpoint}:{deployment.deployment}",
+                    requests_per_minute=deployment.requests_per_minute,
+                    tokens_per_minute=deployment.tokens_per_minute,
+                    command_timeout=self.env.azure_openai_shared_quota_timeout_seconds,
+                )
+                backend.shared_quota_breaker = CircuitBreaker(
+                    failure_threshold=1,
+                    reset_timeout=self.env.azure_openai_shared_quota_reset_seconds,
+                )
+
+    async def acquire(self, backend: Backend, estimated: int) -> None:
+        await backend.rate_limiter.acquire(estimated)
+        breaker = backend.shared_quota_breaker
+        # an unreachable Redis does not stop requests, the local limit holds,
+        # alone while the breaker is open
+        if backend.shared_quota and breaker.allow():
+            breaker.on_request()
+            try:
+                await backend.shared_quota.acquire(estimated)
+            except Exception as e:
+                breaker.record_failure()
+                self.logger.warning(f"Error acquiring the shared quota: {e}")
+            except BaseException:
+                breaker.release_trial()
+                raise
+            else:
+                breaker.record_success()
+
+    async def reconcile(self, backend: Backend, estimated: int, actual: int) -> None:
+        backend.rate_limiter.reconcile(estimated, actual)
+        breaker = backend.shared_quota_breaker
+        if backend.shared_quota and not breaker.is_open:
+            try:
+                await backend.shared_quota.reconcile(estimated, actual)
+            except Exception as e:
+                breaker.record_failure()
+                self.logger.warning(f"Error reconciling the shared quota: {e}")
+
+    def get_client(self) -> AsyncAzureOpenAI:
+        return self.client
+
     def get_deployed_model_name(self) -> str:
         return self.env.azure_openai_deployed_model_name
 
+    def estimate_prompt_tokens(self, messages: list[ChatCompletionMessageParam]) -> int:
+        return self.token_counter.count_messages(messages)
+
+    def fit_messages(
+        self, messages: list[ChatCompletionMessageParam]
+    ) -> tuple[list[ChatCompletionMessageParam], int]:
+        """The messages that fit the prompt token budget, and their tokens."""
+        budget = self.env.azure_openai_max_prompt_tokens
+        if budget is None:
+            return messages, self.estimate_prompt_tokens(messages)
+
+        trimmed, tokens = self.token_counter.trim_messages(messages, budget)
+        if len(trimmed) < len(messages):
+            self.logger.debug(
+                f"trimmed {len(messages) - len(trimmed)} messages to fit "
+                f"{budget} prompt tokens"
+            )
+        return trimmed, tokens
+
+    async def send(
+        self,
+        estimated: int,
+        request: Callable[[AsyncAzureOpenAI, str], Awaitable[ChatCompletion]],
+    ) -> ChatCompletion:
+        """
+        Send a request to one of the deployments.
+
+        Failed requests (429, 5xx, connection errors) fail over to the other
+        deployments right away; once all of them were tried, the next round
+        waits with a jittered backoff.
+
+        :param estimated: The estimated prompt tokens of the request.
+        :param request: Sends the request given the client and deployment name.
+        :return: The chat completion.
+        """
+        max_retries = self.env.azure_openai_max_retries
+        num_backends = len(self.router.backends)
+
+        attempt = 0
+        tried: set[int] = set()
+        while True:
+            idx, backend = self.router.select(tried)
+            tried.add(idx)
+
+            # requests waiting for the rate limit count as outstanding too, so
+            # that routing moves away from a throttled deployment
+            backend.outstanding += 1
+            try:
+                await self.acquire(backend, estimated)
+            except BaseException:
+                backend.outstanding -= 1
+                raise
+            backend.breaker.on_request()
+            try:
+                response = await request(backend.client, backend.deployment.deployment)
+            except RETRYABLE_ERRORS as e:
+                # the request did not consume any quota
+                await self.reconcile(backend, estimated, 0)
+                retry_after = (
+                    retry_after_seconds(e.response.headers)
+                    if isinstance(e, APIStatusError)
+                    else None
+                )
+                delay = backoff_delay(attempt, retry_after)
+                if isinstance(e, RateLimitError):
+                    # throttled but healthy, hold back this deployment only
+                    backend.rate_limiter.pause(delay)
+                    backend.breaker.record_success()
+                else:
+                    backend.breaker.record_failure()
+
+                if attempt >= max_retries:
+                    raise
+
+                attempt += 1
+                if len(tried) < num_backends:
+                    self.logger.warning(
+                        f"request to {backend.deployment.endpoint} failed "
+                        f"({type(e).__name__}), failing over "
+                        f"(retry {attempt}/{max_retries})"
+                    )
+                    continue
+
+                tried.clear()
+                self.logger.warning(
+                    f"request failed ({type(e).__name__}), "
+                    f"retry {attempt}/{max_retries} in {delay:.2f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            except Exception:
+                # the deployment is reachable, the request itself is at fault
+                backend.breaker.record_success()
+                raise
+            except BaseException:
+                # cancelled, the health of the deployment is unknown
+                backend.breaker.release_trial()
+                raise
+            finally:
+                backend.outstanding -= 1
+
+            backend.breaker.record_success()
+            usage = getattr(response, "usage", None)
+            actual = getattr(usage, "total_tokens", None)
+            await self.reconcile(
+                backend, estimated, actual if isinstance(actual, int) else estimated
+            )
+            return response
+
     def collection_results(
         self, responses: ChatCompletion, num_generations: int
     ) -> list[LLMResponse]:
-        self.content_safety_eval.content_safety_check(responses)
+        # flagged choices are dropped, the response fails when none is left
+        verdict = self.content_safety_eval.evaluate(responses)
+        if not verdict.safe:
+            keep = verdict.safe_choice_indexes()
+            if not keep:
+                raise ContentSafeException(verdict.failure_message())
+            self.logger.warning(
+                f"dropping {verdict.num_choices - len(keep)} choices, "
+                f"{verdict.failure_message()}"
+            )
+            choices = [responses.choices[i] for i in keep]
+        else:
+            choices = responses.choices
 
         usages = responses.usage.model_dump() if responses.usage else {}
         usages = {k: v for k, v in usages.items() if isinstance(v, int)}
@@ -69,7 +357,7 @@ class AzureOpenAIService(IAzureOpenAIService):
         )
 
         results = []
-        for choice in responses.choices:
+        for choice in choices:
             results.append(
                 LLMResponse(
                     content=choice.message.content if choice.message else "",
@@ -84,19 +372,45 @@ class AzureOpenAIService(IAzureOpenAIService):
         messages: list[ChatCompletionMessageParam],
         temperature: float = 1.0,
         num_generations: int = 1,
+        bypass_cache: bool = False,
     ) -> list[LLMResponse]:
         self.logger.debug("[BEGIN] chat_completion")
 
-        self.client = self.get_client()
-        response = await self.client.chat.completions.create(
-            model=self.env.azure_openai_deployed_model_name,
-            messages=messages,
-            temperature=temperature,
-            n=num_generations,
+        semantic_cache = None if bypass_cache else self.semantic_cache
+        scope = f"{self.get_deployed_model_name()}|{temperature}|{num_generations}"
+        cached = None
+        if semantic_cache is not None:
+            try:
+                cached = await semantic_cache.lookup(messages, scope)
+            except Exception as e:
+                # a cache failure is a miss, and the response is not stored
+                self.logger.warning(f"Error looking up the semantic cache: {e}")
+                semantic_cache = None
+        if cached is not None:
+            self.logger.debug("[COMPLETED] chat_completion (semantic cache)")
+            return cached
+
+        await self.token_counter.load()
+        prompt, prompt_tokens = self.fit_messages(messages)
+        response = await self.send(
+            prompt_tokens,
+            lambda client, model: client.chat.completions.create(
+                model=model,
+                messages=prompt,
+                temperature=temperature,
+                n=num_generations,
+            ),
         )
 
+        results = self.collection_results(response, num_generations)
+        if semantic_cache is not None:
+            try:
+                await semantic_cache.store(messages, results, scope)
+            except Exception as e:
+                self.logger.warning(f"Error storing in the semantic cache: {e}")
+
         self.logger.debug("[COMPLETED] chat_completion")
-        return self.collection_results(response, num_generations)
+        return results
 
     async def chat_completion_with_format(
         self,
@@ -107,14 +421,329 @@ class AzureOpenAIService(IAzureOpenAIService):
     ) -> list[LLMResponse]:
         self.logger.debug("[BEGIN] chat_completion_with_format")
 
-        self.client = self.get_client()
-        responses = await self.client.chat.completions.parse(
-            model=self.env.azure_openai_deployed_model_name,
-            messages=messages,
-            response_format=response_format,
-            temperature=temperature,
-            n=num_generations,
+        await self.token_counter.load()
+        prompt, prompt_tokens = self.fit_messages(messages)
+        responses = await self.send(
+            prompt_tokens,
+            lambda client, model: client.chat.completions.parse(
+                model=model,
+                messages=prompt,
+                response_format=response_format,
+                temperature=temperature,
+                n=num_generations,
+            ),
         )
 
         self.logger.debug("[COMPLETED] chat_completion_with_format")
         return self.collection_results(responses, num_generations)
+
+    def load_checkpoint(
+        self, checkpoint_path: str | None, fingerprints: list[str]
+    ) -> dict[int, ChatCompletionItemResult]:
+        """
+        The results saved by a previous run of the same requests.
+
+        :param checkpoint_path: The JSON lines file of the results.
+        :param fingerprints: The fingerprints of the requests, results of other
+            requests (e.g. of another batch) are skipped.
+        """
+        if not checkpoint_path or not os.path.exists(checkpoint_path):
+            return {}
+
+        done: dict[int, ChatCompletionItemResult] = {}
+        with open(checkpoint_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    item = ChatCompletionItemResult.model_validate_json(line)
+                except ValidationError:
+                    # e.g. the last line was cut short when the job was killed
+                    self.logger.warning(f"skipping invalid checkpoint line: {line!r}")
+                    continue
+                if item.error is not None:
+                    continue
+                if (
+                    item.index >= len(fingerprints)
+                    or item.fingerprint != fingerprints[item.index]
+                ):
+                    self.logger.warning(
+                        f"skipping checkpoint result {item.index}, it does not "
+                        "match the request"
+                    )
+                    continue
+                done[item.index] = item
+        return done
+
+    async def chat_completion_as_completed(
+        self,
+        requests: list[list[ChatCompletionMessageParam]],
+        concurrency: int = 8,
+        temperature: float = 1.0,
+        num_generations: int = 1,
+        checkpoint_path: str | None = None,
+    ) -> AsyncIterator[ChatCompletionItemResult]:
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than or equal to 1")
+
+        self.logger.debug(f"[BEGIN] chat_completion_as_completed: {len(requests)}")
+        fingerprints = [
+            request_fingerprint(r, temperature, num_generations) for r in requests
+        ]
+        done = self.load_checkpoint(checkpoint_path, fingerprints)
+        for item in done.values():
+            yield item
+
+        todo = [i for i in range(len(requests)) if i not in done]
+        pending = iter(todo)
+        # bounded, so that workers stop when the consumer falls behind
+        queue: asyncio.Queue[ChatCompletionItemResult] = asyncio.Queue(
+            maxsize=concurrency * 2
+        )
+
+        async def worker() -> None:
+            for index in pending:
+                try:
+                    responses = await self.chat_completion(
+                        requests[index], temperature, num_generations
+                    )
+                    item = ChatCompletionItemResult(
+                        index=index,
+                        responses=responses,
+                        fingerprint=fingerprints[index],
+                    )
+                except Exception as e:
+                    item = ChatCompletionItemResult(
+                        index=index,
+                        error=f"{type(e).__name__}: {e}",
+                        fingerprint=fingerprints[index],
+                    )
+                await queue.put(item)
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(min(concurrency, len(todo)))
+        ]
+        checkpoint = (
+            open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+        )
+        try:
+            for _ in range(len(todo)):
+                item = await queue.get()
+                if checkpoint and item.error is None:
+                    checkpoint.write(item.model_dump_json() + "\n")
+                    checkpoint.flush()
+                yield item
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            if checkpoint:
+                checkpoint.close()
+
+        self.logger.debug("[COMPLETED] chat_completion_as_completed")
+
+    async def chat_completion_many(
+        self,
+        requests: list[list[ChatCompletionMessageParam]],
+        concurrency: int = 8,
+        temperature: float = 1.0,
+        num_generations: int = 1,
+        checkpoint_path: str | None = None,
+    ) -> ChatCompletionBatchResult:
+        self.logger.debug(f"[BEGIN] chat_completion_many: {len(requests)}")
+        items = [
+            item
+            async for item in self.chat_completion_as_completed(
+                requests, concurrency, temperature, num_generations, checkpoint_path
+            )
+        ]
+        result = ChatCompletionBatchResult.from_items(len(requests), items)
+        self.logger.debug(
+            f"[COMPLETED] chat_completion_many: {len(requests)}, "
+            f"errors: {len(result.errors)}"
+        )
+        return result
+
+    def build_batch_file(
+        self,
+        requests: dict[str, list[ChatCompletionMessageParam]],
+        temperature: float = 1.0,
+        num_generations: int = 1,
+    ) -> bytes:
+        model = (
+            self.env.azure_openai_batch_deployment_name
+            or self.env.azure_openai_deployed_model_name
+        )
+        lines = [
+            json.dumps(
+                {
+                    "custom_id": custom_id,
+                    "method": "POST",
+                    "url": BATCH_ENDPOINT,
+                    "body": {
+                        "model": model,
+                        "messages": messages,
+                        "temperature": temperature,
+                        "n": num_generations,
+                    },
+                }
+            )
+            for custom_id, messages in requests.items()
+        ]
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+    async def submit_batch(
+        self,
+        requests: dict[str, list[ChatCompletionMessageParam]],
+        temperature: float = 1.0,
+        num_generations: int = 1,
+    ) -> str:
+        self.logger.debug(f"[BEGIN] submit_batch: {len(requests)}")
+        if not requests:
+            raise ValueError("requests must not be empty")
+
+        content = self.build_batch_file(requests, temperature, num_generations)
+        file = await self.retry_batch_call(
+            lambda: self.client.files.create(
+                file=("batch.jsonl", content), purpose="batch"
+            )
+        )
+        batch = await self.retry_batch_call(
+            lambda: self.client.batches.create(
+                input_file_id=file.id,
+                endpoint=BATCH_ENDPOINT,  # type: ignore
+                completion_window="24h",
+            )
+        )
+        self.logger.debug(f"[COMPLETED] submit_batch: {batch.id}")
+        return batch.id
+
+    async def wait_for_batch(
+        self,
+        batch_id: str,
+        poll_interval: float = 60.0,
+        timeout: float | None = None,
+    ) -> Batch:
+        self.logger.debug(f"[BEGIN] wait_for_batch: {batch_id}")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            batch = await self.retry_batch_call(
+                lambda: self.client.batches.retrieve(batch_id)
+            )
+            if batch.status in BATCH_TERMINAL_STATES:
+                self.logger.debug(
+                    f"[COMPLETED] wait_for_batch: {batch_id}, status: {batch.status}"
+                )
+                return batch
+
+            if deadline is not None and time.monotonic() + poll_interval > deadline:
+                raise TimeoutError(
+                    f"batch {batch_id} did not complete, status: {batch.status}"
+                )
+
+            self.logger.debug(f"batch {batch_id} status: {batch.status}")
+            await asyncio.sleep(poll_interval)
+
+    def parse_batch_line(self, line: str) -> BatchJobItemResult:
+        data = json.loads(line)
+        custom_id = str(data.get("custom_id"))
+        response = data.get("response") or {}
+
+        if data.get("error") or response.get("status_code") != 200:
+            error = data.get("error") or response.get("body", {}).get("error")
+            return BatchJobItemResult(custom_id=custom_id, error=json.dumps(error))
+
+        completion = ChatCompletion.model_validate(response["body"])
+        try:
+            responses = self.collection_results(
+                completion, max(len(completion.choices), 1)
+            )
+        except ContentSafeException as e:
+            return BatchJobItemResult(custom_id=custom_id, error=str(e))
+        return BatchJobItemResult(custom_id=custom_id, responses=responses)
+
+    async def iter_batch_results(
+        self, batch_id: str
+    ) -> AsyncIterator[BatchJobItemResult]:
+        self.logger.debug(f"[BEGIN] iter_batch_results: {batch_id}")
+        batch = await self.retry_batch_call(
+            lambda: self.client.batches.retrieve(batch_id)
+        )
+        if batch.status != "completed":
+            raise RuntimeError(f"batch {batch_id} is not completed: {batch.status}")
+
+        # successful requests are in the output file, failed ones in the error file
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+
+            async for line in self.iter_file_lines(file_id):
+                if line.strip():
+                    yield self.parse_batch_line(line)
+
+        self.logger.debug(f"[COMPLETED] iter_batch_results: {batch_id}")
+
+    async def iter_file_lines(self, file_id: str) -> AsyncIterator[str]:
+        """
+        Stream the lines of a file, the download is retried like the other
+        Batch API calls until its first line is read.
+        """
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async with self.client.files.with_streaming_response.content(
+                    file_id
+                ) as response:
+                    async for line in response.iter_lines():
+                        started = True
+                        yield line
+                return
+            except RETRYABLE_ERRORS as e:
+                if started or attempt >= self.env.azure_openai_max_retries:
+                    raise
+                await self.batch_backoff(attempt, e)
+                attempt += 1
+
+    async def retry_batch_call(self, call: Callable[[], Awaitable[T]]) -> T:
+        """
+        Batch API calls do not go through `send`, they are retried here on
+        throttling and transient errors so that a long poll survives them.
+        """
+        attempt = 0
+        while True:
+            try:
+                return await call()
+            except RETRYABLE_ERRORS as e:
+                if attempt >= self.env.azure_openai_max_retries:
+                    raise
+                await self.batch_backoff(attempt, e)
+                attempt += 1
+
+    async def batch_backoff(self, attempt: int, e: Exception) -> None:
+        retry_after = (
+            retry_after_seconds(e.response.headers)
+            if isinstance(e, APIStatusError)
+            else None
+        )
+        delay = backoff_delay(attempt, retry_after)
+        self.logger.warning(
+            f"batch request failed ({type(e).__name__}), "
+            f"retry {attempt + 1}/{self.env.azure_openai_max_retries} "
+            f"in {delay:.2f}s"
+        )
+        await asyncio.sleep(delay)
+
+    async def run_batch(
+        self,
+        requests: dict[str, list[ChatCompletionMessageParam]],
+        temperature: float = 1.0,
+        num_generations: int = 1,
+        poll_interval: float = 60.0,
+        timeout: float | None = None,
+    ) -> AsyncIterator[BatchJobItemResult]:
+        batch_id = await self.submit_batch(requests, temperature, num_generations)
+        await self.wait_for_batch(batch_id, poll_interval, timeout)
+        async for item in self.iter_batch_results(batch_id):
+            yield item
@@ -1,5 +1,7 @@
+import base64
+import json
 import logging
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Any, AsyncIterator, Literal
 
 from azure.identity.aio import DefaultAzureCredential
@@ -7,16 +9,27 @@ from azure.mgmt.resourcegraph.aio import ResourceGraphClient
 from azure.mgmt.resourcegraph.models import QueryRequest, QueryRequestOptions
 from fastapi.concurrency import asynccontextmanager
 
+from azure_python.common.cache_aside import CacheAside, cached
 from azure_python.models.original_resource import OriginalResource
 from azure_python.models.original_resource_activities import OriginalResourceActivity
 from azure_python.protocols.i_azure_resources_query_service import (
     IAzureResourcesQueryService,
 )
 
+MANAGEMENT_SCOPE = "https://management.azure.com/.default"
+
+
+def token_claims(token: str) -> dict[str, Any]:
+    """Claims of a JWT access token, read without verifying its signature."""
+    payload = token.split(".")[1]
+    return json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+
 
 @dataclass
 class AzureResourcesQueryService(IAzureResourcesQueryService):
     logger: logging.Logger
+    cache: CacheAside | None = None
+    principal: str | None = field(default=None, init=False)
 
     @asynccontextmanager
     async def get_az_graph_client(self) -> AsyncIterator[ResourceGraphClient]:
@@ -31,6 +44,21 @@ class AzureResourcesQueryService(IAzureResourcesQueryService):
             if credential:
                 await credential.close()
 
+    async def identity(self) -> str:
+        """
+        Tenant and object id of the credential of the queries, the results of
+        which depend on what it is allowed to read.
+        """
+        if self.principal is None:
+            credential = DefaultAzureCredential()
+            try:
+                token = await credential.get_token(MANAGEMENT_SCOPE)
+            finally:
+                await credential.close()
+            claims = token_claims(token.token)
+            self.principal = f"{claims['tid']}:{claims['oid']}"
+        return self.principal
+
     def get_timestamp(self, data: dict[str, Any], path) -> str:
         if not path:
             return ""
@@ -97,6 +125,7 @@ class AzureResourcesQueryService(IAzureResourcesQueryService):
         data = await self.query_raw(query)
         return [OriginalResource(**r) for r in data]
 
+    @cached(ttl=300, stale_ttl=900, scope=lambda svc: svc.identity())
     async def fetch_subscriptions(self, tenant_id: str) -> list[OriginalResource]:
         self.logger.debug(f"[BEGIN] fetch_subscriptions for tenant_id: {tenant_id}")
         result = await self.query(
@@ -114,6 +143,7 @@ class AzureResourcesQueryService(IAzureResourcesQueryService):
         )
         return result
 
+    @cached(ttl=300, stale_ttl=900, scope=lambda svc: svc.identity())
     async def fetch_resource_groups(
         self, subscription_id: str
     ) -> list[OriginalResource]:
@@ -134,6 +164,7 @@ class AzureResourcesQueryService(IAzureResourcesQueryService):
         )
         return result
 
+    @cached(ttl=300, stale_ttl=900, scope=lambda svc: svc.identity())
     async def fetch_resources(
         self, subscription_id: str, resource_group_name: str | None = None
     ) -> list[OriginalResource]:
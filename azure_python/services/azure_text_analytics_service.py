@@ -1,15 +1,23 @@
+import asyncio
+import functools
 import logging
 from dataclasses import dataclass
 
 import nltk
-from azure.ai.textanalytics._models import RecognizeEntitiesResult
+from azure.ai.textanalytics._models import (
+    CategorizedEntity,
+    DocumentError,
+    RecognizeEntitiesResult,
+)
 from azure.ai.textanalytics.aio import TextAnalyticsClient
 from azure.core.credentials import AzureKeyCredential
 from azure.identity import DefaultAzureCredential
 from lagom.environment import Env
+from nltk.tokenize import PunktTokenizer
 
+from azure_python.common.text_segmenter import segment_text
 from azure_python.models.recognized_entities import RecognizedEntities, RecognizedEntity
-from azure_python.models.sentence import Sentence
+from azure_python.models.sentence import SentenceIndex
 from azure_python.protocols.i_azure_text_analytics_service import (
     IAzureTextAnalyticsService,
 )
@@ -17,9 +25,39 @@ from azure_python.protocols.i_azure_text_analytics_service import (
 nltk.download("punkt_tab")
 
 
+@functools.cache
+def punkt_tokenizer(language: str = "english") -> PunktTokenizer:
+    return PunktTokenizer(language)
+
+
+def unique_entities(entities: list[RecognizedEntity]) -> list[RecognizedEntity]:
+    """
+    The entities of a document, once each, in the order of their offsets.
+
+    Entities in the overlap of two segments are found in both; of those at the
+    same offset and category, the longest is kept, the other may be truncated
+    by the end of its segment.
+    """
+    found: dict[tuple[int, str], RecognizedEntity] = {}
+    for entity in entities:
+        key = (entity.offset, entity.category)
+        if key not in found or entity.length > found[key].length:
+            found[key] = entity
+    return sorted(found.values(), key=lambda e: e.offset)
+
+
 class AzureTextAnalyticsServiceEnv(Env):
     azure_cog_service_endpoint: str
     azure_cog_service_key: str | None = None
+    azure_cog_service_max_documents: int = 5
+    """Documents per request, the API rejects more."""
+    azure_cog_service_max_document_length: int = 5120
+    """Longer documents are split in segments, the API rejects more characters."""
+    azure_cog_service_segment_overlap: int = 200
+    """Characters repeated from a segment in the next one, so that the entities
+    spanning a cut are found whole."""
+    azure_cog_service_concurrency: int = 4
+    """Requests in flight at a time."""
 
 
 @dataclass
@@ -47,44 +85,100 @@ class AzureTextAnalyticsService(IAzureTextAnalyticsService):
         self.logger.info("TextExtractionService: authenticated successfully")
         return client
 
-    def generate_sentences(self, content: str) -> list[Sentence]:
-        sentences = nltk.sent_tokenize(content)
-        return [
-            Sentence(content=sentence, start=content.index(sentence))
-            for sentence in sentences
-        ]
+    def generate_sentences(self, content: str) -> SentenceIndex:
+        # the spans locate repeated sentences too, in one pass over the content
+        return SentenceIndex(content, punkt_tokenizer().span_tokenize(content))
 
     def mapToRecognizedEntity(
-        self, result: RecognizeEntitiesResult, statements: list[list[Sentence]]
-    ) -> RecognizedEntities:
-        entities = [
-            RecognizedEntity(
-                text=entity.text,
-                category=entity.category,
-                subcategory=entity.subcategory,
-                confidence_score=entity.confidence_score,
-                offset=entity.offset,
-                length=entity.length,
-                sentence=Sentence.includes(statements[int(result.id)], entity.offset),
-            )
-            for entity in result.entities
+        self, entity: CategorizedEntity, start: int, statements: SentenceIndex
+    ) -> RecognizedEntity:
+        """The entity of a segment starting at offset `start` of its document."""
+        offset = start + entity.offset
+        return RecognizedEntity(
+            text=entity.text,
+            category=entity.category,
+            subcategory=entity.subcategory,
+            confidence_score=entity.confidence_score,
+            offset=offset,
+            length=entity.length,
+            sentence=statements.find(offset),
+        )
+
+    async def recognize_batches(
+        self, client: TextAnalyticsClient, batches: list[list[str]]
+    ) -> list[list[RecognizeEntitiesResult | DocumentError]]:
+        """Recognize the entities of `batches`, a request each, concurrently."""
+        concurrency = self.env.azure_cog_service_concurrency
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than or equal to 1")
+
+        responses: list[list[RecognizeEntitiesResult | DocumentError]] = [
+            [] for _ in batches
         ]
+        pending = iter(range(len(batches)))
 
-        return RecognizedEntities(id=result.id, entities=entities)
+        async def worker() -> None:
+            for index in pending:
+                responses[index] = await client.recognize_entities(batches[index])
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(min(concurrency, len(batches)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        return responses
 
     async def recognize_entities(self, content: list[str]) -> list[RecognizedEntities]:
         self.logger.debug("[BEGIN] recognize_entities")
         if len(content) == 0:
             return []
 
-        client = self.get_client()
         statements = [self.generate_sentences(c) for c in content]
+        # (document, start, end) of the segments, in the order of the documents
+        segments = [
+            (document, start, end)
+            for document, text in enumerate(content)
+            for start, end in segment_text(
+                text,
+                self.env.azure_cog_service_max_document_length,
+                self.env.azure_cog_service_segment_overlap,
+            )
+        ]
+        size = self.env.azure_cog_service_max_documents
+        batches = [segments[i : i + size] for i in range(0, len(segments), size)]
 
+        client = self.get_client()
         async with client:
-            results = await client.recognize_entities(content)
-            self.logger.debug("[COMPLETED] recognize_entities")
-            return [
-                self.mapToRecognizedEntity(result, statements)
-                for result in results
-                if isinstance(result, RecognizeEntitiesResult)
-            ]
+            responses = await self.recognize_batches(
+                client,
+                [[content[d][start:end] for d, start, end in b] for b in batches],
+            )
+
+        entities: list[list[RecognizedEntity]] = [[] for _ in content]
+        failed: set[int] = set()
+        for batch, results in zip(batches, responses):
+            for result in results:
+                # the ids are the positions of the segments in their batch
+                document, start, _ = batch[int(result.id)]
+                if not isinstance(result, RecognizeEntitiesResult):
+                    self.logger.warning(
+                        f"recognize_entities: document {document} failed: "
+                        f"{result.error}"
+                    )
+                    failed.add(document)
+                    continue
+                entities[document].extend(
+                    self.mapToRecognizedEntity(entity, start, statements[document])
+                    for entity in result.entities
+                )
+
+        self.logger.debug("[COMPLETED] recognize_entities")
+        return [
+            RecognizedEntities(id=str(document), entities=unique_entities(found))
+            for document, found in enumerate(entities)
+            if document not in failed
+        ]
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from logging import Logger
@@ -13,18 +14,34 @@ from azure.core.credentials import AzureKeyCredential
 from azure.identity.aio import DefaultAzureCredential
 from lagom.environment import Env
 
+from azure_python.common.moderation_cache import ModerationCache, moderation_key
+from azure_python.common.text_segmenter import segment_text
+from azure_python.models.long_text_analysis import LongTextAnalysis
 from azure_python.protocols.i_content_safety_service import IContentSafetyService
 
+CATEGORIES = [
+    TextCategory.HATE,
+    TextCategory.SELF_HARM,
+    TextCategory.SEXUAL,
+    TextCategory.VIOLENCE,
+]
+
 
 class ContentSafetyServiceEnv(Env):
     content_safety_endpoint: str
     content_safety_key: str | None = None
+    content_safety_max_text_length: int = 10000
+    """Longer texts are split in segments, the API rejects more characters."""
+    content_safety_segment_overlap: int = 200
+    content_safety_cache_max_entries: int = 1024
+    content_safety_cache_ttl_seconds: int | None = 3600
 
 
 @dataclass
 class ContentSafetyService(IContentSafetyService):
     env: ContentSafetyServiceEnv
     logger: Logger
+    cache: ModerationCache | None = None
 
     @asynccontextmanager
     async def get_client(self) -> AsyncIterator[ContentSafetyClient]:
@@ -55,26 +72,29 @@ class ContentSafetyService(IContentSafetyService):
                     self.logger.warning(f"Error closing credential: {e}")
 
     def collect_results(self, analysis_response: AnalyzeTextResult) -> list[dict]:
-        results = []
-        for cat in [
-            TextCategory.HATE,
-            TextCategory.SELF_HARM,
-            TextCategory.SEXUAL,
-            TextCategory.VIOLENCE,
-        ]:
-            result = next(
-                (
-                    item
-                    for item in analysis_response.categories_analysis
-                    if item.category == cat
-                ),
-                None,
-            )
-            if result:
-                results.append(result.as_dict())
-        return results
+        by_category = {
+            item.category: item for item in analysis_response.categories_analysis
+        }
+        return [by_category[cat].as_dict() for cat in CATEGORIES if cat in by_category]
 
     async def analyze_text(self, text: str) -> list[dict]:
+        key = moderation_key(text, CATEGORIES) if self.cache else None
+        if key:
+            cached = await self.cache.get(key)  # type: ignore
+            if cached is not None:
+                self.logger.debug("[CACHE HIT] analyze_text")
+                return cached
+
+        results = await self.analyze_uncached(text)
+        if key:
+            await self.cache.set(key, results)  # type: ignore
+        return results
+
+    async def analyze_uncached(self, text: str) -> list[dict]:
+        if len(text) > self.env.content_safety_max_text_length:
+            analysis = await self.analyze_long_text(text)
+            return analysis.as_results()
+
         self.logger.debug("[BEGIN] analyze_text")
         request = AnalyzeTextOptions(text=text)
 
@@ -83,3 +103,119 @@ class ContentSafetyService(IContentSafetyService):
             self.logger.debug("[COMPLETED] analyze_text")
 
         return self.collect_results(response)
+
+    async def analyze_many(
+        self, client: ContentSafetyClient, texts: list[str], concurrency: int
+    ) -> list[AnalyzeTextResult]:
+        """
+        Analyze `texts`, each within the API limit, with at most `concurrency`
+        requests in flight.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than or equal to 1")
+
+        responses: list[AnalyzeTextResult | None] = [None] * len(texts)
+        pending = iter(range(len(texts)))
+
+        async def worker() -> None:
+            for index in pending:
+                responses[index] = await client.analyze_text(
+                    AnalyzeTextOptions(text=texts[index])
+                )
+
+        workers = [
+            asyncio.create_task(worker()) for _ in range(min(concurrency, len(texts)))
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+
+        return responses  # type: ignore
+
+    async def analyze_texts(
+        self, texts: list[str], concurrency: int = 8
+    ) -> list[list[dict]]:
+        if self.cache is None:
+            return await self.analyze_texts_uncached(texts, concurrency)
+
+        keys = [moderation_key(text, CATEGORIES) for text in texts]
+        found = await asyncio.gather(*(self.cache.get(key) for key in keys))
+        results = dict(zip(keys, found))
+        # texts that normalize to the same key are analyzed once
+        misses = {key: text for key, text in zip(keys, texts) if results[key] is None}
+        self.logger.debug(f"[CACHE] analyze_texts: {len(misses)} misses")
+
+        if misses:
+            analyzed = await self.analyze_texts_uncached(
+                list(misses.values()), concurrency
+            )
+            for key, items in zip(misses, analyzed):
+                results[key] = items
+                await self.cache.set(key, items)
+        # every text gets its own copy of the results
+        return [[dict(item) for item in results[key] or []] for key in keys]
+
+    async def analyze_texts_uncached(
+        self, texts: list[str], concurrency: int
+    ) -> list[list[dict]]:
+        self.logger.debug(f"[BEGIN] analyze_texts: {len(texts)}")
+        max_chars = self.env.content_safety_max_text_length
+        # texts over the API limit are split like in analyze_long_text, and
+        # their segments analyzed along with the other texts
+        segments = [
+            segment_text(text, max_chars, self.env.content_safety_segment_overlap)
+            if len(text) > max_chars
+            else [(0, len(text))]
+            for text in texts
+        ]
+        pieces = [
+            text[start:end]
+            for text, spans in zip(texts, segments)
+            for start, end in spans
+        ]
+
+        async with self.get_client() as client:
+            responses = await self.analyze_many(client, pieces, concurrency)
+
+        results: list[list[dict]] = []
+        position = 0
+        for spans in segments:
+            items = [
+                self.collect_results(response)
+                for response in responses[position : position + len(spans)]
+            ]
+            position += len(spans)
+            if len(spans) == 1:
+                results.append(items[0])
+            else:
+                results.append(LongTextAnalysis.reduce(spans, items).as_results())
+
+        self.logger.debug(f"[COMPLETED] analyze_texts: {len(texts)}")
+        return results
+
+    async def analyze_long_text(
+        self,
+        text: str,
+        max_chars: int | None = None,
+        overlap: int | None = None,
+        concurrency: int = 8,
+    ) -> LongTextAnalysis:
+        max_chars = max_chars or self.env.content_safety_max_text_length
+        overlap = (
+            self.env.content_safety_segment_overlap if overlap is None else overlap
+        )
+        segments = segment_text(text, max_chars, overlap)
+        self.logger.debug(f"[BEGIN] analyze_long_text: {len(segments)} segments")
+
+        async with self.get_client() as client:
+            responses = await self.analyze_many(
+                client, [text[start:end] for start, end in segments], concurrency
+            )
+
+        analysis = LongTextAnalysis.reduce(
+            segments, [self.collect_results(response) for response in responses]
+        )
+        self.logger.debug("[COMPLETED] analyze_long_text")
+        return analysis
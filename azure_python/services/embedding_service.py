@@ -1,25 +1,86 @@
+import asyncio
 from contextlib import asynccontextmanager
 from dataclasses import dataclass
 from logging import Logger
-from typing import AsyncIterator
+from typing import AsyncIterator, Awaitable, Callable
 
+import numpy as np
 from azure.ai.inference.aio import EmbeddingsClient
-from azure.ai.inference.models import EmbeddingsResult
+from azure.ai.inference.models import EmbeddingItem, EmbeddingsResult, EmbeddingsUsage
 from azure.core.credentials import AzureKeyCredential
 from azure.identity.aio import DefaultAzureCredential
 from lagom.environment import Env
 
+from azure_python.common.embedding_cache import EmbeddingCache, embedding_key
+from azure_python.common.token_counter import TokenCounter
+from azure_python.common.vectors import allocate_matrix, l2_normalize
+
 
 class EmbeddingServiceEnv(Env):
     embedding_endpoint: str
     embedding_model: str
     embedding_credential: str | None = None
+    embedding_batch_size: int = 512
+    """The API accepts at most 2048 inputs per request."""
+    embedding_max_tokens_per_batch: int = 100_000
+    embedding_concurrency: int = 4
+    embedding_cache_dir: str = ".embedding_cache"
+    embedding_cache_ttl_seconds: int | None = None
+    """Expiry of the entries of the Redis embedding cache."""
+
+
+def plan_batches(
+    token_counts: list[int], batch_size: int, max_tokens_per_batch: int
+) -> list[tuple[int, int]]:
+    """
+    Split consecutive inputs in batches.
+
+    A batch holds at most `batch_size` inputs and `max_tokens_per_batch`
+    tokens, an input larger than the token budget is sent alone.
+
+    :param token_counts: The number of tokens of each input.
+    :param batch_size: The maximum number of inputs per batch.
+    :param max_tokens_per_batch: The maximum number of tokens per batch.
+    :raises ValueError: If batch_size or max_tokens_per_batch is lower than 1.
+    :return: The (start, end) positions of the batches.
+    """
+    if batch_size < 1 or max_tokens_per_batch < 1:
+        raise ValueError(
+            "batch_size and max_tokens_per_batch must be greater than or equal to 1"
+        )
+
+    batches: list[tuple[int, int]] = []
+    start = 0
+    tokens = 0
+    for i, count in enumerate(token_counts):
+        if i > start and (
+            i - start >= batch_size or tokens + count > max_tokens_per_batch
+        ):
+            batches.append((start, i))
+            start = i
+            tokens = 0
+        tokens += count
+
+    if start < len(token_counts):
+        batches.append((start, len(token_counts)))
+    return batches
+
+
+def sum_usage(results: list[EmbeddingsResult]) -> EmbeddingsUsage:
+    return EmbeddingsUsage(
+        prompt_tokens=sum(r.usage.prompt_tokens for r in results),
+        total_tokens=sum(r.usage.total_tokens for r in results),
+    )
 
 
 @dataclass
 class EmbeddingService:
     env: EmbeddingServiceEnv
     logger: Logger
+    cache: EmbeddingCache | None = None
+
+    def __post_init__(self) -> None:
+        self.token_counter = TokenCounter.for_model(self.env.embedding_model)
 
     @asynccontextmanager
     async def get_client(self) -> AsyncIterator[EmbeddingsClient]:
@@ -46,7 +107,215 @@ class EmbeddingService:
 
     async def get_embeddings(self, text: list[str]) -> EmbeddingsResult:
         self.logger.debug("[BEGIN] get_embeddings")
+        result = await self.embed_many(
+            text,
+            batch_size=self.env.embedding_batch_size,
+            max_tokens_per_batch=self.env.embedding_max_tokens_per_batch,
+            concurrency=self.env.embedding_concurrency,
+        )
+        self.logger.debug("[COMPLETED] get_embeddings")
+        return result
+
+    async def run_batches(
+        self,
+        texts: list[str],
+        batch_size: int,
+        max_tokens_per_batch: int,
+        concurrency: int,
+        on_result: Callable[[int, int, EmbeddingsResult], Awaitable[None]],
+    ) -> None:
+        """
+        Embed `texts` in batches sent concurrently on one client.
+
+        `on_result` is awaited with the (start, end) positions of each batch and
+        its result as soon as the batch completes, in completion order.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be greater than or equal to 1")
+
+        await self.token_counter.load()
+        batches = plan_batches(
+            [self.token_counter.count_text(t) for t in texts],
+            batch_size,
+            max_tokens_per_batch,
+        )
+        if not batches:
+            return
+        pending = iter(batches)
+
         async with self.get_client() as client:
-            result = await client.embed(input=text)
-            self.logger.debug("[COMPLETED] get_embeddings")
-            return result
+
+            async def worker() -> None:
+                for start, end in pending:
+                    result = await client.embed(input=texts[start:end])
+                    # the items are not guaranteed to be in the input order
+                    result.data = sorted(result.data, key=lambda item: item.index)
+                    await on_result(start, end, result)
+
+            workers = [
+                asyncio.create_task(worker())
+                for _ in range(min(concurrency, len(batches)))
+            ]
+            try:
+                await asyncio.gather(*workers)
+            finally:
+                for task in workers:
+                    task.cancel()
+
+    async def lookup_cache(
+        self, texts: list[str]
+    ) -> tuple[list[str], dict[int, np.ndarray]]:
+        """Cache keys of `texts` and the cached vectors, by position in `texts`."""
+        if self.cache is None:
+            return [], {}
+
+        keys = [embedding_key(self.env.embedding_model, t) for t in texts]
+        cached = await self.cache.get_many(keys)
+        await self.token_counter.load()
+        self.cache.tokens_saved += sum(
+            self.token_counter.count_text(texts[i]) for i in cached
+        )
+        self.logger.debug(
+            f"embedding cache: {len(cached)}/{len(texts)} hits, "
+            f"hit rate {self.cache.hit_rate:.2%}, "
+            f"{self.cache.tokens_saved} tokens saved"
+        )
+        return keys, cached
+
+    async def store_cache(
+        self, keys: list[str], positions: list[int], result: EmbeddingsResult
+    ) -> np.ndarray:
+        """Cache the vectors of `result`, the texts at `positions`; return them."""
+        rows = np.asarray([item.embedding for item in result.data], np.float32)
+        if self.cache is not None:
+            await self.cache.put_many([keys[p] for p in positions], rows)
+        return rows
+
+    async def embed_many(
+        self,
+        texts: list[str],
+        batch_size: int = 512,
+        max_tokens_per_batch: int = 100_000,
+        concurrency: int = 4,
+    ) -> EmbeddingsResult:
+        """
+        Embed `texts` in batches sent concurrently on one client.
+
+        Texts found in the cache are not sent to the service.
+
+        :param texts: The texts to embed.
+        :param batch_size: The maximum number of texts per request.
+        :param max_tokens_per_batch: The maximum number of tokens per request.
+        :param concurrency: The maximum number of requests in flight.
+        :raises ValueError: If a limit is lower than 1.
+        :return: The embeddings of all the texts, in input order.
+        """
+        if not texts:
+            return EmbeddingsResult(
+                id="", data=[], usage=sum_usage([]), model=self.env.embedding_model
+            )
+
+        self.logger.debug(f"[BEGIN] embed_many: {len(texts)}")
+        keys, cached = await self.lookup_cache(texts)
+        misses = [i for i in range(len(texts)) if i not in cached]
+        results: dict[int, EmbeddingsResult] = {}
+
+        async def on_result(start: int, end: int, result: EmbeddingsResult) -> None:
+            results[start] = result
+            if self.cache is not None:
+                await self.store_cache(keys, misses[start:end], result)
+
+        await self.run_batches(
+            [texts[i] for i in misses],
+            batch_size,
+            max_tokens_per_batch,
+            concurrency,
+            on_result,
+        )
+        self.logger.debug(f"[COMPLETED] embed_many: {len(texts)} in {len(results)}")
+
+        if not cached and len(results) == 1:
+            # nothing to reassemble, keep the result of the service as is
+            return results[0]
+
+        fresh = [results[start] for start in sorted(results)]
+        embeddings = iter(item.embedding for r in fresh for item in r.data)
+        return EmbeddingsResult(
+            id=fresh[0].id if fresh else "",
+            data=[
+                EmbeddingItem(
+                    embedding=cached[i].tolist() if i in cached else next(embeddings),
+                    index=i,
+                )
+                for i in range(len(texts))
+            ],
+            usage=sum_usage(fresh),
+            model=fresh[0].model if fresh else self.env.embedding_model,
+        )
+
+    async def embed_matrix(
+        self,
+        texts: list[str],
+        normalize: bool = False,
+        out: np.ndarray | None = None,
+        path: str | None = None,
+    ) -> np.ndarray:
+        """
+        Embed `texts` into a contiguous float32 matrix, one row per text.
+
+        Each batch is written into the matrix as soon as it completes, so the
+        embeddings never exist as Python float lists all at once.
+
+        :param texts: The texts to embed.
+        :param normalize: Scale the rows to unit L2 norm.
+        :param out: The matrix to write into, of len(texts) rows.
+        :param path: Allocate the matrix as a memory-mapped .npy file at `path`,
+            ignored when `out` is given.
+        :raises ValueError: If `out` is not float32, or its shape does not match.
+        :return: The (len(texts), dim) matrix, `out` if given.
+        """
+        if out is not None and (
+            out.dtype != np.float32 or out.ndim != 2 or out.shape[0] != len(texts)
+        ):
+            raise ValueError(
+                f"out must be a float32 matrix of {len(texts)} rows, "
+                f"got {out.dtype} {out.shape}"
+            )
+
+        matrix = out
+
+        def write_rows(positions: slice | list[int], rows: np.ndarray) -> None:
+            nonlocal matrix
+            if matrix is None:
+                matrix = allocate_matrix((len(texts), rows.shape[1]), path)
+            if rows.shape[1] != matrix.shape[1]:
+                raise ValueError(
+                    f"expected embeddings of {matrix.shape[1]} dimensions, "
+                    f"got {rows.shape[1]}"
+                )
+            matrix[positions] = l2_normalize(rows) if normalize else rows
+
+        self.logger.debug(f"[BEGIN] embed_matrix: {len(texts)}")
+        keys, cached = await self.lookup_cache(texts)
+        misses = [i for i in range(len(texts)) if i not in cached]
+        if cached:
+            write_rows(list(cached), np.stack(list(cached.values())))
+
+        async def on_result(start: int, end: int, result: EmbeddingsResult) -> None:
+            rows = await self.store_cache(keys, misses[start:end], result)
+            write_rows(misses[start:end] if cached else slice(start, end), rows)
+
+        await self.run_batches(
+            [texts[i] for i in misses],
+            self.env.embedding_batch_size,
+            self.env.embedding_max_tokens_per_batch,
+            self.env.embedding_concurrency,
+            on_result,
+        )
+        self.logger.debug(f"[COMPLETED] embed_matrix: {len(texts)}")
+
+        if matrix is None:
+            return np.empty((0, 0), dtype=np.float32)
+        if isinstance(matrix, np.memmap):
+            matrix.flush()
+        return matrix
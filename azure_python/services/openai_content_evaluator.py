@@ -1,48 +1,118 @@
 from dataclasses import dataclass
+from functools import lru_cache
 from logging import Logger
 from typing import Any, Literal
 
 from openai.types.chat import (
     ChatCompletion,
 )
+from openai.types.chat.chat_completion import Choice
 
+from azure_python.models.content_safety_verdict import (
+    ContentFilterHit,
+    ContentSafetyVerdict,
+)
 from azure_python.protocols.i_openai_content_evaluator import (
     ContentSafeException,
     IOpenAIContentEvaluator,
 )
 
+SEVERITY_RANK = {"safe": 0, "low": 1, "medium": 2, "high": 3}
+
+
+@lru_cache(maxsize=None)
+def severity_table(threshold: Literal["low", "medium", "high"]) -> dict[str, bool]:
+    """
+    Whether a severity fails the check at `threshold`, built once per threshold.
+
+    The usual spellings are precomputed so that lookups do not lowercase.
+    """
+    table: dict[str, bool] = {}
+    for severity, rank in SEVERITY_RANK.items():
+        blocked = rank >= SEVERITY_RANK[threshold]
+        for spelling in (severity, severity.upper(), severity.capitalize()):
+            table[spelling] = blocked
+    return table
+
+
+@lru_cache(maxsize=64)
+def safe_verdict(num_choices: int) -> ContentSafetyVerdict:
+    """The verdict of a response without hits, shared as verdicts are frozen."""
+    return ContentSafetyVerdict(prompt_hits=[], choice_hits={}, num_choices=num_choices)
+
 
 @dataclass
 class OpenAIContentEvaluator(IOpenAIContentEvaluator):
     logger: Logger
 
-    def evaluate_severity(
-        self, dict_filters: dict[str, str], theshold: Literal["low", "medium", "high"]
-    ) -> None:
-        if "severity" in dict_filters:
-            lc_val = dict_filters["severity"].lower()
+    def find_hits(
+        self, data: dict[str, Any], table: dict[str, bool]
+    ) -> list[ContentFilterHit]:
+        """
+        The categories of the filter results that fail the check.
 
-            if (
-                (lc_val == "high")
-                or (lc_val == "medium" and theshold in ["medium", "low"])
-                or (lc_val == "low" and theshold == "low")
+        :param data: The content filter results, by category.
+        :param table: The severity table of the threshold.
+        """
+        hits: list[ContentFilterHit] = []
+        for category, result in data.items():
+            severity = result.get("severity")
+            if result.get("filtered") is True:
+                reason = "filtered"
+            elif severity is not None and (
+                table[severity]
+                if severity in table
+                else table.get(severity.lower(), False)
             ):
-                raise ContentSafeException(
-                    f"Content safety check failed. Severity: {lc_val}."
-                )
+                reason = "severity"
+            elif result.get("detected") is True:
+                reason = "detected"
+            else:
+                continue
 
-    def validate(
-        self, data: dict[str, Any], threshold: Literal["low", "medium", "high"]
-    ) -> None:
-        for k, v in data.items():
-            if (
-                ("filtered" in v and v["filtered"] is True)
-                or self.evaluate_severity(v, threshold)
-                or ("detected" in v and v["detected"] is True)
-            ):
-                raise ContentSafeException(
-                    f"Content safety check failed. Category: {k}."
-                )
+            hits.append(
+                ContentFilterHit(category=category, reason=reason, severity=severity)
+            )
+        return hits
+
+    @staticmethod
+    def prompt_filter_results(response: ChatCompletion) -> dict[str, Any] | None:
+        prompt_filter_results = getattr(response, "prompt_filter_results", None)
+        if not prompt_filter_results:
+            return None
+        return prompt_filter_results[0].get("content_filter_results")
+
+    @staticmethod
+    def choice_filter_results(choice: Choice) -> dict[str, Any] | None:
+        extra = choice.model_extra
+        return extra.get("content_filter_results") if isinstance(extra, dict) else None
+
+    def evaluate(
+        self,
+        response: ChatCompletion,
+        threshold: Literal["low", "medium", "high"] = "high",
+    ) -> ContentSafetyVerdict:
+        table = severity_table(threshold)
+
+        results = self.prompt_filter_results(response)
+        prompt_hits = self.find_hits(results, table) if results else None
+
+        # models are only built for hits, safe responses share one verdict
+        choices = response.choices or []
+        choice_hits: dict[int, list[ContentFilterHit]] = {}
+        for index, choice in enumerate(choices):
+            results = self.choice_filter_results(choice)
+            hits = self.find_hits(results, table) if results else None
+            if hits:
+                choice_hits[index] = hits
+
+        if not prompt_hits and not choice_hits:
+            return safe_verdict(len(choices))
+        return ContentSafetyVerdict(
+            prompt_hits=prompt_hits or [],
+            choice_hits=choice_hits,
+            num_choices=len(choices),
+        )
 
     def content_safety_check(
         self,
@@ -50,17 +120,7 @@ class OpenAIContentEvaluator(IOpenAIContentEvaluator):
         threshold: Literal["low", "medium", "high"] = "high",
     ) -> None:
         self.logger.debug("[BEGIN] content_safety_check")
-        if response.prompt_filter_results:  # type: ignore
-            item: dict[str, Any] = response.prompt_filter_results[0]  # type: ignore
-
-            if "content_filter_results" in item and item["content_filter_results"]:
-                self.validate(item["content_filter_results"], threshold)  # type: ignore
-
-            if response.choices:
-                for choice in response.choices:
-                    if "content_filter_results" in choice.model_extra:  # type: ignore
-                        self.validate(
-                            choice.model_extra["content_filter_results"],  # type: ignore
-                            threshold,
-                        )  # type: ignore
+        verdict = self.evaluate(response, threshold)
+        if not verdict.safe:
+            raise ContentSafeException(verdict.failure_message())
         self.logger.debug("[COMPLETED] content_safety_check")
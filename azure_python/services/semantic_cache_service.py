@@ -0,0 +1,167 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import dataclass
+from logging import Logger
+
+import numpy as np
+from lagom.environment import Env
+from openai.types.chat import ChatCompletionMessageParam
+
+from azure_python.models.llm_response import LLMResponse
+from azure_python.protocols.i_embedding_service import IEmbeddingService
+from azure_python.protocols.i_semantic_cache_service import ISemanticCacheService
+
+MAX_PENDING_EMBEDDINGS = 128
+
+
+class SemanticCacheServiceEnv(Env):
+    semantic_cache_threshold: float = 0.95
+    semantic_cache_max_entries: int = 1000
+
+
+def last_user_message(
+    messages: list[ChatCompletionMessageParam],
+) -> tuple[int, str] | None:
+    """Return the position and text of the last user message, if any."""
+    for i in range(len(messages) - 1, -1, -1):
+        message = messages[i]
+        if message.get("role") != "user":
+            continue
+
+        content = message.get("content")
+        if isinstance(content, str):
+            return i, content
+        if content:
+            texts = [
+                str(part.get("text", ""))
+                for part in content  # type: ignore
+                if isinstance(part, dict) and part.get("type") == "text"
+            ]
+            return i, "\n".join(texts)
+        return None
+    return None
+
+
+@dataclass
+class SemanticCacheService(ISemanticCacheService):
+    """
+    In-process semantic cache for chat completions.
+
+    The last user message is embedded and compared (cosine similarity) against
+    the prompts stored so far. Entries only match within the same namespace,
+    which is derived from the scope and the rest of the conversation, so the
+    same question asked under a different system prompt is not a hit.
+    The cache holds at most `semantic_cache_max_entries` entries and evicts the
+    least recently used one when full.
+    """
+
+    env: SemanticCacheServiceEnv
+    embedding_service: IEmbeddingService
+    logger: Logger
+
+    def __post_init__(self) -> None:
+        capacity = self.env.semantic_cache_max_entries
+        if capacity < 1:
+            raise ValueError(
+                "semantic_cache_max_entries must be greater than or equal to 1"
+            )
+        self.vectors: np.ndarray | None = None
+        self.namespaces = np.zeros(capacity, dtype=np.int64)
+        self.last_used = np.zeros(capacity, dtype=np.int64)
+        self.responses: list[list[LLMResponse]] = []
+        self.size = 0
+        self.clock = 0
+        self.pending: OrderedDict[tuple[int, str], np.ndarray] = OrderedDict()
+
+    def get_namespace(
+        self, messages: list[ChatCompletionMessageParam], position: int, scope: str
+    ) -> int:
+        context = [scope, messages[:position], messages[position + 1 :]]
+        digest = hashlib.sha256(
+            json.dumps(context, sort_keys=True, default=str).encode("utf-8")
+        ).digest()
+        return int.from_bytes(digest[:8], "little", signed=True)
+
+    async def embed(self, text: str) -> np.ndarray:
+        result = await self.embedding_service.get_embeddings([text])
+        vector = np.asarray(result.data[0].embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def best_match(self, namespace: int, vector: np.ndarray) -> tuple[int, float]:
+        if self.vectors is None or self.size == 0:
+            return -1, -1.0
+
+        scores = self.vectors[: self.size] @ vector
+        scores[self.namespaces[: self.size] != namespace] = -np.inf
+        idx = int(np.argmax(scores))
+        return idx, float(scores[idx])
+
+    def touch(self, idx: int) -> None:
+        self.clock += 1
+        self.last_used[idx] = self.clock
+
+    async def lookup(
+        self, messages: list[ChatCompletionMessageParam], scope: str = ""
+    ) -> list[LLMResponse] | None:
+        found = last_user_message(messages)
+        if found is None:
+            return None
+
+        position, prompt = found
+        namespace = self.get_namespace(messages, position, scope)
+        vector = await self.embed(prompt)
+
+        # keep the embedding around so that `store` does not embed the prompt again
+        self.pending[(namespace, prompt)] = vector
+        while len(self.pending) > MAX_PENDING_EMBEDDINGS:
+            self.pending.popitem(last=False)
+
+        idx, score = self.best_match(namespace, vector)
+        if score < self.env.semantic_cache_threshold:
+            self.logger.debug(f"semantic cache miss, best score: {score:.4f}")
+            return None
+
+        self.logger.debug(f"semantic cache hit, score: {score:.4f}")
+        self.touch(idx)
+        # copies, so that callers changing the responses do not change the cache
+        return [response.model_copy(deep=True) for response in self.responses[idx]]
+
+    async def store(
+        self,
+        messages: list[ChatCompletionMessageParam],
+        responses: list[LLMResponse],
+        scope: str = "",
+    ) -> None:
+        found = last_user_message(messages)
+        if found is None or not responses:
+            return
+
+        position, prompt = found
+        namespace = self.get_namespace(messages, position, scope)
+        responses = [response.model_copy(deep=True) for response in responses]
+        vector = self.pending.pop((namespace, prompt), None)
+        if vector is None:
+            vector = await self.embed(prompt)
+
+        if self.vectors is None:
+            self.vectors = np.zeros(
+                (self.env.semantic_cache_max_entries, vector.shape[0]),
+                dtype=np.float32,
+            )
+
+        idx, score = self.best_match(namespace, vector)
+        if score < self.env.semantic_cache_threshold:
+            if self.size < self.env.semantic_cache_max_entries:
+                idx = self.size
+                self.size += 1
+                self.responses.append(responses)
+            else:
+                idx = int(np.argmin(self.last_used[: self.size]))
+                self.logger.debug(f"semantic cache full, evicting entry {idx}")
+
+        self.vectors[idx] = vector
+        self.namespaces[idx] = namespace
+        self.responses[idx] = responses
+        self.touch(idx)
@@ -0,0 +1,97 @@
+import logging
+import timeit
+from typing import Any
+
+from openai.types.chat import ChatCompletion
+
+from azure_python.protocols.i_openai_content_evaluator import ContentSafeException
+from azure_python.services.openai_content_evaluator import OpenAIContentEvaluator
+
+NUM_GENERATIONS = 8
+REPEAT = 5
+NUMBER = 2000
+
+
+def filter_results(severity: str) -> dict[str, Any]:
+    return {
+        "hate": {"filtered": False, "severity": severity},
+        "self_harm": {"filtered": False, "severity": "safe"},
+        "sexual": {"filtered": False, "severity": "safe"},
+        "violence": {"filtered": False, "severity": "safe"},
+        "protected_material_code": {"filtered": False, "detected": False},
+        "protected_material_text": {"filtered": False, "detected": False},
+    }
+
+
+def build_response(num_generations: int) -> ChatCompletion:
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-bench",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o",
+            "prompt_filter_results": [
+                {"prompt_index": 0, "content_filter_results": filter_results("safe")}
+            ],
+            "choices": [
+                {
+                    "index": i,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": "Hello"},
+                    "content_filter_results": filter_results("low"),
+                }
+                for i in range(num_generations)
+            ],
+        }
+    )
+
+
+def legacy_check(response: ChatCompletion, threshold: str) -> None:
+    """The nested-dict walk the evaluator used before the severity table."""
+
+    def evaluate_severity(dict_filters: dict[str, str]) -> None:
+        if "severity" in dict_filters:
+            lc_val = dict_filters["severity"].lower()
+            if (
+                (lc_val == "high")
+                or (lc_val == "medium" and threshold in ["medium", "low"])
+                or (lc_val == "low" and threshold == "low")
+            ):
+                raise ContentSafeException(lc_val)
+
+    def validate(data: dict[str, Any]) -> None:
+        for k, v in data.items():
+            if (
+                ("filtered" in v and v["filtered"] is True)
+                or evaluate_severity(v)
+                or ("detected" in v and v["detected"] is True)
+            ):
+                raise ContentSafeException(k)
+
+    item: dict[str, Any] = response.prompt_filter_results[0]  # type: ignore
+    validate(item["content_filter_results"])
+    for choice in response.choices:
+        validate(choice.model_extra["content_filter_results"])  # type: ignore
+
+
+def best_of(stmt: Any) -> float:
+    """Best time per call, in microseconds."""
+    return min(timeit.repeat(stmt, repeat=REPEAT, number=NUMBER)) / NUMBER * 1e6
+
+
+def main() -> None:
+    response = build_response(NUM_GENERATIONS)
+    evaluator = OpenAIContentEvaluator(logger=logging.getLogger(__name__))
+
+    legacy = best_of(lambda: legacy_check(response, "medium"))
+    check = best_of(lambda: evaluator.content_safety_check(response, "medium"))
+    verdict = best_of(lambda: evaluator.evaluate(response, "medium"))
+
+    print(f"{NUM_GENERATIONS} choices, best of {REPEAT} x {NUMBER} calls")
+    print(f"legacy check:         {legacy:8.2f} us")
+    print(f"content_safety_check: {check:8.2f} us")
+    print(f"evaluate (verdict):   {verdict:8.2f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import random
+import time
+from typing import Any, Callable
+
+from nltk.tokenize import PunktSentenceTokenizer
+
+from azure_python.models.sentence import Sentence, SentenceIndex
+
+NUM_SENTENCES = [100, 1_000, 10_000]
+NUM_ENTITIES = 5_000
+REPEAT = 3
+
+
+def synthetic_sentences(rng: random.Random, count: int) -> list[Sentence]:
+    sentences = []
+    start = 0
+    for i in range(count):
+        # numbered, so that str.index cannot match an earlier copy
+        content = f"Sentence {i} " + "word " * rng.randint(5, 30) + "end."
+        sentences.append(Sentence(content=content, start=start))
+        start += len(content) + 1
+    return sentences
+
+
+def document(sentences: list[Sentence]) -> str:
+    return " ".join(sentence.content for sentence in sentences)
+
+
+def indexed_offsets(tokenizer: PunktSentenceTokenizer, content: str) -> list[int]:
+    """The search of every sentence from the start that span_tokenize replaces."""
+    return [content.index(sentence) for sentence in tokenizer.tokenize(content)]
+
+
+def linear_includes(sentences: list[Sentence], start: int) -> str:
+    """The scan of every sentence that SentenceIndex replaces."""
+    for sentence in sentences:
+        if sentence.start <= start <= sentence.start + len(sentence.content):
+            return sentence.content
+    raise RuntimeError(f"Sentence not found with start index: {start}")
+
+
+def indexed_lookups(sentences: list[Sentence], offsets: list[int]) -> list[str]:
+    # the index is built once per document, it is part of the cost
+    index = SentenceIndex(
+        document(sentences), ((s.start, s.start + len(s.content)) for s in sentences)
+    )
+    return [index.find(offset) for offset in offsets]
+
+
+def best_of(fn: Callable[[], Any]) -> float:
+    """Best time of a call in milliseconds."""
+    timings = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e3
+
+
+def main() -> None:
+    rng = random.Random(0)
+    print(f"{NUM_ENTITIES} entities per document")
+    print(f"{'sentences':>10} {'linear':>12} {'bisect':>12} {'speedup':>8}")
+    for count in NUM_SENTENCES:
+        sentences = synthetic_sentences(rng, count)
+        end = sentences[-1].start + len(sentences[-1].content)
+        offsets = [rng.randrange(end) for _ in range(NUM_ENTITIES)]
+
+        linear_ms = best_of(lambda: [linear_includes(sentences, o) for o in offsets])
+        bisect_ms = best_of(lambda: indexed_lookups(sentences, offsets))
+        print(
+            f"{count:>10} {linear_ms:9.1f} ms {bisect_ms:9.1f} ms "
+            f"{linear_ms / bisect_ms:7.0f}x"
+        )
+
+    # untrained, the punkt_tab model is not needed to compare the offsets
+    tokenizer = PunktSentenceTokenizer()
+    print("\nsentence offsets of a document")
+    print(f"{'sentences':>10} {'index':>12} {'spans':>12} {'speedup':>8}")
+    for count in NUM_SENTENCES:
+        content = document(synthetic_sentences(rng, count))
+        spans = SentenceIndex(content, tokenizer.span_tokenize(content))
+        offsets = indexed_offsets(tokenizer, content)
+        if offsets != list(spans.starts) or len(offsets) != count:
+            raise RuntimeError("the offsets of the two methods differ")
+
+        index_ms = best_of(lambda: indexed_offsets(tokenizer, content))
+        spans_ms = best_of(
+            lambda: SentenceIndex(content, tokenizer.span_tokenize(content))
+        )
+        print(
+            f"{count:>10} {index_ms:9.1f} ms {spans_ms:9.1f} ms "
+            f"{index_ms / spans_ms:7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import time
+from typing import Any, Callable
+
+import numpy as np
+
+from azure_python.common.quantization import QuantizedVectors
+from azure_python.common.vectors import l2_normalize
+
+NUM_VECTORS = 100_000
+DIM = 768
+NUM_CLUSTERS = 1_000
+NUM_QUERIES = 100
+K = 10
+REPEAT = 3
+
+
+def synthetic_embeddings(rng: np.random.Generator) -> tuple[np.ndarray, np.ndarray]:
+    """Clustered unit vectors, like embeddings of related chunks, and queries."""
+    centers = rng.normal(size=(NUM_CLUSTERS, DIM)).astype(np.float32)
+    labels = rng.integers(NUM_CLUSTERS, size=NUM_VECTORS)
+    noise = rng.normal(scale=0.7, size=(NUM_VECTORS, DIM)).astype(np.float32)
+    vectors = l2_normalize(centers[labels] + noise)
+
+    picked = rng.choice(NUM_VECTORS, NUM_QUERIES, replace=False)
+    noise = rng.normal(scale=0.5, size=(NUM_QUERIES, DIM)).astype(np.float32)
+    queries = l2_normalize(vectors[picked] + noise / np.sqrt(DIM))
+    return vectors, queries
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray) -> np.ndarray:
+    scores = queries @ vectors.T
+    top = np.argpartition(-scores, K - 1, axis=1)[:, :K]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall(found: np.ndarray, expected: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(e)) / K for f, e in zip(found, expected)]))
+
+
+def best_of(fn: Callable[[], Any]) -> tuple[float, Any]:
+    """Best time of a call in milliseconds, and its result."""
+    timings = []
+    result = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1e3, result
+
+
+def main() -> None:
+    vectors, queries = synthetic_embeddings(np.random.default_rng(0))
+    exact_ms, expected = best_of(lambda: exact_top_k(vectors, queries))
+
+    int8 = QuantizedVectors(vectors, mode="int8")
+    binary = QuantizedVectors(vectors, mode="binary")
+    binary_int8 = QuantizedVectors(vectors, mode="binary", keep_int8=True)
+    runs: list[tuple[str, int, Callable[[], Any]]] = [
+        ("int8", int8.nbytes, lambda: int8.search(queries, K, oversample=1)),
+        (
+            "int8 + float rerank x4",
+            int8.nbytes,
+            lambda: int8.search(queries, K, oversample=4, rerank=vectors),
+        ),
+        ("binary", binary.nbytes, lambda: binary.search(queries, K, oversample=1)),
+        (
+            "binary + float rerank x10",
+            binary.nbytes,
+            lambda: binary.search(queries, K, oversample=10, rerank=vectors),
+        ),
+        (
+            "binary+int8, rerank x10",
+            binary_int8.nbytes,
+            lambda: binary_int8.search(queries, K, oversample=10),
+        ),
+    ]
+
+    print(f"{NUM_VECTORS} x {DIM} vectors, {NUM_QUERIES} queries, recall@{K}")
+    print(f"{'mode':26} {'memory':>10} {'time':>10} {'recall':>7}")
+    print(f"{'float32 exact':26} {vectors.nbytes / 2**20:7.1f} MB {exact_ms:7.1f} ms")
+    for name, nbytes, search in runs:
+        elapsed, (_, rows) = best_of(search)
+        print(
+            f"{name:26} {nbytes / 2**20:7.1f} MB {elapsed:7.1f} ms "
+            f"{recall(rows, expected):7.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+import asyncio
+from typing import Any
+from unittest.mock import MagicMock
+
+import pytest
+from pydantic import BaseModel
+
+from azure_python.common.cache_aside import KEY_PREFIX, CacheAside, cached
+from tests.azure_python.common.conftest import FakeClock
+
+
+class FakeRedis:
+    def __init__(self) -> None:
+        self.values: dict[str, Any] = {}
+        self.ttls: dict[str, int | None] = {}
+        self.fail = False
+
+    async def get(self, key: str, codec=None) -> Any:
+        if self.fail:
+            raise ConnectionError("down")
+        return self.values.get(key)
+
+    async def set(self, key: str, value: Any, ttl=None, codec=None) -> None:
+        if self.fail:
+            raise ConnectionError("down")
+        self.values[key] = value
+        self.ttls[key] = ttl
+
+    async def delete_many(self, keys: list[str]) -> int:
+        return sum(self.values.pop(k, None) is not None for k in keys)
+
+
+class Item(BaseModel):
+    name: str
+
+
+class Service:
+    def __init__(self, cache: CacheAside | None) -> None:
+        self.cache = cache
+        self.calls = 0
+        self.result: str | None = "value"
+
+    @cached(ttl=10, stale_ttl=20, negative_ttl=5, key=lambda name: name)
+    async def get(self, name: str) -> str | None:
+        self.calls += 1
+        await asyncio.sleep(0)
+        return self.result
+
+    @cached(ttl=10)
+    async def items(self, prefix: str, limit: int = 2) -> list[Item]:
+        self.calls += 1
+        return [Item(name=f"{prefix}{i}") for i in range(limit)]
+
+
+class ScopedService:
+    def __init__(self, cache: CacheAside, tenant: str) -> None:
+        self.cache = cache
+        self.tenant = tenant
+        self.calls = 0
+
+    async def identity(self) -> str:
+        return self.tenant
+
+    @cached(ttl=10, key=lambda name: name, scope=lambda svc: svc.identity())
+    async def get(self, name: str) -> str:
+        self.calls += 1
+        return f"{self.tenant}:{name}"
+
+
+@pytest.fixture
+def redis() -> FakeRedis:
+    return FakeRedis()
+
+
+@pytest.fixture
+def service(redis: FakeRedis, clock: FakeClock) -> Service:
+    return Service(CacheAside(redis, logger=MagicMock(), clock=clock))  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_hit_and_expiry(service: Service, redis: FakeRedis, clock: FakeClock):
+    assert await service.get("a") == "value"
+    assert await service.get("a") == "value"
+    assert service.calls == 1
+    assert redis.ttls[KEY_PREFIX + "Service.get:a"] == 30
+
+    clock.now += 31  # neither fresh nor stale
+    assert await service.get("a") == "value"
+    assert service.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_stale_while_revalidate(service: Service, clock: FakeClock):
+    await service.get("a")
+    service.result = "new"
+    clock.now += 15
+
+    # the stale value is served, refreshed once in the background
+    assert await service.get("a") == "value"
+    assert await service.get("a") == "value"
+    await asyncio.gather(*service.cache.refreshes)  # type: ignore
+    assert service.calls == 2
+    assert await service.get("a") == "new"
+    assert service.cache.stale_hits == 2  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_negative_caching(service: Service, clock: FakeClock):
+    service.result = None
+    assert await service.get("a") is None
+    assert await service.get("a") is None
+    assert service.calls == 1
+
+    clock.now += 6
+    service.result = "found"
+    assert await service.get("a") == "found"
+
+
+@pytest.mark.asyncio
+async def test_coalescing(service: Service):
+    results = await asyncio.gather(*(service.get("a") for _ in range(5)))
+    assert results == ["value"] * 5
+    assert service.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_models_round_trip(service: Service, redis: FakeRedis):
+    first = await service.items("x", limit=3)
+    second = await service.items(prefix="x", limit=3)
+    assert second == first
+    assert all(isinstance(item, Item) for item in second)
+    assert service.calls == 1
+
+    # the default key covers all the arguments, defaults included
+    await service.items("x")
+    assert service.calls == 2
+    assert len(redis.values) == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidate(service: Service):
+    await service.get("a")
+    await service.cache.invalidate(service.get, "a")  # type: ignore
+    await service.get("a")
+    assert service.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_scope(redis: FakeRedis):
+    cache = CacheAside(redis, logger=MagicMock())  # type: ignore
+    first, second = ScopedService(cache, "t1"), ScopedService(cache, "t2")
+    assert await first.get("a") == "t1:a"
+    # the same arguments in another scope are a miss
+    assert await second.get("a") == "t2:a"
+    assert KEY_PREFIX + "t1:ScopedService.get:a" in redis.values
+
+    await cache.invalidate(second.get, "a")
+    assert await first.get("a") == "t1:a"
+    assert await second.get("a") == "t2:a"
+    assert (first.calls, second.calls) == (1, 2)
+
+
+@pytest.mark.asyncio
+async def test_redis_errors_are_misses(service: Service, redis: FakeRedis):
+    redis.fail = True
+    assert await service.get("a") == "value"
+    assert await service.get("a") == "value"
+    assert service.calls == 2
+    service.cache.logger.warning.assert_called()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_without_cache():
+    service = Service(cache=None)
+    await service.get("a")
+    await service.get("a")
+    assert service.calls == 2
@@ -0,0 +1,106 @@
+from unittest.mock import MagicMock
+
+from azure_python.common.deployment_router import (
+    Backend,
+    CircuitBreaker,
+    DeploymentRouter,
+)
+from azure_python.common.rate_limiter import TokenBucketRateLimiter
+from azure_python.models.openai_deployment import OpenAIDeployment
+from tests.azure_python.common.conftest import FakeClock
+
+
+def backend(
+    name: str, weight: float = 1.0, tokens_per_minute: int | None = None
+) -> Backend:
+    return Backend(
+        deployment=OpenAIDeployment(
+            endpoint=f"https://{name}.openai.azure.com", deployment=name, weight=weight
+        ),
+        client=MagicMock(),
+        rate_limiter=TokenBucketRateLimiter(tokens_per_minute=tokens_per_minute),
+    )
+
+
+def test_circuit_breaker(clock: FakeClock):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.is_open
+    assert not breaker.allow()
+
+    # half-open, a single trial goes through
+    clock.now = 10
+    assert breaker.allow()
+    breaker.on_request()
+    assert not breaker.allow()
+
+    # the trial fails, the breaker opens again
+    breaker.record_failure()
+    assert not breaker.allow()
+
+    # the trial is cancelled, the next one goes through
+    clock.now = 20
+    breaker.on_request()
+    breaker.release_trial()
+    assert breaker.is_open
+    assert breaker.allow()
+
+    breaker.on_request()
+    breaker.record_success()
+    assert not breaker.is_open
+    assert breaker.allow()
+
+
+def test_select_least_outstanding():
+    router = DeploymentRouter(backends=[backend("a"), backend("b", weight=2)])
+
+    idx, _ = router.select()
+    assert idx == 1
+
+    router.backends[1].outstanding = 2
+    idx, _ = router.select()
+    assert idx == 0
+
+    idx, _ = router.select(exclude={0})
+    assert idx == 1
+
+
+def test_select_remaining_quota():
+    router = DeploymentRouter(
+        backends=[
+            backend("a", tokens_per_minute=1000),
+            backend("b", tokens_per_minute=1000),
+        ],
+        strategy="remaining_quota",
+    )
+    assert router.backends[0].rate_limiter.tokens is not None
+    router.backends[0].rate_limiter.tokens.level = 100
+
+    idx, _ = router.select()
+    assert idx == 1
+
+    router.backends[1].rate_limiter.pause(60)
+    idx, _ = router.select()
+    assert idx == 0
+
+
+def test_select_skips_ejected_backends():
+    router = DeploymentRouter(backends=[backend("a"), backend("b"), backend("c")])
+    for b in router.backends:
+        b.breaker.clock = lambda: 6.0
+    router.backends[0].breaker.opened_at = 5.0
+    router.backends[1].breaker.opened_at = 1.0
+
+    idx, _ = router.select()
+    assert idx == 2
+
+    # everything left is ejected: pick the one ejected the longest
+    idx, _ = router.select(exclude={2})
+    assert idx == 1
+
+    # everything was tried: start over
+    idx, _ = router.select(exclude={0, 1, 2})
+    assert idx == 2
@@ -0,0 +1,93 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import numpy as np
+import pytest
+
+from azure_python.common.embedding_cache import (
+    REDIS_KEY_PREFIX,
+    EmbeddingCache,
+    LocalEmbeddingStore,
+    RedisEmbeddingStore,
+    embedding_key,
+)
+
+
+def test_embedding_key():
+    assert embedding_key("model", "text") == embedding_key("model", "text")
+    assert embedding_key("model", "text") != embedding_key("other", "text")
+    assert embedding_key("model", "text") != embedding_key("model", "Text")
+
+
+@pytest.mark.asyncio
+async def test_local_store(tmp_path):
+    store = LocalEmbeddingStore(str(tmp_path))
+    assert await store.get_many(["a"]) == {}
+
+    await store.put_many(["a", "b", "a"], np.array([[1, 2], [3, 4], [5, 6]]))
+    await store.put_many(["b", "c"], np.array([[0, 0], [7, 8]]))
+    assert store.count == 3
+
+    found = await store.get_many(["x", "c", "a"])
+    assert list(found) == [1, 2]
+    np.testing.assert_array_equal(found[1], [7, 8])
+    np.testing.assert_array_equal(found[2], [1, 2])
+
+    with pytest.raises(ValueError):
+        await store.put_many(["d"], np.zeros((1, 3)))
+
+    # reopened from disk
+    reopened = LocalEmbeddingStore(str(tmp_path))
+    assert reopened.dim == 2
+    found = await reopened.get_many(["b"])
+    np.testing.assert_array_equal(found[0], [3, 4])
+
+
+@pytest.mark.asyncio
+async def test_local_store_interrupted_write(tmp_path):
+    store = LocalEmbeddingStore(str(tmp_path))
+    await store.put_many(["a", "b"], np.array([[1, 2], [3, 4]]))
+
+    # the vector of "c" was only partially written, its key never was
+    with open(store.vectors_path, "ab") as f:
+        f.write(b"\x00\x00")
+
+    reopened = LocalEmbeddingStore(str(tmp_path))
+    assert reopened.count == 2
+    await reopened.put_many(["c"], np.array([[5, 6]]))
+    found = await LocalEmbeddingStore(str(tmp_path)).get_many(["a", "c"])
+    np.testing.assert_array_equal(found[0], [1, 2])
+    np.testing.assert_array_equal(found[1], [5, 6])
+
+
+@pytest.mark.asyncio
+async def test_redis_store():
+    values: dict[str, bytes] = {}
+
+    async def mset(items: dict[str, bytes], ttl=None, codec=None) -> None:
+        values.update(items)
+
+    redis = MagicMock(
+        mget=AsyncMock(side_effect=lambda keys, codec: [values.get(k) for k in keys]),
+        mset=AsyncMock(side_effect=mset),
+    )
+    store = RedisEmbeddingStore(redis, ttl=60)
+
+    await store.put_many(["a"], np.array([[1.5, 2.5]]))
+    assert list(values) == [REDIS_KEY_PREFIX + "a"]
+    assert redis.mset.call_args.kwargs["ttl"] == 60
+
+    found = await store.get_many(["b", "a"])
+    assert list(found) == [1]
+    np.testing.assert_array_equal(found[1], [1.5, 2.5])
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache(tmp_path):
+    cache = EmbeddingCache(LocalEmbeddingStore(str(tmp_path)))
+    assert cache.hit_rate == 0.0
+
+    await cache.put_many([], np.zeros((0, 2)))
+    await cache.put_many(["a"], np.array([[1, 2]]))
+    await cache.get_many(["a", "b"])
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.hit_rate == 0.5
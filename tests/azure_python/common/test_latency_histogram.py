@@ -0,0 +1,49 @@
+import pytest
+
+from azure_python.common.latency_histogram import LatencyHistogram, LatencyRecorder
+
+
+def test_percentiles_within_bucket_precision():
+    histogram = LatencyHistogram()
+    for i in range(1, 1001):
+        histogram.record(i / 1000)  # 1ms to 1s
+
+    factor = 2 ** (1 / 4)
+    for p, expected in ((50, 0.5), (90, 0.9), (99, 0.99)):
+        assert expected <= histogram.percentile(p) <= expected * factor
+    assert histogram.percentile(100) == 1.0
+    assert histogram.summary()["count"] == 1000
+    assert histogram.summary()["mean"] == pytest.approx(0.5005)
+
+
+def test_out_of_range_and_empty():
+    histogram = LatencyHistogram(lowest=0.001, highest=1.0)
+    assert histogram.percentile(99) == 0.0
+
+    histogram.record(0.0)
+    histogram.record(100.0)
+    assert histogram.percentile(50) == 0.001
+    assert histogram.percentile(100) == 100.0
+    assert histogram.max == 100.0
+
+
+def test_recorder():
+    now = [0.0]
+    recorder = LatencyRecorder(clock=lambda: now[0])
+
+    with recorder.time("GET"):
+        now[0] += 0.002
+    with pytest.raises(ConnectionError):
+        with recorder.time("GET"):
+            now[0] += 0.004
+            raise ConnectionError()
+    with recorder.time("SET"):
+        now[0] += 0.001
+
+    summary = recorder.summary()
+    assert list(summary) == ["GET", "SET"]
+    assert summary["GET"]["count"] == 2
+    assert summary["GET"]["max"] == pytest.approx(0.004)
+
+    recorder.reset()
+    assert recorder.summary() == {}
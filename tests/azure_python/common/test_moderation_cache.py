@@ -0,0 +1,69 @@
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from azure_python.common.moderation_cache import (
+    ModerationCache,
+    moderation_key,
+    normalize_text,
+)
+
+RESULTS = [{"category": "Hate", "severity": 2}]
+
+
+def test_normalize_text():
+    assert normalize_text("  hello \n\t world  ") == "hello world"
+    assert normalize_text("café") == "café"
+
+
+def test_moderation_key():
+    key = moderation_key("hello  world", ["Hate", "Violence"])
+    assert key.startswith("content_safety:")
+    assert key == moderation_key(" hello world\n", ["Hate", "Violence"])
+    assert key != moderation_key("hello world", ["Hate"])
+    assert key != moderation_key("Hello world", ["Hate", "Violence"])
+
+
+@pytest.mark.asyncio
+async def test_local_cache():
+    cache = ModerationCache(logger=MagicMock(), max_entries=10)
+    assert await cache.get("key") is None
+
+    await cache.set("key", RESULTS)
+    cached = await cache.get("key")
+    assert cached == RESULTS
+
+    cached[0]["severity"] = 6  # type: ignore
+    assert await cache.get("key") == RESULTS
+
+
+@pytest.mark.asyncio
+async def test_redis_cache():
+    redis = MagicMock(get=AsyncMock(return_value=None), set=AsyncMock())
+    cache = ModerationCache(logger=MagicMock(), ttl=60, redis=redis)
+
+    assert await cache.get("key") is None
+    await cache.set("key", RESULTS)
+    redis.set.assert_called_once_with("key", RESULTS, ttl=60, codec="json")
+
+    # another process only has the entry in Redis
+    other = ModerationCache(logger=MagicMock(), redis=redis)
+    redis.get = AsyncMock(return_value=RESULTS)
+    assert await other.get("key") == RESULTS
+    assert await other.get("key") == RESULTS
+    redis.get.assert_called_once_with("key", codec="json")
+
+
+@pytest.mark.asyncio
+async def test_redis_errors():
+    logger = MagicMock()
+    redis = MagicMock(
+        get=AsyncMock(side_effect=Exception("down")),
+        set=AsyncMock(side_effect=Exception("down")),
+    )
+    cache = ModerationCache(logger=logger, redis=redis)
+
+    await cache.set("key", RESULTS)
+    assert await cache.get("key") == RESULTS
+    assert await cache.get("other") is None
+    assert logger.warning.call_count == 2
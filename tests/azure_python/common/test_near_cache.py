@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+
+from azure_python.common.near_cache import NearCache
+
+
+class Remote:
+    def __init__(self) -> None:
+        self.values: dict[str, str] = {}
+        self.loads = 0
+
+    def loader(self, key: str):
+        async def load() -> str | None:
+            self.loads += 1
+            await asyncio.sleep(0)
+            return self.values.get(key)
+
+        return load
+
+
+@pytest.mark.asyncio
+async def test_hits_and_invalidation():
+    remote = Remote()
+    remote.values["a"] = "1"
+    cache: NearCache[str] = NearCache(max_entries=10, ttl=None)
+    cache.active = True
+
+    assert await cache.get("a", remote.loader("a")) == "1"
+    assert await cache.get("a", remote.loader("a")) == "1"
+    assert remote.loads == 1
+
+    remote.values["a"] = "2"
+    cache.invalidate(["a", "b"])
+    assert await cache.get("a", remote.loader("a")) == "2"
+    assert remote.loads == 2
+
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 2
+    assert stats["invalidations"] == 1
+    assert stats["entries"] == 1
+
+
+@pytest.mark.asyncio
+async def test_missing_values_are_not_cached():
+    remote = Remote()
+    cache: NearCache[str] = NearCache(max_entries=10, ttl=None)
+    cache.active = True
+
+    assert await cache.get("a", remote.loader("a")) is None
+    assert await cache.get("a", remote.loader("a")) is None
+    assert remote.loads == 2
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_are_coalesced():
+    remote = Remote()
+    remote.values["a"] = "1"
+    cache: NearCache[str] = NearCache(max_entries=10, ttl=None)
+    cache.active = True
+
+    results = await asyncio.gather(
+        *(cache.get("a", remote.loader("a")) for _ in range(10))
+    )
+    assert results == ["1"] * 10
+    assert remote.loads == 1
+    assert cache.stats()["coalesced"] == 9
+
+
+@pytest.mark.asyncio
+async def test_invalidated_load_is_not_cached():
+    remote = Remote()
+    remote.values["a"] = "old"
+    cache: NearCache[str] = NearCache(max_entries=10, ttl=None)
+    cache.active = True
+    read = asyncio.Event()
+    release = asyncio.Event()
+
+    async def slow_load() -> str | None:
+        value = remote.values.get("a")
+        read.set()
+        await release.wait()
+        return value
+
+    pending = asyncio.create_task(cache.get("a", slow_load))
+    await read.wait()
+    # written after the load read the value, before it returned
+    remote.values["a"] = "new"
+    cache.invalidate(["a"])
+    release.set()
+    assert await pending == "old"
+
+    assert await cache.get("a", remote.loader("a")) == "new"
+
+
+@pytest.mark.asyncio
+async def test_inactive_cache_is_bypassed():
+    remote = Remote()
+    remote.values["a"] = "1"
+    cache: NearCache[str] = NearCache(max_entries=10, ttl=None)
+
+    assert await cache.get("a", remote.loader("a")) == "1"
+    assert await cache.get("a", remote.loader("a")) == "1"
+    assert remote.loads == 2
+
+    cache.active = True
+    await cache.get("a", remote.loader("a"))
+    cache.deactivate()
+    assert cache.stats()["entries"] == 0
+    assert cache.active is False
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from azure_python.common.quantization import (
+    QuantizedVectors,
+    ScalarQuantizer,
+    binarize,
+    hamming_scores,
+)
+from azure_python.common.vectors import l2_normalize
+
+
+@pytest.fixture
+def vectors() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return l2_normalize(rng.normal(size=(500, 64)).astype(np.float32))
+
+
+def test_scalar_quantizer(vectors: np.ndarray):
+    quantizer = ScalarQuantizer.fit(vectors)
+    codes = quantizer.encode(vectors)
+    assert codes.dtype == np.int8
+
+    decoded = quantizer.decode(codes)
+    assert np.abs(decoded - vectors).max() <= quantizer.scale.max() / 2 + 1e-6
+
+    queries = vectors[:3]
+    np.testing.assert_allclose(
+        quantizer.scores(codes, queries), queries @ decoded.T, rtol=1e-4, atol=1e-4
+    )
+
+    constant = ScalarQuantizer.fit(np.ones((2, 2)))
+    np.testing.assert_array_equal(constant.decode(constant.encode(np.ones((2, 2)))), 1)
+
+
+def test_binary():
+    bits = binarize(np.array([[1.0, -1.0, 2.0] + [0.0] * 62]))
+    assert bits.shape == (1, 2)
+    assert bits.dtype == np.uint64
+    assert int(np.bitwise_count(bits).sum()) == 2
+
+    queries = binarize(np.array([[1.0, -1.0, 2.0] + [0.0] * 62, [-1.0] * 65]))
+    np.testing.assert_array_equal(hamming_scores(bits, queries), [[0], [-2]])
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_search(vectors: np.ndarray, mode):
+    quantized = QuantizedVectors(vectors, mode=mode)
+    queries = vectors[:20] + 0.01
+    _, exact = QuantizedVectors(vectors).search(queries, k=1, rerank=vectors)
+
+    scores, rows = quantized.search(queries, k=5, oversample=8)
+    assert rows.shape == (20, 5)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+    assert np.mean(rows[:, 0] == exact[:, 0]) >= 0.9
+
+    scores, rows = quantized.search(queries[0], k=3, rerank=vectors)
+    np.testing.assert_allclose(scores[0], vectors[rows[0]] @ queries[0], rtol=1e-5)
+
+    assert quantized.search(queries, k=0)[1].shape == (20, 0)
+
+
+def test_footprint(vectors: np.ndarray):
+    assert QuantizedVectors(vectors).nbytes == vectors.nbytes // 4
+
+    binary = QuantizedVectors(vectors, mode="binary")
+    assert binary.nbytes == vectors.nbytes // 32
+    _, rows = binary.search(vectors[:1], k=1)
+    assert rows[0, 0] == 0
+    with pytest.raises(ValueError):
+        binary.dequantize(np.array([0]))
+
+    binary_int8 = QuantizedVectors(vectors, mode="binary", keep_int8=True)
+    assert binary_int8.nbytes == vectors.nbytes // 32 + vectors.nbytes // 4
+
+    with pytest.raises(ValueError):
+        QuantizedVectors(vectors, mode="pq")  # type: ignore
@@ -0,0 +1,85 @@
+import pytest
+
+from azure_python.common.rate_limiter import (
+    TokenBucketRateLimiter,
+    backoff_delay,
+    retry_after_seconds,
+)
+from tests.azure_python.common.conftest import FakeClock
+
+
+@pytest.mark.asyncio
+async def test_unlimited(clock: FakeClock):
+    limiter = TokenBucketRateLimiter(clock=clock, sleep=clock.sleep)
+
+    for _ in range(100):
+        await limiter.acquire(10_000)
+    assert clock.sleeps == []
+
+
+@pytest.mark.asyncio
+async def test_requests_per_minute(clock: FakeClock):
+    limiter = TokenBucketRateLimiter(
+        requests_per_minute=2, clock=clock, sleep=clock.sleep
+    )
+
+    await limiter.acquire()
+    await limiter.acquire()
+    assert clock.sleeps == []
+
+    await limiter.acquire()
+    assert clock.now == pytest.approx(30.0)
+
+
+@pytest.mark.asyncio
+async def test_tokens_per_minute_and_reconcile(clock: FakeClock):
+    limiter = TokenBucketRateLimiter(
+        tokens_per_minute=600, clock=clock, sleep=clock.sleep
+    )
+
+    await limiter.acquire(500)
+    # the request used fewer tokens than estimated, give them back
+    limiter.reconcile(500, 100)
+    await limiter.acquire(500)
+    assert clock.sleeps == []
+
+    # the request used more tokens than estimated, the bucket goes into debt
+    limiter.reconcile(500, 700)
+    await limiter.acquire(100)
+    assert clock.now == pytest.approx(30.0)
+
+
+@pytest.mark.asyncio
+async def test_oversized_request_does_not_block_forever(clock: FakeClock):
+    limiter = TokenBucketRateLimiter(
+        tokens_per_minute=100, clock=clock, sleep=clock.sleep
+    )
+
+    await limiter.acquire(1_000)
+    await limiter.acquire(1_000)
+    assert clock.now == pytest.approx(60.0)
+
+
+@pytest.mark.asyncio
+async def test_pause(clock: FakeClock):
+    limiter = TokenBucketRateLimiter(clock=clock, sleep=clock.sleep)
+
+    limiter.pause(5)
+    limiter.pause(1)
+    await limiter.acquire()
+    assert clock.now == pytest.approx(5.0)
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(None) is None
+    assert retry_after_seconds({}) is None
+    assert retry_after_seconds({"retry-after": "3"}) == 3.0
+    assert retry_after_seconds({"retry-after-ms": "1500", "retry-after": "3"}) == 1.5
+    assert retry_after_seconds({"retry-after-ms": "abc", "retry-after": "2"}) == 2.0
+    assert retry_after_seconds({"retry-after": "Wed, 21 Oct 2015 07:28:00"}) is None
+
+
+def test_backoff_delay():
+    assert 4.0 <= backoff_delay(0, retry_after=4.0) <= 4.4
+    for attempt in range(10):
+        assert 0 <= backoff_delay(attempt, base=0.5, cap=8.0) <= 8.0
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+from azure_python.common.redis_codecs import (
+    COMPRESSED,
+    RAW,
+    compress,
+    decompress,
+    get_codec,
+)
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("str", "héllo"),
+        ("json", {"a": [1, 2.5, None], "b": "x"}),
+        ("msgpack", {"a": [1, 2.5, None], "b": b"\x00\xff"}),
+        ("bytes", b"\x00\x01\x02"),
+    ],
+)
+def test_round_trip(name: str, value) -> None:
+    codec = get_codec(name)
+    assert codec.decode(codec.encode(value)) == value
+
+
+def test_str_codec_non_str() -> None:
+    codec = get_codec("str")
+    assert codec.encode(1.5) == b"1.5"
+
+
+def test_numpy_codec() -> None:
+    codec = get_codec("numpy")
+    array = np.arange(12, dtype=np.float32).reshape(3, 4)
+    decoded = codec.decode(codec.encode(array))
+    assert decoded.dtype == np.float32
+    np.testing.assert_array_equal(decoded, array)
+
+
+def test_unknown_codec() -> None:
+    with pytest.raises(ValueError, match="unknown codec"):
+        get_codec("pickle")
+
+
+def test_compress() -> None:
+    data = b"a" * 1000
+    compressed = compress(data, threshold=100)
+    assert compressed.startswith(COMPRESSED)
+    assert len(compressed) < len(data)
+    assert decompress(compressed) == data
+
+    # below the threshold or not smaller
+    assert compress(data, threshold=2000) == RAW + data
+    random = np.random.default_rng(0).bytes(200)
+    assert compress(random, threshold=1) == RAW + random
+    assert decompress(RAW + random) == random
+
+
+def test_compress_disabled() -> None:
+    # values are stored as encoded, without a flag
+    assert compress(b"a" * 1000, threshold=None) == b"a" * 1000
+    data = COMPRESSED + b"not zlib"
+    assert decompress(compress(data, threshold=None), flagged=False) == data
+
+
+def test_decompress_unflagged_values() -> None:
+    # raw values that look like compressed ones are returned as they were
+    data = COMPRESSED + b"not zlib"
+    assert decompress(compress(data, threshold=100)) == data
+    assert decompress(compress(b"", threshold=100)) == b""
+    # values written without a flag are returned as is
+    assert decompress(b"plain text") == b"plain text"
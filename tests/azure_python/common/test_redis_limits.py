@@ -0,0 +1,196 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from azure_python.common.redis_limits import (
+    LEAVE,
+    SEMAPHORE_ACQUIRE,
+    SEMAPHORE_EXTEND,
+    SLIDING_WINDOW_ACQUIRE,
+    SLIDING_WINDOW_ADJUST,
+    RedisQuotaLimiter,
+    RedisRateLimiter,
+    RedisSemaphore,
+)
+
+
+class FakeRedis:
+    """Registers an AsyncMock per script, with the results given by source."""
+
+    def __init__(self, results: dict[str, list] | None = None) -> None:
+        self.scripts: dict[str, AsyncMock] = {}
+        self.results = results or {}
+
+    def register_script(self, script: str) -> AsyncMock:
+        if script not in self.scripts:
+            results = self.results.get(script)
+            self.scripts[script] = AsyncMock(
+                side_effect=results, return_value=None if results else 1
+            )
+        return self.scripts[script]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_for_its_turn():
+    redis = FakeRedis(
+        {SLIDING_WINDOW_ACQUIRE: [[0, b"-1"], [0, b"0.5"], [0, b"30"], [1, b"3"]]}
+    )
+    sleep = AsyncMock()
+    limiter = RedisRateLimiter(
+        redis,  # type: ignore
+        "quota",
+        limit=10,
+        window=60,
+        sleep=sleep,
+    )
+
+    await limiter.acquire(4)
+    script = redis.scripts[SLIDING_WINDOW_ACQUIRE]
+    assert script.call_count == 4
+    keys = script.call_args.kwargs["keys"]
+    assert keys == [
+        "limits:v1:{quota}:window",
+        "limits:v1:{quota}:queue",
+        "limits:v1:{quota}:seen",
+        "limits:v1:{quota}:ticket",
+    ]
+    args = script.call_args.kwargs["args"]
+    assert args[3:] == [10, 60, 4]
+    # the same waiter id on every attempt
+    assert len({call.kwargs["args"][0] for call in script.call_args_list}) == 1
+
+    delays = [call.args[0] for call in sleep.call_args_list]
+    assert 0.04 <= delays[0] <= 0.05  # not its turn, poll
+    assert 0.4 <= delays[1] <= 0.5  # wait given by the script
+    assert 0.8 <= delays[2] <= 1.0  # capped to max_poll_interval
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_cancelled_waiter_leaves_queue():
+    redis = FakeRedis({SLIDING_WINDOW_ACQUIRE: [[0, b"-1"]] * 100})
+    limiter = RedisRateLimiter(redis, "quota", limit=10)  # type: ignore
+
+    task = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0.01)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    leave = redis.scripts[LEAVE]
+    leave.assert_called_once()
+    assert leave.call_args.kwargs["keys"] == [
+        "limits:v1:{quota}:queue",
+        "limits:v1:{quota}:seen",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_adjust():
+    redis = FakeRedis()
+    limiter = RedisRateLimiter(redis, "quota", limit=10, window=60)  # type: ignore
+
+    await limiter.adjust(0)
+    await limiter.adjust(-3)
+    redis.scripts[SLIDING_WINDOW_ADJUST].assert_called_once_with(
+        keys=["limits:v1:{quota}:window"], args=[60, -3]
+    )
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        RedisRateLimiter(FakeRedis(), "quota", limit=0)  # type: ignore
+    with pytest.raises(ValueError):
+        RedisSemaphore(
+            FakeRedis(),  # type: ignore
+            "slots",
+            limit=1,
+            max_poll_interval=5,
+            waiter_timeout=5,
+        )
+
+
+@pytest.mark.asyncio
+async def test_semaphore_hold():
+    redis = FakeRedis({SEMAPHORE_ACQUIRE: [0, 0, 1], SEMAPHORE_EXTEND: [1, 0]})
+    semaphore = RedisSemaphore(
+        redis,  # type: ignore
+        "slots",
+        limit=2,
+        lease=30,
+        sleep=AsyncMock(),
+    )
+
+    async with semaphore.hold() as id:
+        assert redis.scripts[SEMAPHORE_ACQUIRE].call_count == 3
+        args = redis.scripts[SEMAPHORE_ACQUIRE].call_args.kwargs["args"]
+        assert args[0] == id
+        assert args[3:] == [2, 30]
+        assert await semaphore.extend(id) is True
+        assert await semaphore.extend(id) is False
+
+    redis.scripts[LEAVE].assert_called_once_with(
+        keys=["limits:v1:{slots}:holders"], args=[id]
+    )
+
+
+@pytest.mark.asyncio
+async def test_quota_limiter():
+    redis = FakeRedis({SLIDING_WINDOW_ACQUIRE: [[1, b"0"]] * 10})
+    quota = RedisQuotaLimiter(
+        redis,  # type: ignore
+        "openai",
+        requests_per_minute=60,
+        tokens_per_minute=1000,
+    )
+
+    await quota.acquire(5000)
+    amounts = [
+        call.kwargs["args"][-1]
+        for call in redis.scripts[SLIDING_WINDOW_ACQUIRE].call_args_list
+    ]
+    assert amounts == [1, 1000]  # a request, then the tokens clipped to the limit
+
+    await quota.reconcile(estimated=5000, actual=400)
+    redis.scripts[SLIDING_WINDOW_ADJUST].assert_called_once_with(
+        keys=["limits:v1:{openai:tokens}:window"], args=[60.0, -600]
+    )
+
+
+@pytest.mark.asyncio
+async def test_command_timeout():
+    async def hang(**kwargs):
+        await asyncio.sleep(10)
+
+    redis = FakeRedis()
+    limiter = RedisRateLimiter(
+        redis,  # type: ignore
+        "quota",
+        limit=10,
+        command_timeout=0.01,
+    )
+    redis.scripts[SLIDING_WINDOW_ACQUIRE].side_effect = hang
+    redis.scripts[SLIDING_WINDOW_ADJUST].side_effect = hang
+
+    with pytest.raises(TimeoutError):
+        await limiter.acquire()
+    # the waiter still leaves the queue
+    redis.scripts[LEAVE].assert_called_once()
+    with pytest.raises(TimeoutError):
+        await limiter.adjust(-1)
+
+
+@pytest.mark.asyncio
+async def test_quota_limiter_disabled_windows():
+    redis = FakeRedis()
+    quota = RedisQuotaLimiter(redis, "openai")  # type: ignore
+    await quota.acquire(100)
+    await quota.reconcile(100, 50)
+    assert quota.requests is None and quota.tokens is None
+
+
+def test_scripts_are_registered_once_per_limiter():
+    redis = MagicMock()
+    RedisRateLimiter(redis, "quota", limit=1)
+    scripts = {call.args[0] for call in redis.register_script.call_args_list}
+    assert scripts == {LEAVE, SLIDING_WINDOW_ACQUIRE, SLIDING_WINDOW_ADJUST}
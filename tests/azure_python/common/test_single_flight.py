@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from azure_python.common.single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_coalesces_concurrent_calls():
+    flights: SingleFlight[str, int] = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def load() -> int:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return 42
+
+    tasks = [asyncio.create_task(flights.do("a", load)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert "a" in flights
+    release.set()
+
+    assert await asyncio.gather(*tasks) == [42] * 5
+    assert calls == 1
+    assert flights.coalesced == 4
+    assert "a" not in flights
+
+    # a later call starts a new flight
+    assert await flights.do("a", load) == 42
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_exception_is_shared():
+    flights: SingleFlight[str, int] = SingleFlight()
+
+    async def fail() -> int:
+        await asyncio.sleep(0)
+        raise ValueError("boom")
+
+    results = await asyncio.gather(
+        flights.do("a", fail), flights.do("a", fail), return_exceptions=True
+    )
+    assert all(isinstance(r, ValueError) for r in results)
+    assert "a" not in flights
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller_does_not_cancel_others():
+    flights: SingleFlight[str, int] = SingleFlight()
+    release = asyncio.Event()
+
+    async def load() -> int:
+        await release.wait()
+        return 1
+
+    first = asyncio.create_task(flights.do("a", load))
+    second = asyncio.create_task(flights.do("a", load))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    assert await second == 1
+    with pytest.raises(asyncio.CancelledError):
+        await first
@@ -0,0 +1,65 @@
+import pytest
+
+from azure_python.common.text_segmenter import segment_text, sentence_boundaries
+
+
+def test_sentence_boundaries():
+    text = 'One. "Two?" Three!\n\nFour'
+    assert sentence_boundaries(text) == [0, 5, 12, 20, 24]
+    assert sentence_boundaries("") == [0]
+
+
+def test_segment_text_short():
+    assert segment_text("Short text.", 100) == [(0, 11)]
+    assert segment_text("", 100) == [(0, 0)]
+
+
+def test_segment_text_sentences():
+    text = "Aaaa aaaa. Bbbb bbbb. Cccc cccc. Dddd dddd."
+    segments = segment_text(text, 22)
+
+    assert [text[s:e] for s, e in segments] == [
+        "Aaaa aaaa. Bbbb bbbb. ",
+        "Cccc cccc. Dddd dddd.",
+    ]
+    assert all(e - s <= 22 for s, e in segments)
+
+
+def test_segment_text_overlap():
+    text = "Aaaa aaaa. Bbbb bbbb. Cccc cccc. Dddd dddd."
+    segments = segment_text(text, 22, overlap=11)
+
+    assert [text[s:e] for s, e in segments] == [
+        "Aaaa aaaa. Bbbb bbbb. ",
+        "Bbbb bbbb. Cccc cccc. ",
+        "Cccc cccc. Dddd dddd.",
+    ]
+
+
+def test_segment_text_overlap_words():
+    text = "Aaaa aaaa bbbb bbbb cccc cccc dddd."
+    segments = segment_text(text, 15, overlap=7)
+
+    # cut within the sentence, the words before each cut are repeated
+    assert [text[s:e] for s, e in segments] == [
+        "Aaaa aaaa bbbb ",
+        "bbbb bbbb cccc ",
+        "cccc cccc dddd.",
+    ]
+
+
+def test_segment_text_without_sentences():
+    text = "word " * 10
+    segments = segment_text(text, 12)
+    assert [text[s:e] for s, e in segments] == ["word word ", "word word "] * 2 + [
+        "word word "
+    ]
+
+    assert segment_text("x" * 25, 10) == [(0, 10), (10, 20), (20, 25)]
+
+
+def test_segment_text_invalid():
+    with pytest.raises(ValueError):
+        segment_text("text", 0)
+    with pytest.raises(ValueError):
+        segment_text("text", 10, overlap=6)
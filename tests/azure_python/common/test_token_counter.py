@@ -0,0 +1,203 @@
+import asyncio
+import time
+from typing import Iterator
+from unittest.mock import MagicMock
+
+import pytest
+from pytest_mock import MockerFixture
+
+from azure_python.common.token_counter import (
+    PromptTooLongError,
+    TokenCounter,
+    clear_caches,
+    counts,
+    encoding_failures,
+    encoding_name_for_model,
+    encodings,
+    get_encoding,
+)
+
+
+@pytest.fixture
+def word_encoding(mocker: MockerFixture) -> Iterator[MagicMock]:
+    """One token per whitespace separated word."""
+    encoding = MagicMock()
+    encoding.encode.side_effect = lambda text, disallowed_special: text.split()
+    mocker.patch(
+        "azure_python.common.token_counter.tiktoken.get_encoding",
+        return_value=encoding,
+    )
+    clear_caches()
+    yield encoding
+    clear_caches()
+
+
+def test_encoding_name_for_model():
+    assert encoding_name_for_model("gpt-4o") == "o200k_base"
+    assert encoding_name_for_model("gpt-4") == "cl100k_base"
+    assert encoding_name_for_model("my-deployment") == "o200k_base"
+    assert TokenCounter.for_model("gpt-4").encoding_name == "cl100k_base"
+
+
+def test_count_text_memoized(word_encoding: MagicMock):
+    counter = TokenCounter()
+    assert counter.count_text("a b c") == 3
+    assert counter.count_text("a b c") == 3
+    assert word_encoding.encode.call_count == 1
+
+    # long texts are memoized too, by a digest that does not keep them
+    text = "a " * 10_000
+    assert counter.count_text(text) == 10_000
+    assert counter.count_text(text) == 10_000
+    assert word_encoding.encode.call_count == 2
+    assert all(len(key[1]) == 16 for key in counts.entries)
+
+
+@pytest.mark.asyncio
+async def test_load(word_encoding: MagicMock, mocker: MockerFixture):
+    to_thread = mocker.spy(asyncio, "to_thread")
+    await TokenCounter().load()
+    to_thread.assert_called_once_with(get_encoding, "o200k_base")
+    assert "o200k_base" in encodings
+
+    # loaded once, no more thread hops
+    await TokenCounter().load()
+    to_thread.assert_called_once()
+
+
+def test_count_text_without_encoding(mocker: MockerFixture):
+    mocker.patch(
+        "azure_python.common.token_counter.tiktoken.get_encoding",
+        side_effect=ConnectionError("offline"),
+    )
+    clear_caches()
+
+    assert TokenCounter().count_text("x" * 10) == 3
+    assert "o200k_base" in encoding_failures
+    clear_caches()
+
+
+def test_get_encoding_retries(word_encoding: MagicMock, mocker: MockerFixture):
+    load = mocker.patch(
+        "azure_python.common.token_counter.tiktoken.get_encoding",
+        side_effect=[ConnectionError("offline"), ConnectionError("offline"), "enc"],
+    )
+    now = time.monotonic()
+    monotonic = mocker.patch(
+        "azure_python.common.token_counter.time.monotonic", return_value=now
+    )
+
+    assert get_encoding("o200k_base") is None
+    assert encoding_failures["o200k_base"].retry_at == now + 2
+    # backing off, the failure is not retried right away
+    assert get_encoding("o200k_base") is None
+    assert load.call_count == 1
+
+    monotonic.return_value = now + 2
+    assert get_encoding("o200k_base") is None
+    assert encoding_failures["o200k_base"].retry_at == now + 6
+
+    monotonic.return_value = now + 6
+    assert get_encoding("o200k_base") == "enc"
+    assert get_encoding("o200k_base") == "enc"
+    assert load.call_count == 3
+    assert "o200k_base" not in encoding_failures
+
+
+def test_count_messages(word_encoding: MagicMock):
+    counter = TokenCounter()
+
+    # 3 per message + role + content
+    assert counter.count_message({"role": "user", "content": "a b"}) == 6
+    assert (
+        counter.count_message(
+            {"role": "user", "content": "a b", "name": "bob"}  # type: ignore
+        )
+        == 8
+    )
+    assert (
+        counter.count_message(
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "a b"},
+                    {"type": "image_url", "image_url": {"url": "x"}},
+                ],
+            }
+        )
+        == 91
+    )
+    # plus 3 to prime the reply
+    assert (
+        counter.count_messages(
+            [
+                {"role": "system", "content": "a"},
+                {"role": "user", "content": "a b"},
+            ]
+        )
+        == 14
+    )
+
+
+def test_trim_messages(word_encoding: MagicMock):
+    counter = TokenCounter()
+    messages = [
+        {"role": "system", "content": "s"},  # 5
+        {"role": "user", "content": "one two three"},  # 7
+        {"role": "assistant", "content": "four five"},  # 6
+        {"role": "user", "content": "six"},  # 5
+    ]
+
+    assert counter.trim_messages(messages, 26) == (messages, 26)  # type: ignore
+    assert counter.trim_messages(messages, 25) == (  # type: ignore
+        [messages[0], messages[2], messages[3]],
+        19,
+    )
+    assert counter.trim_messages(messages, 13) == (  # type: ignore
+        [messages[0], messages[3]],
+        13,
+    )
+    with pytest.raises(PromptTooLongError):
+        counter.trim_messages(messages, 12)  # type: ignore
+
+
+def test_trim_messages_tool_results(word_encoding: MagicMock):
+    counter = TokenCounter()
+    messages = [
+        {"role": "user", "content": "weather"},
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": "1", "type": "function"}],
+        },
+        {"role": "tool", "content": "sunny", "tool_call_id": "1"},
+        {"role": "assistant", "content": "It is sunny"},
+        {"role": "user", "content": "thanks"},
+    ]
+
+    trimmed, _ = counter.trim_messages(
+        messages,  # type: ignore
+        counter.count_messages(messages) - 10,  # type: ignore
+    )
+    assert [m["role"] for m in trimmed] == ["assistant", "user"]
+
+
+def test_trim_messages_last_tool_result(word_encoding: MagicMock):
+    counter = TokenCounter()
+    messages = [
+        {"role": "user", "content": "what is the weather today"},
+        {
+            "role": "assistant",
+            "content": None,
+            "tool_calls": [{"id": "1", "type": "function"}],
+        },
+        {"role": "tool", "content": "sunny", "tool_call_id": "1"},
+        {"role": "tool", "content": "warm", "tool_call_id": "2"},
+    ]
+
+    trimmed, _ = counter.trim_messages(
+        messages,  # type: ignore
+        counter.count_messages(messages) - 1,  # type: ignore
+    )
+    # the tool results are kept with the call they answer
+    assert [m["role"] for m in trimmed] == ["assistant", "tool", "tool"]
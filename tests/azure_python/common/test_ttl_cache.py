@@ -0,0 +1,53 @@
+import pytest
+
+from azure_python.common.ttl_cache import TTLCache
+from tests.azure_python.common.conftest import FakeClock
+
+
+def test_lru_eviction():
+    cache: TTLCache[str, int] = TTLCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+
+    cache.set("c", 3)  # evicts "b", the least recently used
+    assert "b" not in cache
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert len(cache) == 2
+
+
+def test_expiry(clock: FakeClock):
+    cache: TTLCache[str, int] = TTLCache(max_entries=10, ttl=10, clock=clock)
+    cache.set("a", 1)
+    cache.set("b", 2, ttl=30)
+
+    clock.now = 10
+    assert "a" not in cache
+    assert cache.get("a", -1) == -1
+    assert len(cache) == 1
+    assert cache.get("b") == 2
+
+    clock.now = 30
+    assert cache.get("b") is None
+
+
+def test_delete_clear_and_hit_rate():
+    cache: TTLCache[str, int] = TTLCache(max_entries=10)
+    assert cache.hit_rate == 0.0
+
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.hit_rate == 0.5
+
+    assert cache.delete("a") is True
+    assert cache.delete("a") is False
+    cache.set("b", 2)
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_invalid_max_entries():
+    with pytest.raises(ValueError):
+        TTLCache(max_entries=0)
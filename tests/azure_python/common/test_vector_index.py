@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+from azure_python.common.vector_index import VectorIndex, kmeans, nearest_centroids
+
+
+@pytest.fixture
+def index() -> VectorIndex:
+    index = VectorIndex(dim=3)
+    index.add(
+        ["x", "y", "z", "xy"],
+        np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1], [1, 1, 0]]),
+        [{"axis": "x"}, {"axis": "y"}, {"axis": "z"}, {"axis": "xy"}],
+    )
+    return index
+
+
+def test_search(index: VectorIndex):
+    hits = index.search(np.array([2.0, 0.1, 0.0]), k=2)
+    assert [h.id for h in hits] == ["x", "xy"]
+    assert hits[0].score == pytest.approx(0.99875, abs=1e-4)
+    assert hits[0].metadata == {"axis": "x"}
+
+    results = index.search_many(np.array([[0, 1, 0], [0, 0, 1]]), k=1)
+    assert [[h.id for h in hits] for hits in results] == [["y"], ["z"]]
+
+    assert len(index.search(np.array([1, 0, 0]), k=10)) == 4
+    assert index.search(np.array([1, 0, 0]), k=0) == []
+    with pytest.raises(ValueError):
+        index.search(np.array([1, 0]))
+
+
+def test_dot_metric():
+    index = VectorIndex(dim=2, metric="dot")
+    index.add(["small", "large"], np.array([[1, 0], [3, 3]]))
+    assert index.search(np.array([1, 0]), k=1)[0].id == "large"
+    assert index.search(np.array([1, 0]), k=1)[0].score == 3.0
+
+    with pytest.raises(ValueError):
+        VectorIndex(dim=2, metric="l2")  # type: ignore
+
+
+def test_filter(index: VectorIndex):
+    hits = index.search(np.array([1, 0, 0]), where={"axis": "y"})
+    assert [h.id for h in hits] == ["y"]
+
+    hits = index.search(np.array([1, 0, 0]), where=lambda m: "x" in m["axis"])
+    assert [h.id for h in hits] == ["x", "xy"]
+
+    assert index.search(np.array([1, 0, 0]), where={"axis": "w"}) == []
+
+
+def test_add_and_remove(index: VectorIndex):
+    assert len(index) == 4
+    assert index.remove(["x", "unknown"]) == 1
+    assert "x" not in index
+    assert [h.id for h in index.search(np.array([1, 0, 0]), k=1)] == ["xy"]
+
+    index.add(["y"], np.array([[1, 0, 0]]), [{"axis": "x"}])
+    assert len(index) == 3
+    hits = index.search(np.array([1, 0, 0]), k=1)
+    assert hits[0].id == "y"
+    assert hits[0].metadata == {"axis": "x"}
+
+    index.compact()
+    assert index.size == 3
+    assert index.search(np.array([0, 0, 1]), k=1)[0].id == "z"
+
+    with pytest.raises(ValueError):
+        index.add(["a", "a"], np.zeros((2, 3)))
+    with pytest.raises(ValueError):
+        index.add(["a"], np.zeros((2, 3)))
+
+
+def test_blocked_search(mocker):
+    mocker.patch("azure_python.common.vector_index.BLOCK_ROWS", 7)
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(100, 8)).astype(np.float32)
+    index = VectorIndex(dim=8, metric="dot")
+    index.add([str(i) for i in range(100)], vectors)
+
+    query = rng.normal(size=8)
+    expected = np.argsort(-(vectors @ query))[:5]
+    assert [h.id for h in index.search(query, k=5)] == [str(i) for i in expected]
+
+
+def test_kmeans():
+    rng = np.random.default_rng(0)
+    centers = np.array([[10, 0], [0, 10], [-10, -10]], dtype=np.float32)
+    vectors = np.concatenate([c + rng.normal(size=(50, 2)) for c in centers])
+
+    centroids = kmeans(vectors.astype(np.float32), 3, 10, 0, spherical=False)
+    assignments = nearest_centroids(vectors, centroids)
+    assert len(set(assignments[:50])) == 1
+    assert len(set(assignments)) == 3
+
+
+def test_ivf_search():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(2000, 16)).astype(np.float32)
+    index = VectorIndex(dim=16)
+    index.add([str(i) for i in range(2000)], vectors)
+
+    with pytest.raises(ValueError):
+        index.train(n_lists=0)
+    index.train(n_lists=20)
+
+    queries = vectors[:50] + 0.05 * rng.normal(size=(50, 16)).astype(np.float32)
+    exact = index.search_many(queries, k=1)
+    approximate = index.search_many(queries, k=1, nprobe=4)
+    recall = np.mean([a[0].id == e[0].id for a, e in zip(approximate, exact)])
+    assert recall >= 0.9
+
+    # probing every list is exact
+    everything = index.search_many(queries, k=1, nprobe=20)
+    assert [h[0].id for h in everything] == [h[0].id for h in exact]
+
+    # vectors added after training are assigned to a list
+    index.add(["new"], np.array([[1.0] * 16]))
+    assert index.search(np.array([1.0] * 16), k=1, nprobe=2)[0].id == "new"
+
+
+def test_save_and_load(index: VectorIndex, tmp_path):
+    index.remove(["z"])
+    index.save(str(tmp_path))
+
+    loaded = VectorIndex.load(str(tmp_path))
+    assert isinstance(loaded.vectors, np.memmap)
+    assert len(loaded) == 3
+    assert loaded.search(np.array([0, 1, 0]), k=1)[0].metadata == {"axis": "y"}
+
+    loaded.add(["z"], np.array([[0, 0, 1]]))
+    assert loaded.search(np.array([0, 0, 1]), k=1)[0].id == "z"
+
+    index.train(n_lists=2)
+    index.save(str(tmp_path))
+    trained = VectorIndex.load(str(tmp_path), mmap=False)
+    assert trained.centroids is not None
+    assert trained.search(np.array([1, 0, 0]), k=1, nprobe=1)[0].id == "x"
@@ -0,0 +1,21 @@
+import numpy as np
+
+from azure_python.common.vectors import allocate_matrix, l2_normalize
+
+
+def test_allocate_matrix(tmp_path):
+    matrix = allocate_matrix((2, 3))
+    assert matrix.shape == (2, 3)
+    assert matrix.dtype == np.float32
+
+    path = str(tmp_path / "vectors.npy")
+    mapped = allocate_matrix((2, 3), path)
+    mapped[:] = 1.0
+    mapped.flush()  # type: ignore
+    assert np.load(path).sum() == 6.0
+
+
+def test_l2_normalize():
+    matrix = np.array([[3.0, 4.0], [0.0, 0.0]], dtype=np.float32)
+    assert l2_normalize(matrix) is matrix
+    np.testing.assert_allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
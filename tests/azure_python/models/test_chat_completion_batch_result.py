@@ -0,0 +1,38 @@
+from azure_python.models.chat_completion_batch_result import (
+    ChatCompletionBatchResult,
+    ChatCompletionItemResult,
+)
+from azure_python.models.llm_response import LLMResponse
+
+
+def responses(n: int) -> list[LLMResponse]:
+    usages = {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 20}
+    return [
+        LLMResponse(content="content", finish_reason="stop", usages=usages)
+        for _ in range(n)
+    ]
+
+
+def test_from_items():
+    result = ChatCompletionBatchResult.from_items(
+        3,
+        [
+            ChatCompletionItemResult(index=2, responses=responses(2)),
+            ChatCompletionItemResult(index=0, error="Exception: API error"),
+            ChatCompletionItemResult(index=1, responses=responses(1)),
+        ],
+    )
+
+    assert result.results[0] is None
+    assert len(result.results[1]) == 1  # type: ignore
+    assert len(result.results[2]) == 2  # type: ignore
+    assert result.errors == {0: "Exception: API error"}
+    assert result.usages == {
+        "prompt_tokens": 20,
+        "completion_tokens": 15,
+        "total_tokens": 40,
+    }
+
+
+def test_aggregate_usages_empty():
+    assert ChatCompletionBatchResult.aggregate_usages([]) == {}
@@ -0,0 +1,42 @@
+from azure_python.models.long_text_analysis import (
+    CategorySeverity,
+    LongTextAnalysis,
+    SegmentOffset,
+)
+
+
+def test_reduce():
+    analysis = LongTextAnalysis.reduce(
+        [(0, 10), (8, 20), (18, 25)],
+        [
+            [
+                {"category": "Hate", "severity": 2},
+                {"category": "Sexual", "severity": 0},
+            ],
+            [
+                {"category": "Hate", "severity": 4},
+                {"category": "Sexual", "severity": 0},
+            ],
+            [
+                {"category": "Hate", "severity": 4},
+                {"category": "Sexual", "severity": 0},
+            ],
+        ],
+    )
+
+    assert analysis.segment_count == 3
+    assert analysis.categories == [
+        CategorySeverity(
+            category="Hate",
+            severity=4,
+            segments=[
+                SegmentOffset(offset=8, length=12),
+                SegmentOffset(offset=18, length=7),
+            ],
+        ),
+        CategorySeverity(category="Sexual", severity=0, segments=[]),
+    ]
+    assert analysis.as_results() == [
+        {"category": "Hate", "severity": 4},
+        {"category": "Sexual", "severity": 0},
+    ]
@@ -0,0 +1,33 @@
+import pytest
+from pydantic import ValidationError
+
+from azure_python.models.openai_deployment import OpenAIDeployment
+
+
+def test_parse_list():
+    deployments = OpenAIDeployment.parse_list(
+        """[
+            {"endpoint": "https://a.openai.azure.com", "deployment": "gpt-4o"},
+            {
+                "endpoint": "https://b.openai.azure.com",
+                "deployment": "gpt-4o",
+                "weight": 2,
+                "api_key": "key",
+                "tokens_per_minute": 100000
+            }
+        ]"""
+    )
+
+    assert len(deployments) == 2
+    assert deployments[0].weight == 1.0
+    assert deployments[0].api_key is None
+    assert deployments[1].weight == 2.0
+    assert deployments[1].tokens_per_minute == 100000
+
+
+def test_parse_list_err():
+    with pytest.raises(ValueError, match="at least one deployment is required"):
+        OpenAIDeployment.parse_list("[]")
+
+    with pytest.raises(ValidationError):
+        OpenAIDeployment.parse_list('[{"endpoint": "https://a", "weight": 0}]')
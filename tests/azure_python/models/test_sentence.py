@@ -1,6 +1,6 @@
 import pytest
 
-from azure_python.models.sentence import Sentence
+from azure_python.models.sentence import Sentence, SentenceIndex
 
 
 def test_init_start_err():
@@ -8,24 +8,23 @@ def test_init_start_err():
         Sentence(content="content", start=-1)
 
 
-def test_includes():
-    assert (
-        Sentence.includes(
-            [Sentence(content="hello ", start=0), Sentence(content="world", start=6)], 0
-        )
-        == "hello "
-    )
+def test_sentence_index():
+    content = "hello.world. again"
+    index = SentenceIndex(content, [(13, 18), (0, 6), (6, 12)])
+    assert len(index) == 3
+    assert index.find(0) == "hello."
+    # the sentence that starts at the offset, not the previous one ending there
+    assert index.find(6) == "world."
+    assert index.find(12) == "world."
+    assert index.find(18) == "again"
+    assert list(index) == [
+        Sentence(content="hello.", start=0),
+        Sentence(content="world.", start=6),
+        Sentence(content="again", start=13),
+    ]
 
-    assert (
-        Sentence.includes(
-            [Sentence(content="hello ", start=0), Sentence(content="world", start=6)],
-            10,
-        )
-        == "world"
-    )
+    with pytest.raises(RuntimeError, match="Sentence not found with start index: 19"):
+        index.find(19)
 
-    with pytest.raises(RuntimeError, match="Sentence not found with start index: 100"):
-        Sentence.includes(
-            [Sentence(content="hello ", start=0), Sentence(content="world", start=6)],
-            100,
-        )
+    with pytest.raises(RuntimeError, match="Sentence not found with start index: 0"):
+        SentenceIndex("  late", [(2, 6)]).find(0)
@@ -1,7 +1,10 @@
+import asyncio
+import json
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from pytest_mock import MockerFixture
+from redis.asyncio import BlockingConnectionPool, SSLConnection
 
 from azure_python.services.azure_managed_redis_service import (
     AzureManagedRedisService,
@@ -18,13 +21,14 @@ def azure_managed_redis_service(mocker: MockerFixture) -> AzureManagedRedisServi
     svc = AzureManagedRedisService(
         env=AzureManagedRedisServiceEnv(
             redis_host="test.redis.cache.windows.net",
+            redis_batch_size=2,
         ),
         logger=MagicMock(),
     )
     svc.client = MagicMock(
         ping=AsyncMock(return_value=True),
         set=AsyncMock(),
-        get=AsyncMock(return_value="test_value"),
+        get=AsyncMock(return_value=b"test_value"),
     )
     return svc
 
@@ -36,13 +40,89 @@ def test_azure_managed_redis_service_get_client(
     mock_fn_auth = mocker.patch(
         "azure_python.services.azure_managed_redis_service.create_from_default_azure_credential"
     )
-    svc = AzureManagedRedisService(env=MagicMock(), logger=MagicMock())
+    svc = AzureManagedRedisService(
+        env=AzureManagedRedisServiceEnv(redis_host="test.redis.cache.windows.net"),
+        logger=MagicMock(),
+    )
 
-    mock_redis.assert_called_once()
+    mock_redis.from_pool.assert_called_once()
     mock_fn_auth.assert_called_once()
     assert svc.client is not None
 
 
+def test_azure_managed_redis_service_connection_pool(mocker: MockerFixture) -> None:
+    mock_auth = mocker.patch(
+        "azure_python.services.azure_managed_redis_service.create_from_default_azure_credential"
+    )
+    svc = AzureManagedRedisService(
+        env=AzureManagedRedisServiceEnv(
+            redis_host="test.redis.cache.windows.net",
+            redis_max_connections=8,
+            redis_pool_timeout_seconds=2,
+            redis_health_check_interval=15,
+            redis_retries=5,
+        ),
+        logger=MagicMock(),
+    )
+
+    pool = svc.client.connection_pool
+    assert isinstance(pool, BlockingConnectionPool)
+    assert pool.max_connections == 8
+    assert pool.timeout == 2
+    assert pool.connection_class is SSLConnection
+    assert pool.connection_kwargs["health_check_interval"] == 15
+    assert pool.connection_kwargs["socket_keepalive"] is True
+    assert pool.connection_kwargs["retry"].get_retries() == 5
+    config = mock_auth.call_args.kwargs["token_manager_config"]
+    assert config.get_token_request_execution_timeout_in_ms() == 5000
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_cluster(mocker: MockerFixture) -> None:
+    mocker.patch(
+        "azure_python.services.azure_managed_redis_service.create_from_default_azure_credential"
+    )
+    mock_cluster = mocker.patch(
+        "azure_python.services.azure_managed_redis_service.RedisCluster"
+    )
+    svc = AzureManagedRedisService(
+        env=AzureManagedRedisServiceEnv(
+            redis_host="test.redis.cache.windows.net", redis_cluster=True
+        ),
+        logger=MagicMock(),
+    )
+    mock_cluster.assert_called_once()
+    assert mock_cluster.call_args.kwargs["max_connections"] == 50
+
+    svc.client.mget_nonatomic = AsyncMock(return_value=[b"1", None])  # type: ignore
+    assert await svc.mget(["a", "b"]) == ["1", None]
+
+    with pytest.raises(ValueError, match="near cache"):
+        AzureManagedRedisService(
+            env=AzureManagedRedisServiceEnv(
+                redis_host="test.redis.cache.windows.net",
+                redis_cluster=True,
+                redis_near_cache_max_entries=10,
+            ),
+            logger=MagicMock(),
+        )
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_latency_stats(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+
+    await svc.set("a", "1")
+    await svc.get("a")
+    await svc.get("a")
+    stats = svc.latency_stats()
+    assert list(stats) == ["GET", "SET"]
+    assert stats["GET"]["count"] == 2
+    assert stats["SET"]["p99"] >= 0
+
+
 @pytest.mark.asyncio
 async def test_azure_managed_redis_service_set(
     azure_managed_redis_service: AzureManagedRedisService,
@@ -50,7 +130,12 @@ async def test_azure_managed_redis_service_set(
     svc = azure_managed_redis_service
 
     await svc.set("test_key", "test_value")
-    svc.client.set.assert_called_once_with(name="test_key", value="test_value")  # type: ignore
+    svc.client.set.assert_called_once_with(  # type: ignore
+        name="test_key", value=b"test_value", ex=None
+    )
+
+    await svc.set("test_key", "test_value", ttl=60)
+    svc.client.set.assert_called_with(name="test_key", value=b"test_value", ex=60)  # type: ignore
 
 
 @pytest.mark.asyncio
@@ -64,6 +149,51 @@ async def test_azure_managed_redis_service_get(
     assert value == "test_value"
 
 
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_codecs(mocker: MockerFixture) -> None:
+    mocker.patch("azure_python.services.azure_managed_redis_service.Redis")
+    mocker.patch(
+        "azure_python.services.azure_managed_redis_service.create_from_default_azure_credential"
+    )
+    svc = AzureManagedRedisService(
+        env=AzureManagedRedisServiceEnv(
+            redis_host="test.redis.cache.windows.net",
+            redis_codec_prefixes='{"doc:": "json", "doc:raw:": "bytes"}',
+            redis_compression_threshold=64,
+        ),
+        logger=MagicMock(),
+    )
+    stored: dict[str, bytes] = {}
+
+    async def set(name: str, value: bytes, ex: int | None) -> None:
+        stored[name] = value
+
+    svc.client = MagicMock(
+        set=AsyncMock(side_effect=set),
+        get=AsyncMock(side_effect=lambda name: stored.get(name)),
+    )
+
+    doc = {"text": "hello " * 100}
+    await svc.set("doc:1", doc)
+    assert len(stored["doc:1"]) < 64  # json, then compressed
+    assert await svc.get("doc:1") == doc
+
+    await svc.set("doc:raw:1", b"\x01\x02")
+    assert stored["doc:raw:1"] == b"\x00\x01\x02"  # flagged as not compressed
+    assert await svc.get("doc:raw:1") == b"\x01\x02"
+
+    # the explicit codec wins over the prefix and the default
+    await svc.set("other", [1, 2], codec="msgpack")
+    assert await svc.get("other", codec="msgpack") == [1, 2]
+    await svc.set("plain", 42)
+    assert await svc.get("plain") == "42"
+    assert await svc.get("missing") is None
+
+    # values without a flag, e.g. written before compression was enabled
+    stored["legacy"] = b"old"
+    assert await svc.get("legacy") == "old"
+
+
 @pytest.mark.asyncio
 async def test_azure_managed_redis_service_ping(
     azure_managed_redis_service: AzureManagedRedisService,
@@ -73,3 +203,314 @@ async def test_azure_managed_redis_service_ping(
     result = await svc.ping()
     svc.client.ping.assert_called_once()  # type: ignore
     assert result is True
+
+
+class FakePipeline:
+    def __init__(self) -> None:
+        self.commands: list[tuple] = []
+        self.executed: list[list[tuple]] = []
+
+    async def __aenter__(self) -> "FakePipeline":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        self.commands = []
+
+    def __len__(self) -> int:
+        return len(self.commands)
+
+    def set(self, **kwargs) -> None:
+        self.commands.append(("set", kwargs))
+
+    def expire(self, name, time) -> None:
+        self.commands.append(("expire", name, time))
+
+    async def execute(self) -> list:
+        self.executed.append(self.commands)
+        self.commands = []
+        return [True] * len(self.executed[-1])
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_mget(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    svc.client.mget = AsyncMock(  # type: ignore
+        side_effect=lambda keys: [
+            None if k == "b" else k.upper().encode() for k in keys
+        ]
+    )
+
+    assert await svc.mget(["a", "b", "c"]) == ["A", None, "C"]
+    assert svc.client.mget.call_count == 2  # type: ignore
+    assert await svc.mget([]) == []
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_mset(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    pipe = FakePipeline()
+    svc.client.pipeline = MagicMock(return_value=pipe)  # type: ignore
+
+    await svc.mset({"a": 1, "b": 2, "c": 3}, ttl={"a": 10})
+    assert pipe.executed == [
+        [
+            ("set", {"name": "a", "value": b"1", "ex": 10}),
+            ("set", {"name": "b", "value": b"2", "ex": None}),
+        ],
+        [("set", {"name": "c", "value": b"3", "ex": None})],
+    ]
+    svc.client.pipeline.assert_called_with(transaction=False)  # type: ignore
+
+    pipe.executed = []
+    await svc.mset({"a": 1}, ttl=60)
+    assert pipe.executed == [[("set", {"name": "a", "value": b"1", "ex": 60})]]
+
+    pipe.executed = []
+    await svc.mset({"a": {"x": 1}}, codec="json")
+    assert pipe.executed == [[("set", {"name": "a", "value": b'{"x":1}', "ex": None})]]
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_delete_many(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    svc.client.unlink = AsyncMock(side_effect=lambda *keys: len(keys) - 1)  # type: ignore
+
+    assert await svc.delete_many(["a", "b", "c"]) == 1
+    svc.client.unlink.assert_any_call("a", "b")  # type: ignore
+    svc.client.unlink.assert_any_call("c")  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_expire_many(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    pipe = FakePipeline()
+    pipe.execute = AsyncMock(side_effect=[[1, 0], [1]])  # type: ignore
+    svc.client.pipeline = MagicMock(return_value=pipe)  # type: ignore
+
+    assert await svc.expire_many(["a", "b", "c"], ttl=60) == 2
+    assert pipe.execute.call_count == 2
+    assert svc.latency_stats()["PIPELINE"]["count"] == 2
+
+
+def scan_iter(keys: list[bytes]) -> MagicMock:
+    async def scan(match: str, count: int):
+        for key in keys:
+            yield key
+
+    return MagicMock(side_effect=scan)
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_iter_keys(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    svc.client.scan_iter = scan_iter([b"session:a", b"session:b"])  # type: ignore
+
+    assert [key async for key in svc.iter_keys("session:*")] == [
+        "session:a",
+        "session:b",
+    ]
+    svc.client.scan_iter.assert_called_once_with(  # type: ignore
+        match="session:*", count=1000
+    )
+
+    [key async for key in svc.iter_keys("session:*", count=10)]
+    svc.client.scan_iter.assert_called_with(match="session:*", count=10)  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_delete_matching(
+    azure_managed_redis_service: AzureManagedRedisService, mocker: MockerFixture
+) -> None:
+    svc = azure_managed_redis_service
+    svc.env.redis_scan_pause_seconds = 0.5
+    sleep = mocker.patch(
+        "azure_python.services.azure_managed_redis_service.asyncio.sleep"
+    )
+    svc.client.scan_iter = scan_iter([b"a", b"b", b"c", b"d", b"e"])  # type: ignore
+    svc.client.unlink = AsyncMock(side_effect=lambda *keys: len(keys))  # type: ignore
+
+    assert await svc.delete_matching("*") == 5
+    assert [c.args for c in svc.client.unlink.call_args_list] == [  # type: ignore
+        ("a", "b"),
+        ("c", "d"),
+        ("e",),
+    ]
+    assert sleep.call_count == 2
+    sleep.assert_called_with(0.5)
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_expire_matching(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    svc.client.scan_iter = scan_iter([b"a", b"b", b"c"])  # type: ignore
+    pipe = FakePipeline()
+    svc.client.pipeline = MagicMock(return_value=pipe)  # type: ignore
+
+    assert await svc.expire_matching("*", ttl=5) == 3
+    assert pipe.executed == [
+        [("expire", "a", 5), ("expire", "b", 5)],
+        [("expire", "c", 5)],
+    ]
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_pipeline(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    pipe = FakePipeline()
+    svc.client.pipeline = MagicMock(return_value=pipe)  # type: ignore
+
+    async with svc.pipeline(transaction=True) as p:
+        p.set(name="a", value=1)
+    svc.client.pipeline.assert_called_once_with(transaction=True)  # type: ignore
+    assert len(pipe.executed) == 1
+
+    # results read in the block, nothing left to execute on exit
+    async with svc.pipeline() as p:
+        p.set(name="a", value=1)
+        assert await p.execute() == [True]
+    assert len(pipe.executed) == 2
+
+
+class FakePubSub:
+    def __init__(self) -> None:
+        self.messages: asyncio.Queue = asyncio.Queue()
+        self.channels: list[str] = []
+
+    async def __aenter__(self) -> "FakePubSub":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        pass
+
+    async def subscribe(self, channel: str) -> None:
+        self.channels.append(channel)
+
+    async def listen(self):
+        while True:
+            yield await self.messages.get()
+
+
+@pytest.fixture
+def near_cached_redis_service(mocker: MockerFixture) -> AzureManagedRedisService:
+    mocker.patch("azure_python.services.azure_managed_redis_service.Redis")
+    mocker.patch(
+        "azure_python.services.azure_managed_redis_service.create_from_default_azure_credential"
+    )
+    svc = AzureManagedRedisService(
+        env=AzureManagedRedisServiceEnv(
+            redis_host="test.redis.cache.windows.net",
+            redis_near_cache_max_entries=10,
+        ),
+        logger=MagicMock(),
+    )
+    pubsub = FakePubSub()
+    svc.client = MagicMock(
+        get=AsyncMock(return_value=b"v1"),
+        set=AsyncMock(),
+        publish=AsyncMock(),
+        pubsub=MagicMock(return_value=pubsub),
+    )
+    return svc
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_near_cache(
+    near_cached_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = near_cached_redis_service
+    pubsub: FakePubSub = svc.client.pubsub.return_value  # type: ignore
+
+    # the first read subscribes to the invalidations
+    assert await svc.get("a") == "v1"
+    assert pubsub.channels == ["near-cache:invalidate"]
+
+    assert await svc.get("a") == "v1"
+    assert await svc.get("a") == "v1"
+    assert svc.client.get.call_count == 1  # type: ignore
+    assert svc.near_cache_stats()["hits"] == 2
+
+    # written by another process
+    svc.client.get.return_value = b"v2"  # type: ignore
+    await pubsub.messages.put({"type": "message", "data": json.dumps(["a"]).encode()})
+    await asyncio.sleep(0)
+    assert await svc.get("a") == "v2"
+    assert svc.near_cache_stats()["invalidations"] == 1
+
+    # written by this process
+    await svc.set("a", "v3")
+    svc.client.publish.assert_called_once_with(  # type: ignore
+        "near-cache:invalidate", json.dumps(["a"])
+    )
+    svc.client.get.return_value = b"v3"  # type: ignore
+    assert await svc.get("a") == "v3"
+
+    svc.listener.cancel()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_near_cache_listener_error(
+    near_cached_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = near_cached_redis_service
+    svc.client.pubsub.side_effect = ConnectionError("connection lost")  # type: ignore
+
+    task = asyncio.create_task(svc.listen_invalidations(retry_delay=0))
+    await asyncio.sleep(0)
+    task.cancel()
+    svc.logger.warning.assert_called()  # type: ignore
+    assert svc.near_cache.active is False  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_near_cache_disabled(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    svc.client.publish = AsyncMock()  # type: ignore
+
+    await svc.set("a", "v")
+    await svc.invalidate(["a"])
+    svc.client.publish.assert_not_called()  # type: ignore
+    assert svc.near_cache_stats() == {}
+    assert svc.listener is None
+
+
+def test_azure_managed_redis_service_register_script(
+    azure_managed_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = azure_managed_redis_service
+    svc.client.register_script = MagicMock(return_value="script")  # type: ignore
+
+    assert svc.register_script("return 1") == "script"
+    svc.client.register_script.assert_called_once_with("return 1")  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_azure_managed_redis_service_near_cache_expire(
+    near_cached_redis_service: AzureManagedRedisService,
+) -> None:
+    svc = near_cached_redis_service
+    svc.client.pipeline = MagicMock(return_value=FakePipeline())  # type: ignore
+
+    # the near cache entries expire before the keys
+    await svc.expire_many(["a"], ttl=3600)
+    svc.client.publish.assert_not_called()  # type: ignore
+
+    await svc.expire_many(["a"], ttl=5)
+    svc.client.publish.assert_called_once_with(  # type: ignore
+        "near-cache:invalidate", json.dumps(["a"])
+    )
@@ -1,10 +1,23 @@
-from typing import Callable
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
 from unittest.mock import AsyncMock, MagicMock
 
+import httpx
 import pytest
+from openai import APIConnectionError, InternalServerError, RateLimitError
 from pytest_mock import MockerFixture
 
+from azure_python.common.token_counter import PromptTooLongError, clear_caches
+from azure_python.models.content_safety_verdict import (
+    ContentFilterHit,
+    ContentSafetyVerdict,
+)
+from azure_python.models.llm_response import LLMResponse
+from azure_python.protocols.i_openai_content_evaluator import ContentSafeException
 from azure_python.services.azure_openai_service import AzureOpenAIService
+from azure_python.services.openai_content_evaluator import OpenAIContentEvaluator
 
 
 @pytest.fixture
@@ -25,11 +38,29 @@ def fn_mock_service(mocker: MockerFixture) -> Callable[[bool], AzureOpenAIServic
             return_value=mock_cred,
         )
 
-        env = MagicMock()
+        env = MagicMock(
+            azure_openai_endpoint="https://example.openai.azure.com",
+            azure_openai_api_key="test-key",
+            azure_openai_deployed_model_name="test-model",
+            azure_openai_requests_per_minute=None,
+            azure_openai_tokens_per_minute=None,
+            azure_openai_max_retries=2,
+            azure_openai_deployments=None,
+            azure_openai_routing_strategy="least_outstanding",
+            azure_openai_breaker_failures=5,
+            azure_openai_breaker_reset_seconds=30.0,
+            azure_openai_shared_quota_timeout_seconds=0.5,
+            azure_openai_shared_quota_reset_seconds=30.0,
+            azure_openai_batch_deployment_name=None,
+            azure_openai_max_prompt_tokens=None,
+            azure_openai_token_encoding=None,
+        )
         if not with_api_key:
             env.azure_openai_api_key = None
         svc = AzureOpenAIService(
-            env=env, content_safety_eval=MagicMock(), logger=MagicMock()
+            env=env,
+            content_safety_eval=OpenAIContentEvaluator(logger=MagicMock()),
+            logger=MagicMock(),
         )
         patched_azure_openai.assert_called_once()
         return svc
@@ -80,7 +111,47 @@ async def test_chat_completion(
     messages = [{"role": "user", "content": "Test message"}]
     responses = await mock_service.chat_completion(messages)
     assert responses[0].content == "Test response"
-    mock_service.content_safety_eval.content_safety_check.assert_called_once()
+
+
+def flagged_choice(content: str, severity: str) -> MagicMock:
+    return MagicMock(
+        message=MagicMock(content=content),
+        finish_reason="stop",
+        model_extra={
+            "content_filter_results": {
+                "hate": {"filtered": False, "severity": severity}
+            }
+        },
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_drops_flagged_choices(
+    fn_mock_service: Callable[[bool], AzureOpenAIService],
+):
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=MagicMock(
+            choices=[flagged_choice("unsafe", "high"), flagged_choice("ok", "safe")],
+            usage=None,
+            prompt_filter_results=[],
+        )
+    )
+    messages = [{"role": "user", "content": "Test message"}]
+    responses = await mock_service.chat_completion(
+        messages,  # type: ignore
+        num_generations=2,
+    )
+    assert [r.content for r in responses] == ["ok"]
+
+    # without a safe choice the response is rejected
+    mock_service.client.chat.completions.create.return_value.choices.pop()
+    with pytest.raises(ContentSafeException, match="Severity: high"):
+        await mock_service.chat_completion(
+            messages,  # type: ignore
+            bypass_cache=True,
+        )
 
 
 @pytest.mark.asyncio
@@ -122,3 +193,742 @@ async def test_chat_completion_with_format_err(
 
     with pytest.raises(Exception):
         await mock_service.chat_completion_with_format(messages, response_format)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("bypass_cache", [True, False])
+async def test_chat_completion_semantic_cache_hit(
+    fn_mock_service: Callable[[bool], AzureOpenAIService], bypass_cache: bool
+):
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=MagicMock(
+            choices=[
+                MagicMock(
+                    message=MagicMock(content="Test response"), finish_reason="stop"
+                )
+            ],
+            usage=None,
+        )
+    )
+    mock_service.semantic_cache = MagicMock(
+        lookup=AsyncMock(
+            return_value=[
+                LLMResponse(content="Cached response", finish_reason="stop", usages={})
+            ]
+        ),
+        store=AsyncMock(),
+    )
+    messages = [{"role": "user", "content": "Test message"}]
+    responses = await mock_service.chat_completion(
+        messages,  # type: ignore
+        bypass_cache=bypass_cache,
+    )
+
+    if bypass_cache:
+        assert responses[0].content == "Test response"
+        mock_service.semantic_cache.lookup.assert_not_called()
+    else:
+        assert responses[0].content == "Cached response"
+        mock_service.client.chat.completions.create.assert_not_called()
+    mock_service.semantic_cache.store.assert_not_called()
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_semantic_cache_miss(
+    fn_mock_service: Callable[[bool], AzureOpenAIService],
+):
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=MagicMock(
+            choices=[
+                MagicMock(
+                    message=MagicMock(content="Test response"), finish_reason="stop"
+                )
+            ],
+            usage=None,
+        )
+    )
+    mock_service.semantic_cache = MagicMock(
+        lookup=AsyncMock(return_value=None), store=AsyncMock()
+    )
+    messages = [{"role": "user", "content": "Test message"}]
+    responses = await mock_service.chat_completion(messages)  # type: ignore
+
+    assert responses[0].content == "Test response"
+    mock_service.semantic_cache.store.assert_called_once()
+    assert mock_service.semantic_cache.store.call_args[0][1] == responses
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failing", ["lookup", "store"])
+async def test_chat_completion_semantic_cache_error(
+    fn_mock_service: Callable[[bool], AzureOpenAIService], failing: str
+):
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=completion("Test response")
+    )
+    mock_service.semantic_cache = MagicMock(
+        lookup=AsyncMock(return_value=None), store=AsyncMock()
+    )
+    getattr(mock_service.semantic_cache, failing).side_effect = RuntimeError(
+        "embedding failed"
+    )
+    messages = [{"role": "user", "content": "Test message"}]
+    responses = await mock_service.chat_completion(messages)  # type: ignore
+
+    # the cache failure does not fail the request
+    assert responses[0].content == "Test response"
+    mock_service.logger.warning.assert_called_once()  # type: ignore
+    # a failed lookup is a miss, without storing the response
+    assert mock_service.semantic_cache.store.call_count == (failing == "store")
+
+
+def rate_limit_error(headers: dict[str, str]) -> RateLimitError:
+    request = httpx.Request("POST", "https://example.com")
+    return RateLimitError(
+        "Too Many Requests",
+        response=httpx.Response(429, headers=headers, request=request),
+        body=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_retry_after(
+    fn_mock_service: Callable[[bool], AzureOpenAIService], mocker: MockerFixture
+):
+    mock_sleep = mocker.patch(
+        "azure_python.services.azure_openai_service.asyncio.sleep", AsyncMock()
+    )
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        side_effect=[
+            rate_limit_error({"retry-after-ms": "2000"}),
+            MagicMock(
+                choices=[
+                    MagicMock(
+                        message=MagicMock(content="Test response"),
+                        finish_reason="stop",
+                    )
+                ],
+                usage=MagicMock(total_tokens=42),
+            ),
+        ]
+    )
+    messages = [{"role": "user", "content": "Test message"}]
+    responses = await mock_service.chat_completion(messages)  # type: ignore
+
+    assert responses[0].content == "Test response"
+    assert mock_service.client.chat.completions.create.call_count == 2
+    delay = mock_sleep.call_args[0][0]
+    assert 2.0 <= delay <= 2.2
+    assert mock_service.router.backends[0].rate_limiter.paused_until > 0
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_retry_exhausted(
+    fn_mock_service: Callable[[bool], AzureOpenAIService], mocker: MockerFixture
+):
+    mocker.patch(
+        "azure_python.services.azure_openai_service.asyncio.sleep", AsyncMock()
+    )
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        side_effect=APIConnectionError(
+            request=httpx.Request("POST", "https://example.com")
+        )
+    )
+    messages = [{"role": "user", "content": "Test message"}]
+
+    with pytest.raises(APIConnectionError):
+        await mock_service.chat_completion(messages)  # type: ignore
+
+    # one attempt plus azure_openai_max_retries retries
+    assert mock_service.client.chat.completions.create.call_count == 3
+
+
+def two_deployments_service(
+    mocker: MockerFixture, clients: list[MagicMock]
+) -> AzureOpenAIService:
+    mocker.patch(
+        "azure_python.services.azure_openai_service.AsyncAzureOpenAI",
+        side_effect=clients,
+    )
+    env = MagicMock(
+        azure_openai_deployments="""[
+            {"endpoint": "https://a.openai.azure.com", "deployment": "a",
+             "api_key": "key"},
+            {"endpoint": "https://b.openai.azure.com", "deployment": "b",
+             "api_key": "key"}
+        ]""",
+        azure_openai_routing_strategy="least_outstanding",
+        azure_openai_breaker_failures=1,
+        azure_openai_breaker_reset_seconds=30.0,
+        azure_openai_max_retries=2,
+        azure_openai_max_prompt_tokens=None,
+        azure_openai_token_encoding=None,
+    )
+    return AzureOpenAIService(
+        env=env,
+        content_safety_eval=OpenAIContentEvaluator(logger=MagicMock()),
+        logger=MagicMock(),
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_failover(mocker: MockerFixture):
+    clients = [MagicMock(), MagicMock()]
+    svc = two_deployments_service(mocker, clients)
+    assert svc.client is clients[0]
+
+    request = httpx.Request("POST", "https://a.openai.azure.com")
+    clients[0].chat.completions.create = AsyncMock(
+        side_effect=InternalServerError(
+            "Service Unavailable",
+            response=httpx.Response(503, request=request),
+            body=None,
+        )
+    )
+    clients[1].chat.completions.create = AsyncMock(
+        return_value=MagicMock(
+            choices=[
+                MagicMock(
+                    message=MagicMock(content="Test response"), finish_reason="stop"
+                )
+            ],
+            usage=None,
+        )
+    )
+
+    messages = [{"role": "user", "content": "Test message"}]
+    responses = await svc.chat_completion(messages)  # type: ignore
+    assert responses[0].content == "Test response"
+    assert clients[1].chat.completions.create.call_args.kwargs["model"] == "b"
+
+    # the first deployment is ejected, requests go straight to the second one
+    assert svc.router.backends[0].breaker.is_open
+    await svc.chat_completion(messages)  # type: ignore
+    assert clients[0].chat.completions.create.call_count == 1
+    assert clients[1].chat.completions.create.call_count == 2
+    assert all(b.outstanding == 0 for b in svc.router.backends)
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_routes_around_throttled(mocker: MockerFixture):
+    clients = [MagicMock(), MagicMock()]
+    svc = two_deployments_service(mocker, clients)
+    for client in clients:
+        client.chat.completions.create = AsyncMock(
+            return_value=completion("Test response")
+        )
+    throttled = svc.router.backends[0]
+    waiting, released = asyncio.Event(), asyncio.Event()
+
+    async def acquire(tokens: int) -> None:
+        waiting.set()
+        await released.wait()
+
+    throttled.rate_limiter.acquire = acquire  # type: ignore
+    messages = [{"role": "user", "content": "Test message"}]
+    first = asyncio.create_task(svc.chat_completion(messages))  # type: ignore
+    await waiting.wait()
+
+    # the request waiting for the rate limit counts, the next one goes to b
+    assert throttled.outstanding == 1
+    await asyncio.wait_for(svc.chat_completion(messages), 1)  # type: ignore
+    assert clients[0].chat.completions.create.call_count == 0
+    assert clients[1].chat.completions.create.call_count == 1
+
+    released.set()
+    await first
+    assert clients[0].chat.completions.create.call_count == 1
+    assert all(b.outstanding == 0 for b in svc.router.backends)
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_cancelled_trial(
+    fn_mock_service: Callable[[bool], AzureOpenAIService],
+):
+    svc = fn_mock_service(with_api_key=True)  # type: ignore
+    breaker = svc.router.backends[0].breaker
+    breaker.opened_at = breaker.clock() - breaker.reset_timeout  # half-open
+
+    started = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        started.set()
+        await asyncio.Event().wait()
+
+    svc.client.chat.completions = MagicMock()
+    svc.client.chat.completions.create = AsyncMock(side_effect=hang)
+    task = asyncio.create_task(
+        svc.chat_completion([{"role": "user", "content": "Test message"}])
+    )
+    await started.wait()
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    # the trial is released, the deployment is tried again
+    assert not breaker.trial_in_flight
+    assert breaker.allow()
+    assert svc.router.backends[0].outstanding == 0
+
+
+def completion(content: str) -> MagicMock:
+    return MagicMock(
+        choices=[MagicMock(message=MagicMock(content=content), finish_reason="stop")],
+        usage=None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_many(
+    fn_mock_service: Callable[[bool], AzureOpenAIService],
+):
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    in_flight = 0
+    max_in_flight = 0
+
+    async def create(**kwargs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        content = kwargs["messages"][0]["content"]
+        # finish out of order
+        await asyncio.sleep(0.001 * (10 - int(content)))
+        in_flight -= 1
+        if content == "3":
+            raise ValueError("bad request")
+        return completion(f"response {content}")
+
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(side_effect=create)
+
+    requests = [[{"role": "user", "content": str(i)}] for i in range(10)]
+    result = await mock_service.chat_completion_many(
+        requests,  # type: ignore
+        concurrency=3,
+    )
+
+    assert max_in_flight == 3
+    assert len(result.results) == 10
+    assert result.errors == {3: "ValueError: bad request"}
+    assert result.results[3] is None
+    for i in [0, 1, 2, 4, 9]:
+        assert result.results[i][0].content == f"response {i}"  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_many_checkpoint(
+    fn_mock_service: Callable[[bool], AzureOpenAIService], tmp_path
+):
+    checkpoint_path = str(tmp_path / "checkpoint.jsonl")
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        side_effect=[
+            completion("a"),
+            Exception("API error"),
+            completion("c"),
+        ]
+    )
+
+    requests = [[{"role": "user", "content": c}] for c in "abc"]
+    result = await mock_service.chat_completion_many(
+        requests,  # type: ignore
+        concurrency=1,
+        checkpoint_path=checkpoint_path,
+    )
+    assert list(result.errors) == [1]
+
+    # a partially written line is ignored on resume
+    with open(checkpoint_path, "a") as f:
+        f.write('{"index": 1, "respon')
+
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=completion("b")
+    )
+    result = await mock_service.chat_completion_many(
+        requests,  # type: ignore
+        concurrency=2,
+        checkpoint_path=checkpoint_path,
+    )
+
+    mock_service.client.chat.completions.create.assert_called_once()
+    assert result.errors == {}
+    assert [r[0].content for r in result.results] == ["a", "b", "c"]  # type: ignore
+
+    # the results of other or fewer requests are not reused
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=completion("x")
+    )
+    result = await mock_service.chat_completion_many(
+        [requests[0], [{"role": "user", "content": "x"}]],  # type: ignore
+        checkpoint_path=checkpoint_path,
+    )
+    assert mock_service.client.chat.completions.create.call_count == 1
+    assert [r[0].content for r in result.results] == ["a", "x"]  # type: ignore
+    mock_service.logger.warning.assert_called()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_as_completed(
+    fn_mock_service: Callable[[bool], AzureOpenAIService],
+):
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=completion("ok")
+    )
+
+    requests = [[{"role": "user", "content": str(i)}] for i in range(100)]
+    seen = []
+    async for item in mock_service.chat_completion_as_completed(
+        requests,  # type: ignore
+        concurrency=4,
+    ):
+        seen.append(item.index)
+        if len(seen) == 5:
+            break
+
+    # backpressure: the workers stop once the consumer stops reading
+    assert mock_service.client.chat.completions.create.call_count < 20
+
+    with pytest.raises(ValueError):
+        async for _ in mock_service.chat_completion_as_completed(
+            requests,  # type: ignore
+            concurrency=0,
+        ):
+            pass
+
+
+class LocalBatchStub:
+    """In-memory stand-in for the files and batches endpoints of the Batch API."""
+
+    def __init__(self) -> None:
+        self.store: dict[str, bytes] = {}
+        self.jobs: dict[str, MagicMock] = {}
+        self.files = MagicMock(create=AsyncMock(side_effect=self.create_file))
+        self.files.with_streaming_response.content = self.stream_content
+        self.batches = MagicMock(
+            create=AsyncMock(side_effect=self.create_batch),
+            retrieve=AsyncMock(side_effect=self.retrieve_batch),
+        )
+
+    async def create_file(self, file, purpose: str) -> MagicMock:
+        file_id = f"file-{len(self.store)}"
+        self.store[file_id] = file[1]
+        return MagicMock(id=file_id)
+
+    def run(self, request: dict) -> dict:
+        content = request["body"]["messages"][-1]["content"]
+        if content == "fail":
+            return {
+                "custom_id": request["custom_id"],
+                "response": {
+                    "status_code": 400,
+                    "body": {"error": {"code": "invalid_request"}},
+                },
+                "error": None,
+            }
+        return {
+            "custom_id": request["custom_id"],
+            "response": {
+                "status_code": 200,
+                "body": {
+                    "id": "chatcmpl",
+                    "object": "chat.completion",
+                    "created": 0,
+                    "model": request["body"]["model"],
+                    "choices": [
+                        {
+                            "index": i,
+                            "message": {"role": "assistant", "content": content},
+                            "finish_reason": "stop",
+                        }
+                        for i in range(request["body"]["n"])
+                    ],
+                    "usage": {
+                        "prompt_tokens": 3,
+                        "completion_tokens": 4,
+                        "total_tokens": 7,
+                    },
+                },
+            },
+            "error": None,
+        }
+
+    async def create_batch(
+        self, input_file_id: str, endpoint: str, completion_window: str
+    ) -> MagicMock:
+        output, errors = [], []
+        for line in self.store[input_file_id].decode().splitlines():
+            result = self.run(json.loads(line))
+            status = result["response"]["status_code"]
+            (output if status == 200 else errors).append(json.dumps(result))
+
+        batch_id = f"batch-{len(self.jobs)}"
+        self.store[f"{batch_id}-output"] = "\n".join(output).encode()
+        self.store[f"{batch_id}-errors"] = "\n".join(errors).encode()
+        self.jobs[batch_id] = MagicMock(
+            id=batch_id,
+            status="validating",
+            output_file_id=f"{batch_id}-output",
+            error_file_id=f"{batch_id}-errors",
+        )
+        return self.jobs[batch_id]
+
+    async def retrieve_batch(self, batch_id: str) -> MagicMock:
+        job = self.jobs[batch_id]
+        result = MagicMock(**{k: getattr(job, k) for k in ["id", "status"]})
+        result.output_file_id = job.output_file_id
+        result.error_file_id = job.error_file_id
+        job.status = "completed"
+        return result
+
+    @asynccontextmanager
+    async def stream_content(self, file_id: str) -> AsyncIterator[MagicMock]:
+        async def iter_lines() -> AsyncIterator[str]:
+            for line in self.store[file_id].decode().splitlines():
+                yield line
+
+        yield MagicMock(iter_lines=iter_lines)
+
+
+@pytest.fixture
+def fn_batch_service(
+    fn_mock_service: Callable[[bool], AzureOpenAIService],
+) -> Callable[[], tuple[AzureOpenAIService, LocalBatchStub]]:
+    def wrapper() -> tuple[AzureOpenAIService, LocalBatchStub]:
+        svc = fn_mock_service(with_api_key=True)  # type: ignore
+        svc.env.azure_openai_batch_deployment_name = "test-batch-model"
+        stub = LocalBatchStub()
+        svc.client.files = stub.files
+        svc.client.batches = stub.batches
+        return svc, stub
+
+    return wrapper
+
+
+def test_build_batch_file(fn_batch_service):
+    svc, _ = fn_batch_service()
+    content = svc.build_batch_file(
+        {"a": [{"role": "user", "content": "hello"}]}, temperature=0.5
+    )
+
+    lines = content.decode().splitlines()
+    assert len(lines) == 1
+    assert json.loads(lines[0]) == {
+        "custom_id": "a",
+        "method": "POST",
+        "url": "/chat/completions",
+        "body": {
+            "model": "test-batch-model",
+            "messages": [{"role": "user", "content": "hello"}],
+            "temperature": 0.5,
+            "n": 1,
+        },
+    }
+
+
+@pytest.mark.asyncio
+async def test_run_batch(fn_batch_service, mocker: MockerFixture):
+    mock_sleep = mocker.patch(
+        "azure_python.services.azure_openai_service.asyncio.sleep", AsyncMock()
+    )
+    svc, stub = fn_batch_service()
+
+    requests = {
+        "a": [{"role": "user", "content": "first"}],
+        "b": [{"role": "user", "content": "fail"}],
+        "c": [{"role": "user", "content": "third"}],
+    }
+    results = {
+        item.custom_id: item
+        async for item in svc.run_batch(requests, num_generations=2, poll_interval=5)
+    }
+
+    mock_sleep.assert_called_once_with(5)
+    assert set(results) == {"a", "b", "c"}
+    assert [r.content for r in results["a"].responses] == ["first", "first"]
+    assert results["a"].responses[0].usages["completion_tokens"] == 2
+    assert results["c"].responses[0].content == "third"
+    assert results["b"].responses is None
+    assert "invalid_request" in results["b"].error
+
+
+@pytest.mark.asyncio
+async def test_run_batch_transient_errors(fn_batch_service, mocker: MockerFixture):
+    mock_sleep = mocker.patch(
+        "azure_python.services.azure_openai_service.asyncio.sleep", AsyncMock()
+    )
+    svc, stub = fn_batch_service()
+    retrieve = stub.retrieve_batch
+    failures = [rate_limit_error({"retry-after": "7"})]
+
+    async def flaky_retrieve(batch_id: str) -> MagicMock:
+        if failures:
+            raise failures.pop()
+        return await retrieve(batch_id)
+
+    stub.batches.retrieve = AsyncMock(side_effect=flaky_retrieve)
+    stream = stub.stream_content
+    request = httpx.Request("GET", "https://example.com")
+    stream_failures = [
+        InternalServerError(
+            "Service Unavailable",
+            response=httpx.Response(503, request=request),
+            body=None,
+        )
+    ]
+
+    def flaky_stream(file_id: str):
+        if stream_failures:
+            raise stream_failures.pop()
+        return stream(file_id)
+
+    svc.client.files.with_streaming_response.content = flaky_stream
+
+    requests = {"a": [{"role": "user", "content": "first"}]}
+    results = [item async for item in svc.run_batch(requests, poll_interval=5)]
+
+    # the poll and the download were retried rather than failing the job
+    assert [r.custom_id for r in results] == ["a"]
+    assert results[0].responses[0].content == "first"
+    assert stub.batches.retrieve.call_count == 4
+    assert mock_sleep.call_args_list[0].args[0] >= 7
+
+
+@pytest.mark.asyncio
+async def test_submit_batch_empty(fn_batch_service):
+    svc, _ = fn_batch_service()
+    with pytest.raises(ValueError):
+        await svc.submit_batch({})
+
+
+@pytest.mark.asyncio
+async def test_wait_for_batch_timeout(fn_batch_service, mocker: MockerFixture):
+    mocker.patch(
+        "azure_python.services.azure_openai_service.asyncio.sleep", AsyncMock()
+    )
+    svc, stub = fn_batch_service()
+    stub.batches.retrieve = AsyncMock(return_value=MagicMock(status="in_progress"))
+
+    with pytest.raises(TimeoutError):
+        await svc.wait_for_batch("batch-0", poll_interval=10, timeout=1)
+
+    with pytest.raises(RuntimeError, match="is not completed"):
+        async for _ in svc.iter_batch_results("batch-0"):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_parse_batch_line_content_filtered(fn_batch_service):
+    svc, stub = fn_batch_service()
+    svc.content_safety_eval.evaluate = MagicMock(
+        return_value=ContentSafetyVerdict(
+            prompt_hits=[ContentFilterHit(category="hate", reason="filtered")],
+            choice_hits={},
+            num_choices=1,
+        )
+    )
+    line = json.dumps(
+        stub.run(
+            {
+                "custom_id": "a",
+                "body": {
+                    "model": "m",
+                    "n": 1,
+                    "messages": [{"role": "user", "content": "x"}],
+                },
+            }
+        )
+    )
+
+    item = svc.parse_batch_line(line)
+    assert item.custom_id == "a"
+    assert item.error == "Content safety check failed. Category: hate."
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_trims_prompt(
+    fn_mock_service: Callable[[bool], AzureOpenAIService], mocker: MockerFixture
+):
+    mocker.patch("azure_python.common.token_counter.get_encoding", return_value=None)
+    clear_caches()
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    mock_service.env.azure_openai_max_prompt_tokens = 60
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=completion("ok")
+    )
+
+    messages = [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": "x" * 200},
+        {"role": "assistant", "content": "y" * 200},
+        {"role": "user", "content": "Test message"},
+    ]
+    await mock_service.chat_completion(messages)  # type: ignore
+
+    sent = mock_service.client.chat.completions.create.call_args.kwargs["messages"]
+    assert sent == [messages[0], messages[3]]
+
+    mock_service.env.azure_openai_max_prompt_tokens = 10
+    with pytest.raises(PromptTooLongError):
+        await mock_service.chat_completion(messages)  # type: ignore
+    clear_caches()
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_shared_quota(
+    fn_mock_service: Callable[[bool], AzureOpenAIService],
+):
+    mock_service = fn_mock_service(with_api_key=True)  # type: ignore
+    backend = mock_service.router.backends[0]
+    backend.deployment = backend.deployment.model_copy(
+        update={"requests_per_minute": 60, "tokens_per_minute": 1000}
+    )
+    mock_service.share_quotas(MagicMock())
+    assert backend.shared_quota is not None
+    assert backend.shared_quota.tokens.limit == 1000  # type: ignore
+    assert backend.shared_quota.tokens.command_timeout == 0.5  # type: ignore
+
+    backend.shared_quota = MagicMock(acquire=AsyncMock(), reconcile=AsyncMock())
+    mock_service.client.chat.completions = MagicMock()
+    mock_service.client.chat.completions.create = AsyncMock(
+        return_value=completion("Test response")
+    )
+    messages = [{"role": "user", "content": "Test message"}]
+    await mock_service.chat_completion(messages)  # type: ignore
+
+    estimated = mock_service.estimate_prompt_tokens(messages)  # type: ignore
+    backend.shared_quota.acquire.assert_called_once_with(estimated)
+    backend.shared_quota.reconcile.assert_called_once()
+
+    # an unreachable Redis does not fail the request
+    backend.shared_quota.acquire.side_effect = ConnectionError("down")
+    responses = await mock_service.chat_completion(messages)  # type: ignore
+    assert responses[0].content == "Test response"
+    mock_service.logger.warning.assert_called()  # type: ignore
+
+    # then the shared quota is skipped until the breaker lets a trial through
+    breaker = backend.shared_quota_breaker
+    assert breaker.is_open
+    await mock_service.chat_completion(messages)  # type: ignore
+    assert backend.shared_quota.acquire.call_count == 2
+    assert backend.shared_quota.reconcile.call_count == 1
+
+    breaker.opened_at = breaker.clock() - breaker.reset_timeout
+    backend.shared_quota.acquire.side_effect = None
+    await mock_service.chat_completion(messages)  # type: ignore
+    assert backend.shared_quota.acquire.call_count == 3
+    assert backend.shared_quota.reconcile.call_count == 2
+    assert not breaker.is_open
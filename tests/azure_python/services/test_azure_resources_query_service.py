@@ -1,3 +1,5 @@
+import base64
+import json
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
@@ -5,6 +7,7 @@ from azure.mgmt.resourcegraph.models import QueryRequest, QueryResponse
 from pytest_mock import MockerFixture
 
 from azure_python.services.azure_resources_query_service import (
+    MANAGEMENT_SCOPE,
     AzureResourcesQueryService,
 )
 
@@ -159,6 +162,36 @@ async def test_fetch_resources():
     assert len(resources) == 2
 
 
+@pytest.mark.asyncio
+async def test_identity(mocker: MockerFixture):
+    claims = json.dumps({"tid": "tenant", "oid": "object"}).encode()
+    payload = base64.urlsafe_b64encode(claims).rstrip(b"=").decode()
+    credential = MagicMock(
+        get_token=AsyncMock(return_value=MagicMock(token=f"h.{payload}.s")),
+        close=AsyncMock(),
+    )
+    mocker.patch(
+        "azure_python.services.azure_resources_query_service.DefaultAzureCredential",
+        return_value=credential,
+    )
+    svc = AzureResourcesQueryService(logger=MagicMock())
+
+    assert await svc.identity() == "tenant:object"
+    assert await svc.identity() == "tenant:object"
+    credential.get_token.assert_called_once_with(MANAGEMENT_SCOPE)
+
+
+@pytest.mark.asyncio
+async def test_fetch_resources_cache_scope():
+    cache = MagicMock(get_or_load=AsyncMock(return_value=[]))
+    svc = AzureResourcesQueryService(logger=MagicMock(), cache=cache)
+    svc.principal = "tenant:object"
+
+    await svc.fetch_resources("subscription_id")
+    key = cache.get_or_load.call_args.args[0]
+    assert key.startswith("tenant:object:AzureResourcesQueryService.fetch_resources:")
+
+
 @pytest.mark.asyncio
 async def test_fetch_creations():
     svc = AzureResourcesQueryService(logger=MagicMock())
@@ -2,7 +2,13 @@ from typing import Callable
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
-from azure.ai.textanalytics._models import CategorizedEntity, RecognizeEntitiesResult
+from azure.ai.textanalytics._models import (
+    CategorizedEntity,
+    DocumentError,
+    RecognizeEntitiesResult,
+    TextAnalyticsError,
+)
+from nltk.tokenize import PunktSentenceTokenizer
 from pytest_mock import MockerFixture
 
 from azure_python.services.azure_text_analytics_service import (
@@ -44,6 +50,26 @@ def test_text_extraction_service_without_key(
     assert mock_service(False).get_client() is not None
 
 
+def test_generate_sentences(
+    mock_service: Callable[[bool], AzureTextAnalyticsService], mocker: MockerFixture
+):
+    # an untrained tokenizer, the punkt_tab model may not be downloadable
+    mocker.patch(
+        "azure_python.services.azure_text_analytics_service.punkt_tokenizer",
+        return_value=PunktSentenceTokenizer(),
+    )
+    content = "It rains. It rains. The sun is out."
+    index = mock_service(True).generate_sentences(content)
+
+    assert [(s.content, s.start) for s in index] == [
+        ("It rains.", 0),
+        ("It rains.", 10),
+        ("The sun is out.", 20),
+    ]
+    assert index.find(13) == "It rains."
+    assert index.find(24) == "The sun is out."
+
+
 @pytest.mark.asyncio
 async def test_recognize_entities_no_content(
     mock_service: Callable[[bool], AzureTextAnalyticsService],
@@ -104,3 +130,122 @@ async def test_recognize_entities(
     assert results[1].id == "1"
     assert results[1].entities[0].text == "test"
     assert results[1].entities[0].sentence == input[1]
+
+
+def recognize_places(texts: list[str]) -> list:
+    return [
+        RecognizeEntitiesResult(
+            id=str(i),
+            entities=[
+                CategorizedEntity(
+                    text=place,
+                    category="Location",
+                    subcategory=None,
+                    offset=text.index(place),
+                    length=len(place),
+                    confidence_score=0.9,
+                )
+                for place in ("Paris", "Rome")
+                if place in text
+            ],
+        )
+        if text
+        else DocumentError(
+            id=str(i),
+            error=TextAnalyticsError(code="InvalidDocument", message="empty"),
+        )
+        for i, text in enumerate(texts)
+    ]
+
+
+@pytest.fixture
+def batching_service(mocker: MockerFixture) -> AzureTextAnalyticsService:
+    mocker.patch(
+        "azure_python.services.azure_text_analytics_service.punkt_tokenizer",
+        return_value=PunktSentenceTokenizer(),
+    )
+    service = AzureTextAnalyticsService(
+        env=AzureTextAnalyticsServiceEnv(
+            azure_cog_service_endpoint="https://fake-endpoint.com",
+            azure_cog_service_key="fake-key",
+            azure_cog_service_max_documents=2,
+            azure_cog_service_max_document_length=14,
+            azure_cog_service_segment_overlap=7,
+        ),
+        logger=MagicMock(),
+    )
+    mock_client = MagicMock()
+    mock_client.recognize_entities = AsyncMock(side_effect=recognize_places)
+    service.get_client = MagicMock(return_value=mock_client)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_recognize_entities_batches(
+    batching_service: AzureTextAnalyticsService,
+):
+    results = await batching_service.recognize_entities(
+        ["Paris is big. I like Paris.", "Rome."]
+    )
+
+    client: MagicMock = batching_service.get_client()  # type: ignore
+    # the first document is split in two segments, 2 segments per request
+    assert [c.args[0] for c in client.recognize_entities.call_args_list] == [
+        ["Paris is big. ", "I like Paris."],
+        ["Rome."],
+    ]
+    assert [r.id for r in results] == ["0", "1"]
+    assert [(e.text, e.offset, e.sentence) for e in results[0].entities] == [
+        ("Paris", 0, "Paris is big."),
+        ("Paris", 21, "I like Paris."),
+    ]
+    assert [(e.text, e.offset, e.sentence) for e in results[1].entities] == [
+        ("Rome", 0, "Rome."),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_recognize_entities_overlap(
+    batching_service: AzureTextAnalyticsService,
+):
+    def recognize_city(texts: list[str]) -> list:
+        # "New" alone is "New York" truncated by the end of a segment
+        return [
+            RecognizeEntitiesResult(
+                id=str(i),
+                entities=[
+                    CategorizedEntity(
+                        text=city,
+                        category="Location",
+                        subcategory=None,
+                        offset=text.index(city),
+                        length=len(city),
+                        confidence_score=0.9,
+                    )
+                    for city in ("New York" if "New York" in text else "New",)
+                    if city in text
+                ],
+            )
+            for i, text in enumerate(texts)
+        ]
+
+    client: MagicMock = batching_service.get_client()  # type: ignore
+    client.recognize_entities.side_effect = recognize_city
+    results = await batching_service.recognize_entities(["I flew to New York."])
+
+    # the second segment repeats the words before the cut
+    assert client.recognize_entities.call_args.args[0] == [
+        "I flew to New ",
+        "New York.",
+    ]
+    assert [(e.text, e.offset) for e in results[0].entities] == [("New York", 10)]
+
+
+@pytest.mark.asyncio
+async def test_recognize_entities_document_error(
+    batching_service: AzureTextAnalyticsService,
+):
+    results = await batching_service.recognize_entities(["", "Rome."])
+
+    assert [r.id for r in results] == ["1"]
+    batching_service.logger.warning.assert_called_once()  # type: ignore
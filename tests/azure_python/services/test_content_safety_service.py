@@ -1,14 +1,18 @@
+import asyncio
 from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 from azure.ai.contentsafety.aio import ContentSafetyClient
 from azure.ai.contentsafety.models import (
+    AnalyzeTextOptions,
     AnalyzeTextResult,
     TextCategoriesAnalysis,
 )
+from azure.core.exceptions import HttpResponseError
 from azure.identity.aio import DefaultAzureCredential
 from pytest_mock import MockerFixture
 
+from azure_python.common.moderation_cache import ModerationCache
 from azure_python.services.content_safety_service import ContentSafetyService
 
 
@@ -42,7 +46,11 @@ async def test_get_client(apikey: str | None, mocker: MockerFixture):
         return_value=mocker.AsyncMock(),
     )
     service = ContentSafetyService(
-        env=MagicMock(content_safety_endpoint="test", content_safety_key=apikey),
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key=apikey,
+            content_safety_max_text_length=10000,
+        ),
         logger=mocker.MagicMock(),
     )
 
@@ -52,7 +60,11 @@ async def test_get_client(apikey: str | None, mocker: MockerFixture):
 
 def test_collect_results():
     service = ContentSafetyService(
-        env=MagicMock(content_safety_endpoint="test", content_safety_key="test"),
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=10000,
+        ),
         logger=MagicMock(),
     )
 
@@ -84,7 +96,11 @@ async def test_analyze_text(
     mocker: MockerFixture,
 ) -> None:
     service = ContentSafetyService(
-        env=MagicMock(content_safety_endpoint="test", content_safety_key="test"),
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=10000,
+        ),
         logger=mocker.MagicMock(),
     )
 
@@ -113,7 +129,11 @@ async def test_analyze_text_client_close_exception(
     mock_logger = mocker.MagicMock()
 
     service = ContentSafetyService(
-        env=MagicMock(content_safety_endpoint="test", content_safety_key="test"),
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=10000,
+        ),
         logger=mock_logger,
     )
 
@@ -150,10 +170,214 @@ async def test_analyze_text_credential_close_exception(
     mock_logger = mocker.MagicMock()
 
     service = ContentSafetyService(
-        env=MagicMock(content_safety_endpoint="test", content_safety_key=None),
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key=None,
+            content_safety_max_text_length=10000,
+        ),
         logger=mock_logger,
     )
 
     await service.analyze_text("test text")
 
     mock_logger.warning.assert_called_once_with("Error closing credential: Close error")
+
+
+@pytest.mark.asyncio
+async def test_analyze_texts(
+    mock_content_safety_client: AsyncMock,
+    mocker: MockerFixture,
+) -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def analyze_text(request: AnalyzeTextOptions) -> AnalyzeTextResult:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # later texts complete first
+        await asyncio.sleep(0.01 / len(request.text))
+        in_flight -= 1
+        return AnalyzeTextResult(
+            categories_analysis=[
+                TextCategoriesAnalysis(category="Hate", severity=len(request.text))
+            ]
+        )  # type: ignore
+
+    mock_content_safety_client.analyze_text = AsyncMock(side_effect=analyze_text)
+    patched_client = mocker.patch(
+        "azure_python.services.content_safety_service.ContentSafetyClient",
+        return_value=mock_content_safety_client,
+    )
+    service = ContentSafetyService(
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=10000,
+        ),
+        logger=mocker.MagicMock(),
+    )
+
+    results = await service.analyze_texts(["a" * i for i in range(1, 11)], 3)
+
+    assert [r[0]["severity"] for r in results] == list(range(1, 11))
+    assert max_in_flight == 3
+    patched_client.assert_called_once()
+    mock_content_safety_client.close.assert_called_once()
+
+    assert await service.analyze_texts([]) == []
+    with pytest.raises(ValueError):
+        await service.analyze_texts(["a"], 0)
+
+
+@pytest.mark.asyncio
+async def test_analyze_texts_long_text(
+    mock_content_safety_client: AsyncMock,
+    mocker: MockerFixture,
+) -> None:
+    async def analyze_text(request: AnalyzeTextOptions) -> AnalyzeTextResult:
+        assert len(request.text) <= 20
+        return AnalyzeTextResult(
+            categories_analysis=[
+                TextCategoriesAnalysis(
+                    category="Hate", severity=4 if "hate" in request.text else 0
+                )
+            ]
+        )  # type: ignore
+
+    mock_content_safety_client.analyze_text = AsyncMock(side_effect=analyze_text)
+    service = ContentSafetyService(
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=20,
+            content_safety_segment_overlap=0,
+        ),
+        logger=mocker.MagicMock(),
+    )
+
+    long_text = "All is well here. Nothing to see. Some hate speech."
+    results = await service.analyze_texts(["short text", long_text, "hate"])
+
+    assert results == [
+        [{"category": "Hate", "severity": 0}],
+        [{"category": "Hate", "severity": 4}],
+        [{"category": "Hate", "severity": 4}],
+    ]
+    # the 3 segments of the long text and the 2 short texts
+    assert mock_content_safety_client.analyze_text.call_count == 5
+
+
+@pytest.mark.asyncio
+async def test_analyze_texts_error(
+    mock_content_safety_client: AsyncMock,
+    mocker: MockerFixture,
+) -> None:
+    mock_content_safety_client.analyze_text = AsyncMock(
+        side_effect=HttpResponseError("Too many requests")
+    )
+    service = ContentSafetyService(
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=10000,
+        ),
+        logger=mocker.MagicMock(),
+    )
+
+    with pytest.raises(HttpResponseError):
+        await service.analyze_texts(["a", "b", "c"], 2)
+    mock_content_safety_client.close.assert_called_once()
+
+
+@pytest.mark.asyncio
+async def test_analyze_long_text(
+    mock_content_safety_client: AsyncMock,
+    mocker: MockerFixture,
+) -> None:
+    async def analyze_text(request: AnalyzeTextOptions) -> AnalyzeTextResult:
+        return AnalyzeTextResult(
+            categories_analysis=[
+                TextCategoriesAnalysis(
+                    category="Violence", severity=4 if "Bad" in request.text else 0
+                )
+            ]
+        )  # type: ignore
+
+    mock_content_safety_client.analyze_text = AsyncMock(side_effect=analyze_text)
+    service = ContentSafetyService(
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=22,
+            content_safety_segment_overlap=0,
+        ),
+        logger=mocker.MagicMock(),
+    )
+    text = "Good good. Good good. Bad bad bad. Good good."
+
+    analysis = await service.analyze_long_text(text)
+    assert analysis.segment_count == 3
+    assert analysis.categories[0].severity == 4
+    segment = analysis.categories[0].segments[0]
+    assert text[segment.offset : segment.offset + segment.length] == "Bad bad bad. "
+
+    results = await service.analyze_text(text)
+    assert results == [{"category": "Violence", "severity": 4}]
+    sent = [
+        c.args[0].text for c in mock_content_safety_client.analyze_text.call_args_list
+    ]
+    assert max(len(t) for t in sent) <= 22
+
+
+@pytest.mark.asyncio
+async def test_analyze_text_cache(
+    mock_content_safety_client: AsyncMock,
+    mocker: MockerFixture,
+) -> None:
+    service = ContentSafetyService(
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=10000,
+        ),
+        logger=mocker.MagicMock(),
+        cache=ModerationCache(logger=mocker.MagicMock()),
+    )
+
+    results = await service.analyze_text("test text")
+    assert await service.analyze_text("  test   text\n") == results
+    assert results == [{"category": "Hate", "severity": 2}]
+    mock_content_safety_client.analyze_text.assert_called_once()
+
+    await service.analyze_text("other text")
+    assert mock_content_safety_client.analyze_text.call_count == 2
+
+
+@pytest.mark.asyncio
+async def test_analyze_texts_cache(
+    mock_content_safety_client: AsyncMock,
+    mocker: MockerFixture,
+) -> None:
+    service = ContentSafetyService(
+        env=MagicMock(
+            content_safety_endpoint="test",
+            content_safety_key="test",
+            content_safety_max_text_length=10000,
+        ),
+        logger=mocker.MagicMock(),
+        cache=ModerationCache(logger=mocker.MagicMock()),
+    )
+
+    await service.analyze_text("test text")
+    results = await service.analyze_texts(["test text", "other", " other "])
+    assert results == [[{"category": "Hate", "severity": 2}]] * 3
+    # only "other" was analyzed, once for both spellings
+    assert mock_content_safety_client.analyze_text.call_count == 2
+
+    results[0][0]["severity"] = 6
+    assert (
+        await service.analyze_texts(["test text", "other"])
+        == [[{"category": "Hate", "severity": 2}]] * 2
+    )
+    assert mock_content_safety_client.analyze_text.call_count == 2
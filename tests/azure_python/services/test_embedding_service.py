@@ -1,15 +1,19 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncIterator, Callable
 from unittest.mock import AsyncMock, MagicMock
 
+import numpy as np
 import pytest
 from azure.ai.inference import EmbeddingsClient
-from azure.ai.inference.models import EmbeddingsResult
+from azure.ai.inference.models import EmbeddingItem, EmbeddingsResult, EmbeddingsUsage
 from pytest_mock import MockerFixture
 
+from azure_python.common.embedding_cache import EmbeddingCache, LocalEmbeddingStore
 from azure_python.services.embedding_service import (
     EmbeddingService,
     EmbeddingServiceEnv,
+    plan_batches,
 )
 
 
@@ -45,8 +49,8 @@ async def mock_embedding_client() -> AsyncIterator[MockerFixture]:
     mock_emb_client = MagicMock(spec=EmbeddingsClient)
     result = MagicMock(spec=EmbeddingsResult)
     result.data = [
-        MagicMock(embedding=[0.1, 0.2, 0.3]),
-        MagicMock(embedding=[0.4, 0.5, 0.6]),
+        MagicMock(embedding=[0.1, 0.2, 0.3], index=0),
+        MagicMock(embedding=[0.4, 0.5, 0.6], index=1),
     ]
     mock_emb_client.embed = AsyncMock(return_value=result)
     yield mock_emb_client
@@ -56,7 +60,15 @@ async def mock_embedding_client() -> AsyncIterator[MockerFixture]:
 def embedding_service(
     mock_embedding_client: MagicMock, mocker: MockerFixture
 ) -> EmbeddingService:
-    service = EmbeddingService(env=MagicMock(), logger=MagicMock())
+    service = EmbeddingService(
+        env=MagicMock(
+            embedding_model="mock_model",
+            embedding_batch_size=512,
+            embedding_max_tokens_per_batch=100_000,
+            embedding_concurrency=4,
+        ),
+        logger=MagicMock(),
+    )
     mocker.patch.object(
         EmbeddingService, "get_client", return_value=mock_embedding_client
     )
@@ -71,3 +83,164 @@ async def test_get_embeddings(embedding_service: EmbeddingService) -> None:
 
     assert embeddings_result is not None
     assert len(embeddings_result.data) == 2
+
+
+def test_plan_batches():
+    assert plan_batches([], 2, 10) == []
+    assert plan_batches([1, 1, 1, 1, 1], 2, 10) == [(0, 2), (2, 4), (4, 5)]
+    assert plan_batches([4, 4, 4, 20, 1], 10, 10) == [(0, 2), (2, 3), (3, 4), (4, 5)]
+
+    with pytest.raises(ValueError):
+        plan_batches([1], 0, 10)
+    with pytest.raises(ValueError):
+        plan_batches([1], 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_embed_many(mocker: MockerFixture) -> None:
+    in_flight = 0
+    max_in_flight = 0
+
+    async def embed(input: list[str]) -> EmbeddingsResult:
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        # later batches complete first
+        await asyncio.sleep(0.01 / int(input[0]))
+        in_flight -= 1
+        return EmbeddingsResult(
+            id="id",
+            data=[
+                EmbeddingItem(embedding=[float(t)], index=i)
+                for i, t in enumerate(input)
+            ],
+            usage=EmbeddingsUsage(prompt_tokens=len(input), total_tokens=len(input)),
+            model="mock_model",
+        )
+
+    client = MagicMock(embed=AsyncMock(side_effect=embed))
+
+    @asynccontextmanager
+    async def get_client() -> AsyncIterator[MagicMock]:
+        yield client
+
+    service = EmbeddingService(
+        env=EmbeddingServiceEnv(
+            embedding_endpoint="mock_endpoint", embedding_model="mock_model"
+        ),
+        logger=MagicMock(),
+    )
+    mocker.patch.object(service, "get_client", side_effect=get_client)
+
+    texts = [str(i) for i in range(1, 11)]
+    result = await service.embed_many(texts, batch_size=3, concurrency=2)
+
+    assert [item.embedding[0] for item in result.data] == list(range(1, 11))
+    assert [item.index for item in result.data] == list(range(10))
+    assert result.usage.prompt_tokens == 10
+    assert client.embed.call_count == 4
+    assert max_in_flight == 2
+
+    with pytest.raises(ValueError):
+        await service.embed_many(texts, concurrency=0)
+
+
+@pytest.fixture
+def batched_service(mocker: MockerFixture) -> EmbeddingService:
+    async def embed(input: list[str]) -> EmbeddingsResult:
+        return EmbeddingsResult(
+            id="id",
+            # the service does not guarantee the order of the items
+            data=[
+                EmbeddingItem(embedding=[float(t), 0.0], index=i)
+                for i, t in enumerate(input)
+            ][::-1],
+            usage=EmbeddingsUsage(prompt_tokens=len(input), total_tokens=len(input)),
+            model="mock_model",
+        )
+
+    client = MagicMock(embed=AsyncMock(side_effect=embed))
+
+    @asynccontextmanager
+    async def get_client() -> AsyncIterator[MagicMock]:
+        yield client
+
+    service = EmbeddingService(
+        env=EmbeddingServiceEnv(
+            embedding_endpoint="mock_endpoint",
+            embedding_model="mock_model",
+            embedding_batch_size=2,
+        ),
+        logger=MagicMock(),
+    )
+    mocker.patch.object(service, "get_client", side_effect=get_client)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_embed_many_order(batched_service: EmbeddingService) -> None:
+    result = await batched_service.embed_many(["1", "2", "3"], batch_size=2)
+    assert [item.embedding for item in result.data] == [[1, 0], [2, 0], [3, 0]]
+    assert [item.index for item in result.data] == [0, 1, 2]
+
+    result = await batched_service.embed_many(["1", "2"], batch_size=2)
+    assert [item.embedding for item in result.data] == [[1, 0], [2, 0]]
+
+
+@pytest.mark.asyncio
+async def test_embed_many_empty(batched_service: EmbeddingService) -> None:
+    result = await batched_service.embed_many([])
+    assert result.data == []
+    assert result.usage.prompt_tokens == 0
+    batched_service.get_client.assert_not_called()  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_embed_matrix(batched_service: EmbeddingService, tmp_path) -> None:
+    texts = ["1", "2", "3", "0", "5"]
+
+    matrix = await batched_service.embed_matrix(texts)
+    assert matrix.dtype == np.float32
+    assert matrix.flags["C_CONTIGUOUS"]
+    np.testing.assert_array_equal(matrix[:, 0], [1, 2, 3, 0, 5])
+
+    normalized = await batched_service.embed_matrix(texts, normalize=True)
+    np.testing.assert_array_equal(normalized[:, 0], [1, 1, 1, 0, 1])
+
+    out = np.zeros((5, 2), dtype=np.float32)
+    assert await batched_service.embed_matrix(texts, out=out) is out
+    np.testing.assert_array_equal(out, matrix)
+
+    path = str(tmp_path / "vectors.npy")
+    mapped = await batched_service.embed_matrix(texts, path=path)
+    assert isinstance(mapped, np.memmap)
+    np.testing.assert_array_equal(np.load(path), matrix)
+
+    assert (await batched_service.embed_matrix([])).shape == (0, 0)
+    with pytest.raises(ValueError):
+        await batched_service.embed_matrix(texts, out=np.zeros((4, 2), np.float32))
+    with pytest.raises(ValueError):
+        await batched_service.embed_matrix(texts, out=np.zeros((5, 3), np.float32))
+
+
+@pytest.mark.asyncio
+async def test_embedding_cache(batched_service: EmbeddingService, tmp_path) -> None:
+    batched_service.cache = EmbeddingCache(LocalEmbeddingStore(str(tmp_path)))
+    first = await batched_service.get_embeddings(["1", "2", "3"])
+    assert [item.embedding for item in first.data] == [[1, 0], [2, 0], [3, 0]]
+
+    result = await batched_service.get_embeddings(["4", "2", "1", "5"])
+    assert [item.embedding for item in result.data] == [
+        [4, 0],
+        [2, 0],
+        [1, 0],
+        [5, 0],
+    ]
+    assert [item.index for item in result.data] == [0, 1, 2, 3]
+    assert result.usage.prompt_tokens == 2
+    assert batched_service.cache.hits == 2
+    assert batched_service.cache.tokens_saved > 0
+
+    matrix = await batched_service.embed_matrix(["5", "6", "1"], normalize=True)
+    np.testing.assert_array_equal(matrix, [[1, 0], [1, 0], [1, 0]])
+    assert batched_service.cache.hits == 4
@@ -2,9 +2,12 @@ from unittest.mock import MagicMock
 
 import pytest
 
+from azure_python.models.content_safety_verdict import ContentFilterHit
 from azure_python.services.openai_content_evaluator import (
     ContentSafeException,
     OpenAIContentEvaluator,
+    safe_verdict,
+    severity_table,
 )
 
 
@@ -18,13 +21,13 @@ async def test_content_safety_check_input():
         prompt_filter_results=[
             {
                 "content_filter_results": {
-                    "hate_speech": {"filtered": False, "severity": "high"},
+                    "hate_speech": {"filtered": False, "severity": "High"},
                 }
             }
         ],
     )
 
-    with pytest.raises(ContentSafeException):
+    with pytest.raises(ContentSafeException, match="Severity: high"):
         OpenAIContentEvaluator(logger=MagicMock()).content_safety_check(
             response=test_data
         )
@@ -46,7 +49,7 @@ async def test_content_safety_check_input_filtered():
         ],
     )
 
-    with pytest.raises(ContentSafeException):
+    with pytest.raises(ContentSafeException, match="Category: hate_speech"):
         OpenAIContentEvaluator(logger=MagicMock()).content_safety_check(
             response=test_data
         )
@@ -91,3 +94,65 @@ async def test_content_safety_check_input_empty():
     )
 
     OpenAIContentEvaluator(logger=MagicMock()).content_safety_check(response=test_data)
+
+
+def test_severity_table():
+    assert severity_table("high") is severity_table("high")
+    assert severity_table("high")["high"] is True
+    assert severity_table("high")["medium"] is False
+    assert severity_table("medium")["Medium"] is True
+    assert severity_table("low")["LOW"] is True
+    assert severity_table("low")["safe"] is False
+
+
+def test_evaluate_keeps_safe_choices():
+    response = MagicMock(
+        choices=[
+            MagicMock(
+                model_extra={
+                    "content_filter_results": {
+                        "hate": {"filtered": False, "severity": "safe"},
+                        "protected_material_code": {"detected": False},
+                    }
+                }
+            ),
+            MagicMock(
+                model_extra={
+                    "content_filter_results": {
+                        "hate": {"filtered": False, "severity": "Medium"},
+                        "jailbreak": {"filtered": False, "detected": True},
+                    }
+                }
+            ),
+            MagicMock(model_extra={}),
+        ],
+        prompt_filter_results=[
+            {"content_filter_results": {"hate": {"filtered": False, "severity": "low"}}}
+        ],
+    )
+    evaluator = OpenAIContentEvaluator(logger=MagicMock())
+
+    verdict = evaluator.evaluate(response, threshold="medium")
+    assert not verdict.safe
+    assert verdict.prompt_hits == []
+    assert [c.safe for c in verdict.choices] == [True, False, True]
+    assert verdict.choices[1].hits == [
+        ContentFilterHit(category="hate", reason="severity", severity="Medium"),
+        ContentFilterHit(category="jailbreak", reason="detected"),
+    ]
+    assert verdict.safe_choice_indexes() == [0, 2]
+
+    # responses without hits share one verdict
+    safe = evaluator.evaluate(MagicMock(choices=[], prompt_filter_results=[]))
+    assert safe.safe
+    assert safe is safe_verdict(0)
+
+    verdict = evaluator.evaluate(response, threshold="low")
+    assert verdict.prompt_hits[0].category == "hate"
+    assert verdict.safe_choice_indexes() == []
+
+    verdict = evaluator.evaluate(response, threshold="high")
+    assert verdict.choices[1].hits == [
+        ContentFilterHit(category="jailbreak", reason="detected")
+    ]
+    assert verdict.safe_choice_indexes() == [0, 2]
@@ -0,0 +1,158 @@
+from typing import Callable
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from azure_python.models.llm_response import LLMResponse
+from azure_python.services.semantic_cache_service import (
+    SemanticCacheService,
+    SemanticCacheServiceEnv,
+    last_user_message,
+)
+
+VECTORS = {
+    "What is the capital of France?": [1.0, 0.0, 0.0],
+    "what's the capital of france": [0.99, 0.1, 0.0],
+    "How tall is Mount Everest?": [0.0, 1.0, 0.0],
+    "Who wrote Hamlet?": [0.0, 0.0, 1.0],
+}
+
+
+def response(content: str) -> list[LLMResponse]:
+    return [LLMResponse(content=content, finish_reason="stop", usages={})]
+
+
+def user(content: str) -> list:
+    return [
+        {"role": "system", "content": "You are a helpful assistant."},
+        {"role": "user", "content": content},
+    ]
+
+
+@pytest.fixture
+def fn_mock_service() -> Callable[..., SemanticCacheService]:
+    def wrapper(max_entries: int = 10) -> SemanticCacheService:
+        embedding_service = MagicMock()
+        embedding_service.get_embeddings = AsyncMock(
+            side_effect=lambda texts: MagicMock(
+                data=[MagicMock(embedding=VECTORS[texts[0]])]
+            )
+        )
+        return SemanticCacheService(
+            env=SemanticCacheServiceEnv(
+                semantic_cache_threshold=0.95, semantic_cache_max_entries=max_entries
+            ),
+            embedding_service=embedding_service,
+            logger=MagicMock(),
+        )
+
+    return wrapper
+
+
+def test_last_user_message():
+    assert last_user_message([]) is None
+    assert last_user_message(user("hello")) == (1, "hello")
+    assert last_user_message(
+        [
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": "hello"},
+                    {"type": "image_url", "image_url": {"url": "x"}},
+                    {"type": "text", "text": "world"},
+                ],
+            }
+        ]  # type: ignore
+    ) == (0, "hello\nworld")
+
+
+@pytest.mark.asyncio
+async def test_lookup_miss_then_hit(
+    fn_mock_service: Callable[..., SemanticCacheService],
+):
+    svc = fn_mock_service()
+    messages = user("What is the capital of France?")
+
+    assert await svc.lookup(messages) is None
+    await svc.store(messages, response("Paris"))
+
+    # the embedding computed during lookup is reused by store
+    assert svc.embedding_service.get_embeddings.call_count == 1  # type: ignore
+
+    cached = await svc.lookup(user("what's the capital of france"))
+    assert cached is not None
+    assert cached[0].content == "Paris"
+
+    # changing a result does not change the cache
+    cached[0].content = "Lyon"
+    cached.clear()
+    cached = await svc.lookup(user("what's the capital of france"))
+    assert cached is not None
+    assert cached[0].content == "Paris"
+
+    assert await svc.lookup(user("How tall is Mount Everest?")) is None
+
+
+@pytest.mark.asyncio
+async def test_lookup_scope_and_context(
+    fn_mock_service: Callable[..., SemanticCacheService],
+):
+    svc = fn_mock_service()
+    messages = user("What is the capital of France?")
+    await svc.store(messages, response("Paris"), scope="a")
+
+    assert await svc.lookup(messages, scope="b") is None
+    assert await svc.lookup(messages, scope="a") is not None
+
+    other_system = [
+        {"role": "system", "content": "Answer in French."},
+        {"role": "user", "content": "What is the capital of France?"},
+    ]
+    assert await svc.lookup(other_system, scope="a") is None  # type: ignore
+
+
+@pytest.mark.asyncio
+async def test_store_without_user_message(
+    fn_mock_service: Callable[..., SemanticCacheService],
+):
+    svc = fn_mock_service()
+    messages = [{"role": "system", "content": "You are a helpful assistant."}]
+
+    assert await svc.lookup(messages) is None  # type: ignore
+    await svc.store(messages, response("Hi"))  # type: ignore
+    assert svc.size == 0
+
+
+@pytest.mark.asyncio
+async def test_store_replaces_similar_entry(
+    fn_mock_service: Callable[..., SemanticCacheService],
+):
+    svc = fn_mock_service()
+    await svc.store(user("What is the capital of France?"), response("Paris"))
+    await svc.store(user("what's the capital of france"), response("Paris!"))
+
+    assert svc.size == 1
+    cached = await svc.lookup(user("What is the capital of France?"))
+    assert cached is not None
+    assert cached[0].content == "Paris!"
+
+
+@pytest.mark.asyncio
+async def test_eviction_lru(fn_mock_service: Callable[..., SemanticCacheService]):
+    svc = fn_mock_service(max_entries=2)
+    await svc.store(user("What is the capital of France?"), response("Paris"))
+    await svc.store(user("How tall is Mount Everest?"), response("8849m"))
+
+    # touch the first entry so that the second one is the least recently used
+    assert await svc.lookup(user("What is the capital of France?")) is not None
+    await svc.store(user("Who wrote Hamlet?"), response("Shakespeare"))
+
+    assert svc.size == 2
+    assert await svc.lookup(user("How tall is Mount Everest?")) is None
+    assert await svc.lookup(user("What is the capital of France?")) is not None
+    assert await svc.lookup(user("Who wrote Hamlet?")) is not None
+
+
+def test_max_entries(fn_mock_service: Callable[..., SemanticCacheService]):
+    with pytest.raises(ValueError, match="semantic_cache_max_entries"):
+        fn_mock_service(max_entries=0)